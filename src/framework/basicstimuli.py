@@ -2,6 +2,11 @@ import direct.gui
 import direct.showbase
 import pandac.PandaModules
 import framework.eventmarkers.eventmarkers
+import framework.frametiming
+import framework.clock
+import framework.mediacache
+import framework.tickmodule
+import rpyc.core.netref
 import math
     
 class BasicStimuli:
@@ -24,15 +29,61 @@ class BasicStimuli:
         self.audio3d = None             # 3d audio manager, if needed
         self.implicit_markers = False   # whether to generate implicit markers
                                         # in write(), movie(), etc.
+        self.flip_latency = 1.0         # the number of frame periods between the tick of a frame and the buffer flip that 
+                                        # shows its content (1 for double buffering with vsync, 2 for triple buffering); used by present() 
         self._to_destroy = []
 
 
-    def marker(self,markercode):
+    def marker(self,markercode,timestamp=None):
         """
         Emit a marker. The markercode can be a string or a number. 
+        Optionally a framework.clock.now() timestamp at which the marked event happens can be given (defaults to now).
         Side note: strings will not work if a legacy marker sending protocol is enabled (such as DataRiver or the parallel port).
         """
-        framework.eventmarkers.eventmarkers.send_marker(markercode)
+        framework.eventmarkers.eventmarkers.send_marker(markercode,timestamp)
+
+
+    def structured_marker(self,template_id,*fields):
+        """
+        Emit a marker given by a registered template id and the fields to fill in; the string formatting is 
+        deferred to the marker dispatcher. Templates are registered via 
+        framework.eventmarkers.eventmarkers.register_marker_template(), typically once at import time.
+        """
+        framework.eventmarkers.eventmarkers.send_structured_marker(template_id,*fields)
+
+
+    def present(self,
+                onset,              # the desired onset time of the stimulus, as a framework.clock.now() value
+                stimulus,           # the stimulus function to invoke, e.g. self.picture or self.write
+                *args,              # positional arguments to the stimulus function 
+                **kwargs):          # keyword arguments to the stimulus function; in addition, marker=<markercode> can be given
+        """
+        Present a stimulus at a scheduled onset time, aligned to the display's vertical refresh.
+        
+        Waits until the frame whose buffer flip is predicted to be closest to the onset, invokes the stimulus
+        function (e.g. self.picture('face.png',duration=0.5)) and emits the given marker (if any) with the 
+        predicted flip time as its timestamp, rather than the time at which the Python code happened to run.
+        Returns the result of the stimulus function. Can only be used from latent code (see LatentModule).
+        
+        Example: self.present(t0 + 2.0, self.write, 'Go!', duration=1.0, marker=10)
+        """
+        markercode = kwargs.pop('marker',None)
+        recorder = framework.frametiming.recorder
+        period = recorder.frame_period()
+        # content created in-frame (cooperative scheduling or coroutines) is rendered in the current frame,
+        # otherwise it is rendered in the next frame
+        in_frame = framework.tickmodule.scheduling == 'cooperative' or getattr(self,'_coroutine',None) is not None
+        frames_ahead = 0 if in_frame else 1
+        # wake up at the frame whose flip is closest to the onset
+        wakeup = onset - (frames_ahead + self.flip_latency)*period
+        if wakeup > framework.clock.now():
+            self.sleep_until(wakeup)
+        flip = recorder.predict_flip(frames_ahead,self.flip_latency)
+        if flip is None:
+            flip = framework.clock.now() + (frames_ahead + self.flip_latency)*period
+        if markercode is not None:
+            self.marker(markercode,flip)
+        return stimulus(*args,**kwargs)
     
     
     def write(self, 
@@ -59,6 +110,8 @@ class BasicStimuli:
               sort=0                    # sorting order of the text
               ):
         """Write a piece of text on the screen and keep it there for a particular duration."""
+        if parent is None:
+            parent = self._engine.parent
         
         if align == 'left':
             align = self._engine.pandac.TextNode.ALeft
@@ -69,8 +122,8 @@ class BasicStimuli:
         if duration == 0:
             block = False
         
-        if type(font) == str:
-            font = self._engine.base.loader.loadFont(font)
+        if type(font) == str and not self._engine.remote:
+            font = self._engine.cache.get('font',font)
         obj = self._engine.direct.gui.OnscreenText.OnscreenText(text=text,pos=(pos[0],pos[1]-scale/4),roll=roll,scale=scale,fg=fg,bg=bg,shadow=shadow,shadowOffset=shadowOffset,frame=frame,align=align,wordwrap=wordwrap,drawOrder=drawOrder,font=font,parent=parent,sort=sort)
         self._to_destroy.append(obj)
         if self.implicit_markers:
@@ -105,6 +158,8 @@ class BasicStimuli:
                   parent=None       # the renderer to use for displaying the object
                   ):        
         """Draw a crosshair."""
+        if parent is None:
+            parent = self._engine.parent
         obj1 = self._engine.direct.gui.OnscreenImage.OnscreenImage(image='blank.tga',pos=(pos[0],0,pos[1]),scale=(size,1,width),color=color,parent=parent)
         self._to_destroy.append(obj1)
         obj1.setTransparency(self._engine.pandac.TransparencyAttrib.MAlpha)
@@ -141,6 +196,8 @@ class BasicStimuli:
                   depth=0,          # screen depth of the rectangle
                   ):
         """Draw a single-colored rectangle."""
+        if parent is None:
+            parent = self._engine.parent
         
         if duration == 0:
             block = False
@@ -179,6 +236,8 @@ class BasicStimuli:
               parent=None,          # the renderer to use for displaying the object
               ):
         """Display a frame on the screen and keep it there for a particular duration."""
+        if parent is None:
+            parent = self._engine.parent
                 
         l=rect[0];r=rect[1];t=rect[2];b=rect[3]
         w=thickness[0];h=thickness[1]
@@ -225,6 +284,8 @@ class BasicStimuli:
               parent=None,              # parent rendering context or Panda3d NodePath
               ):
         """Display a picture on the screen and keep it there for a particular duration."""        
+        if parent is None:
+            parent = self._engine.parent
         
         if pos is not None and type(pos) not in (int,float) and len(pos) == 2:
             pos = (pos[0],0,pos[1])
@@ -235,6 +296,8 @@ class BasicStimuli:
         if duration == 0:
             block = False
             
+        if type(image) == str and not self._engine.remote:
+            image = self._engine.cache.get('picture',image)
         obj = self._engine.direct.gui.OnscreenImage.OnscreenImage(image=image,pos=pos,hpr=hpr,scale=scale,color=color,parent=parent)
         self._to_destroy.append(obj)
         obj.setTransparency(self._engine.pandac.TransparencyAttrib.MAlpha)
@@ -276,6 +339,7 @@ class BasicStimuli:
             obj.set3dAttributes(1.0*math.sin(direction),1.0*math.cos(direction),0.0,0.0,0.0,0.0)
             obj.setVolume(volume)
         else:
+            # (each playback gets its own sound object; the audio manager shares the sound data with any pre-cached sound)
             obj = self._engine.base.loader.loadSfx(filename)
             self._to_destroy.append(obj)
             obj.setVolume(volume)
@@ -330,6 +394,8 @@ class BasicStimuli:
               bordercolor=(0,0,0,0),    # the border color of the movie texture (only visible when the contentoffset and contentscale are used
               ):
         """Play a movie. Note: Sound for movies only works with OpenAL (rather than FMOD) -- see documentation at http://www.panda3d.org/manual/index.php/Sound on how to select it."""
+        if parent is None:
+            parent = self._engine.parent
 
         # load the sound track if there is one
         try:
@@ -424,65 +490,69 @@ class BasicStimuli:
         """Pre-cache a sound file."""
         if filename is None:
             return
-        return self._engine.base.loader.loadSfx(filename)
+        return self._engine.cache.get('sound',filename)
     
     def precache_picture(self,filename):
         """Pre-cache a picture file."""
         if filename is None:
             return
-        return self._engine.base.loader.loadTexture(filename)
+        return self._engine.cache.get('picture',filename)
 
     def precache_model(self,filename):
         """Pre-cache a model file."""
         if filename is None:
             return
-        return self._engine.base.loader.loadModel(filename)
+        # return a separate copy of the cached model (as the loader does)
+        model = self._engine.cache.get('model',filename)
+        return self._engine.pandac.NodePath(model.node().copySubgraph())
     
     def precache_movie(self,filename):
         """Pre-cache a movie file."""
         if filename is None:
             return
         try:
-            self._engine.base.loader.loadTexture(filename)
-        except:
-            pass
-        try:
-            return self._engine.base.loader.loadSfx(filename)
+            return self._engine.cache.get('movie',filename)[1]
         except:
             pass
+
+    def precache_many(self,
+                      filenames,        # list of file names or (kind,filename) pairs, where kind is 'picture', 'sound', 'model', 'movie' or 'font'
+                      kind=None,        # the kind of all assets; if None, deduced from the file extensions
+                      block=False):     # whether to wait until all assets have been loaded 
+        """
+        Pre-cache a batch of media files using a pool of background threads. Returns a handle whose 
+        .finished(), .wait() and .progress() methods can be used to track the progress.
+        """
+        job = self._engine.cache.precache_many(filenames,kind)
+        if block:
+            job.wait()
+        return job
     
     def uncache_sound(self,filename):
         """Un-cache a previously cached sound file."""
         if filename is None:
             return
-        # get the handle
-        h = self._engine.base.loader.loadSfx(filename)
-        # remove it
-        self._engine.base.loader.unloadSfx(h)
+        self._engine.cache.uncache('sound',filename)
 
     def uncache_picture(self,filename):
         """Un-cache a previously cached picture file."""
         if filename is None:
             return
-        # get the handle
-        h = self._engine.base.loader.loadTexture(filename)
-        # remove it
-        self._engine.base.loader.unloadTexture(h)
+        self._engine.cache.uncache('picture',filename)
 
     def uncache_movie(self,filename):
         """Un-cache a previously cached movie file."""
         if filename is None:
             return
-        try:
-            h = self._engine.base.loader.loadTexture(filename)
-            self._engine.base.loader.unloadTexture(h)
-        except:
-            pass
-        try:
-            h = self._engine.base.loader.loadSfx(filename)
-            self._engine.base.loader.unloadSfx(h)
-        except:
-            pass
+        self._engine.cache.uncache('movie',filename)
+
+    def set_media_budget(self,budget):
+        """Set the memory budget (in bytes) of the media cache; least recently used media are evicted beyond that."""
+        self._engine.cache.budget = budget
+
+    def media_cache_stats(self):
+        """Get a dictionary of media cache statistics (entries, bytes, budget, hits, misses, evictions, hit_rate)."""
+        return self._engine.cache.stats()
 
 
     # =========================
@@ -498,18 +568,29 @@ class BasicStimuli:
     def set_engine(self,
                    base,        # the global base object -- contains core global runtime variables of Panda3d (taskMgr, eventMgr, jobMgr, render, ...) 
                    direct,      # the Python layer of Panda3d -- contains packages task, showbase, actor, and so on 
-                   pandac):     # the C++ layer of Panda3d (this is actually the package pandac.PandaModules) -- contains modules like NodePath, Point3, and so on
+                   pandac,      # the C++ layer of Panda3d (this is actually the package pandac.PandaModules) -- contains modules like NodePath, Point3, and so on
+                   parent=None):# the default parent of the 2d stimuli (e.g. the aspect2d of another window), or None for the engine's aspect2d
         """
-        This function allows to retarget the engine used for stimulus presentation, for example to present stimuli on a different computer.
-        Note that this incurs significant latency, however, so that it can not be used for latency-sensitive stimulus presentation.
+        This function allows to retarget the engine used for stimulus presentation, for example to present stimuli on a different computer
+        (note that this incurs significant latency, however, so that it can not be used for latency-sensitive stimulus presentation),
+        or in a different window of the same engine.
         """  
         class Engine:
-            """The Engine is just a summary of the core components of Panda3d."""
-            def __init__(self,base,direct,pandac):
+            """The Engine is just a summary of the core components of Panda3d (plus the media cache of its loader)."""
+            def __init__(self,base,direct,pandac,parent):
                 self.base = base
                 self.direct = direct
                 self.pandac = pandac
-        self._engine = Engine(base,direct,pandac) 
+                self.parent = parent
+                self.cache = framework.mediacache.get_cache(base.loader)
+                # on an engine in another process, stimuli pass file names through to be loaded there, since fetching 
+                # media from the cache would take several round trips each
+                self.remote = isinstance(base.loader,rpyc.core.netref.BaseNetref)
+        self._engine = Engine(base,direct,pandac,parent) 
+
+    def _has_custom_engine(self):
+        """Internal helper to check whether the stimuli are retargeted to an engine or window other than the global one (see set_engine())."""
+        return self._engine.parent is not None or self._engine.base is not base
     
     def _destroy_object(self,obj,id=-1):
         """Internal helper to automatically destroy a stimulus object."""
@@ -0,0 +1,173 @@
+"""
+Clock service for SNAP.
+
+The framework reads the current time via now() (rather than calling time.time() directly) for all
+experiment timing, i.e. sleep() and the other time-consumption functions, tick deltas, stimulus onsets,
+scores/timeouts and marker timestamps. The clock can be replaced via set_clock() (before any module is
+loaded); the following clocks are available:
+
+ * MonotonicClock: the default; a high-resolution clock that is not affected by adjustments of the
+   system time (e.g. NTP), anchored to the wall-clock time at which it was created
+ * LSLClock: reads LSL's local_clock(), so that all timestamps are in the same clock domain as the
+   lab streaming layer (and event markers need no clock-offset correction)
+ * AcceleratedClock: runs at a fixed multiple of real time (e.g., for faster-than-real-time simulation)
+ * VirtualClock: advances only when told to; this is used by the launcher's headless mode to run
+   experiments faster than real time (one fixed time step per frame)
+ * RealClock: the plain wall clock (time.time()), as in earlier versions of SNAP
+"""
+
+import time
+import sys
+
+
+class RealClock:
+    """The wall clock (time.time())."""
+
+    virtual = False                     # whether the clock is decoupled from real time
+    domain = 'wall'                     # the clock domain in which time points are expressed
+    rate = 1.0                          # clock seconds per real second (None if the clock does not advance by itself)
+
+    def now(self):
+        return time.time()
+
+
+class MonotonicClock:
+    """A high-resolution monotonic clock, anchored to the wall-clock time at which it was created."""
+
+    virtual = False                     # whether the clock is decoupled from real time
+    domain = 'wall'                     # the clock domain in which time points are expressed
+    rate = 1.0                          # clock seconds per real second (None if the clock does not advance by itself)
+
+    def __init__(self):
+        self._read = _monotonic_source()
+        self._offset = time.time() - self._read()
+
+    def now(self):
+        return self._read() + self._offset
+
+
+class LSLClock:
+    """LSL's local_clock(); time points are directly usable as LSL sample timestamps."""
+
+    virtual = False                     # whether the clock is decoupled from real time
+    domain = 'lsl'                      # the clock domain in which time points are expressed
+    rate = 1.0                          # clock seconds per real second (None if the clock does not advance by itself)
+
+    def __init__(self):
+        from pylsl.pylsl import local_clock
+        self.now = local_clock
+
+
+class AcceleratedClock:
+    """A clock that runs at a fixed multiple of real time."""
+
+    virtual = True                      # whether the clock is decoupled from real time
+    domain = 'virtual'                  # the clock domain in which time points are expressed
+
+    def __init__(self,
+                 speed=1.0,             # clock seconds per real second (e.g. 10 runs ten times faster than real time)
+                 start=None):           # the initial time of the clock (defaults to the current wall-clock time)
+        if speed <= 0:
+            raise ValueError("The clock speed must be positive.")
+        self.rate = float(speed)
+        self._read = _monotonic_source()
+        self._origin = self._read()
+        self._start = time.time() if start is None else start
+
+    def now(self):
+        return self._start + (self._read() - self._origin) * self.rate
+
+
+class VirtualClock:
+    """A clock that advances only when told to, e.g. by a fixed time step per frame."""
+
+    virtual = True                      # whether the clock is decoupled from real time
+    domain = 'virtual'                  # the clock domain in which time points are expressed
+    rate = None                         # clock seconds per real second (None if the clock does not advance by itself)
+
+    def __init__(self,
+                 start=None):           # the initial time of the clock (defaults to the current wall-clock time)
+        self._now = time.time() if start is None else start
+
+    def now(self):
+        return self._now
+
+    def advance(self,delta):
+        """Advance the clock by the given number of seconds."""
+        self._now += delta
+
+    def set(self,timepoint):
+        """Set the clock to the given time point (it never goes backwards)."""
+        if timepoint > self._now:
+            self._now = timepoint
+
+
+def now():
+    """Get the current time (in seconds) according to the installed clock."""
+    return clock.now()
+
+
+def is_virtual():
+    """Whether the installed clock is decoupled from real time."""
+    return clock.virtual
+
+
+def domain():
+    """Get the clock domain of the installed clock ('wall', 'lsl' or 'virtual')."""
+    return clock.domain
+
+
+def real_duration(seconds):
+    """Get the real-time duration that corresponds to the given number of clock seconds
+    (or None if the installed clock does not advance by itself)."""
+    if clock.rate is None:
+        return None
+    return max(seconds,0.0) / clock.rate
+
+
+def set_clock(c):
+    """Install the given clock (e.g. a VirtualClock); should be done before any module is loaded."""
+    global clock
+    clock = c
+
+
+def create_clock(name,speed=1.0):
+    """Create a clock by name ('monotonic', 'lsl', 'accelerated' or 'wall')."""
+    if name == 'monotonic':
+        return MonotonicClock()
+    elif name == 'lsl':
+        return LSLClock()
+    elif name == 'accelerated':
+        return AcceleratedClock(speed)
+    elif name == 'wall':
+        return RealClock()
+    raise ValueError("Unsupported clock: " + name)
+
+
+def _monotonic_source():
+    """Internal helper to get the best available monotonic high-resolution timer function."""
+    if sys.platform == 'win32':
+        # time.clock() is based on QueryPerformanceCounter on Windows
+        return time.clock
+    try:
+        import ctypes, ctypes.util, os
+        class timespec(ctypes.Structure):
+            _fields_ = [('tv_sec',ctypes.c_long),('tv_nsec',ctypes.c_long)]
+        librt = ctypes.CDLL(ctypes.util.find_library('rt') or ctypes.util.find_library('c'),use_errno=True)
+        clock_gettime = librt.clock_gettime
+        clock_gettime.argtypes = [ctypes.c_int,ctypes.POINTER(timespec)]
+        CLOCK_MONOTONIC = 4 if sys.platform.startswith('darwin') else 1
+        ts = timespec()
+        def read():
+            if clock_gettime(CLOCK_MONOTONIC,ctypes.pointer(ts)) != 0:
+                errno = ctypes.get_errno()
+                raise OSError(errno,os.strerror(errno))
+            return ts.tv_sec + ts.tv_nsec * 1e-9
+        read()
+        return read
+    except Exception:
+        return time.time
+
+
+# the currently installed clock
+clock = MonotonicClock()
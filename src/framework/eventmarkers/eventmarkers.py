@@ -1,10 +1,14 @@
 import time
 import os
+import framework.clock
 import socket
 import sys
+import collections
+import threading
+import atexit
 
 global marker_log
-marker_log = None
+marker_log = None               # the marker log; either a text file or a markerlog.MarkerLogWriter (binary format)
 
 global lsl_backend
 lsl_backend = None
@@ -12,16 +16,59 @@ lsl_backend = None
 global river_backend
 river_backend = None
 
+global marker_queue
+marker_queue = None             # queue of pending (markercode, timestamp, lsl timestamp) tuples if markers are dispatched asynchronously
 
+global marker_event
+marker_event = threading.Event()    # signals the dispatcher thread that new markers are pending
 
-def init_markers(lsl,logfile,datariver):
-    """ Initialize the marker protocols to use. """
+global dispatcher_thread
+dispatcher_thread = None        # the background thread that dispatches queued markers, if any
+
+global dispatch_lock
+dispatch_lock = threading.RLock()   # held while markers are taken from the queue and forwarded to the backends (so that batches go out in order) and while the marker log is written
+
+global marker_templates
+marker_templates = []           # the registered structured marker templates (indexed by template id)
+
+global template_ids
+template_ids = {}               # map from template string to template id
+
+global announced_templates
+announced_templates = set()     # ids of the templates that have been announced in-band on the LSL stream
+
+# how structured markers are sent via LSL: either 'expanded' (the fully formatted marker string) or 'compact' 
+# ('#<template id>|<field 1>|<field 2>|...'; each template is announced once, either in the stream's meta-data
+# if it was registered before init_markers() or otherwise in-band by a marker of the form
+# 'Experiment Control/Marker Templates/Define/{identifier:<template id>}/<template>' before its first use)
+structured_lsl_format = 'expanded'
+
+# the interval (in seconds) at which the marker log is flushed to disk when dispatching asynchronously
+LOG_FLUSH_INTERVAL = 1.0
+
+# the buffer size of the marker log file when dispatching asynchronously
+LOG_BUFFER_SIZE = 65536
+
+
+
+def init_markers(lsl,logfile,datariver,async_dispatch=False,logformat='text'):
+    """ 
+    Initialize the marker protocols to use. If async_dispatch is True, send_marker() only timestamps
+    and enqueues the markers and a background thread forwards them in batches to the backends.
+    The logformat can be either 'text' (logs/markerlog-N.log) or 'binary' (logs/markerlog-N.mlog, 
+    see markerlog.py).
+    """
 
     if lsl:
         try:
             global lsl_backend
             import pylsl.pylsl as pylsl
             info = pylsl.stream_info("SNAP-Markers","Markers",1,0,pylsl.cf_string,"SNAPmarkers-" + socket.gethostname() + time.asctime())
+            # announce the structured marker templates that are known at this point
+            templates = info.desc().append_child("templates")
+            for id,template in enumerate(marker_templates):
+                templates.append_child("template").append_child_value("identifier",str(id)).append_child_value("format",template)
+                announced_templates.add(id)
             lsl_backend = pylsl.stream_outlet(info)
             lsl_backend.pylsl = pylsl
             print "The lab streaming layer is ready for sending markers."
@@ -30,13 +77,19 @@ def init_markers(lsl,logfile,datariver):
             
     if logfile:
         try:
-            # find a new slot for the logfiles
-            for k in xrange(10000):
-                fname = 'logs/markerlog-' + str(k) + '.log'
-                if not os.path.exists(fname):
-                    global marker_log
-                    marker_log = open(fname,'w')
-                    break
+            # find a new slot for the logfiles (after the highest-numbered existing log of either format)
+            slots = [-1]
+            for existing in os.listdir('logs'):
+                stem,ext = os.path.splitext(existing)
+                if stem.startswith('markerlog-') and ext in ('.log','.mlog') and stem[10:].isdigit():
+                    slots.append(int(stem[10:]))
+            global marker_log
+            if logformat == 'binary':
+                import framework.eventmarkers.markerlog
+                marker_log = framework.eventmarkers.markerlog.MarkerLogWriter('logs/markerlog-' + str(max(slots)+1) + '.mlog',LOG_BUFFER_SIZE if async_dispatch else -1)
+                atexit.register(close_marker_log)
+            else:
+                marker_log = open('logs/markerlog-' + str(max(slots)+1) + '.log','w',LOG_BUFFER_SIZE if async_dispatch else -1)
             print "A marker logfile has been prepared for logging."
         except:
             print "Error initializing the marker logging. Your event markers will not be logged into a file."
@@ -51,18 +104,176 @@ def init_markers(lsl,logfile,datariver):
         except:
             print "Error initializing the DataRiver backend. You will not be able to send and record event markers via DataRiver."
 
+    if async_dispatch:
+        global marker_queue, dispatcher_thread
+        marker_queue = collections.deque()
+        dispatcher_thread = threading.Thread(target=_dispatch_markers)
+        dispatcher_thread.daemon = True
+        dispatcher_thread.start()
+        atexit.register(_stop_dispatcher)
+        print "Markers will be dispatched asynchronously."
+
 
-def send_marker(markercode):
-    """Global marker sending / logging function."""
+def send_marker(markercode,timestamp=None):
+    """
+    Global marker sending / logging function. The timestamp, if given, is the framework.clock.now() at 
+    which the marked event happens (or will happen, e.g., for a predicted stimulus onset); 
+    by default the current time is used.
+    """
     
+    now = framework.clock.now()
+    if timestamp is None:
+        timestamp = now
+
     global lsl_backend
     if lsl_backend is not None:
-        lsl_backend.push_sample(lsl_backend.pylsl.vectorstr([str(markercode)]), lsl_backend.pylsl.local_clock(), True)
+        if framework.clock.domain() == 'lsl':
+            # the framework clock is LSL's clock, so the timestamp can be used as-is
+            lsl_timestamp = timestamp
+        else:
+            lsl_timestamp = lsl_backend.pylsl.local_clock() + (timestamp - now)
+    else:
+        lsl_timestamp = None
+
+    global marker_queue
+    if marker_queue is not None:
+        # defer the actual sending to the dispatcher thread
+        marker_queue.append((markercode,timestamp,lsl_timestamp))
+        marker_event.set()
+    else:
+        _send_batch([(markercode,timestamp,lsl_timestamp)])
+
+
+def register_marker_template(template):
+    """
+    Register a structured marker template (a %-format string, e.g. 'Stimulus/Item/{identifier:%i}, Participants/ID/%i')
+    and get its template id for use with send_structured_marker(). Registering the same template again yields the same id.
+    """
+    id = template_ids.get(template)
+    if id is None:
+        id = len(marker_templates)
+        marker_templates.append(template)
+        template_ids[template] = id
+    return id
+
+
+def send_structured_marker(template_id,*fields,**kwargs):
+    """
+    Send a marker given by a registered template id (see register_marker_template) and the fields to fill in. 
+    The formatting is deferred to the marker dispatcher (if dispatching asynchronously). A timestamp can 
+    be passed as keyword argument, as in send_marker().
+    """
+    send_marker(StructuredMarker(template_id,fields),kwargs.get('timestamp'))
+
 
+class StructuredMarker(object):
+    """A marker that is given by a template id and the fields to fill in; formatted lazily via str()."""
+    __slots__ = ['template_id','fields']
+
+    def __init__(self,template_id,fields):
+        self.template_id = template_id
+        self.fields = fields
+
+    def __str__(self):
+        return marker_templates[self.template_id] % self.fields
+
+    def compact(self):
+        """Get the compact representation of the marker ('#<template id>|<field 1>|<field 2>|...')."""
+        return '#' + str(self.template_id) + ''.join(['|' + str(f) for f in self.fields])
+
+
+def flush_markers():
+    """Forward all pending markers to the backends and flush the marker log (if dispatching asynchronously)."""
+    with dispatch_lock:
+        global marker_queue
+        if marker_queue is not None:
+            _send_batch(_drain_queue())
+        global marker_log
+        if marker_log is not None:
+            try:
+                marker_log.flush()
+            except:
+                pass
+
+
+def close_marker_log():
+    """Forward all pending markers and close the marker log (writes the index of a binary log)."""
     global marker_log
-    if marker_log is not None:
-        marker_log.write(repr(time.time()) + ': ' + str(markercode) + '\n')
+    with dispatch_lock:
+        flush_markers()
+        if marker_log is not None:
+            log = marker_log
+            marker_log = None
+            log.close()
+
+
+def _drain_queue():
+    """Internal helper to remove all currently pending markers from the queue (dispatch_lock must be held, so that the batch is sent before any later one)."""
+    batch = []
+    try:
+        while True:
+            batch.append(marker_queue.popleft())
+    except IndexError:
+        pass
+    return batch
 
-    global river_backend
-    if river_backend is not None:
-        river_backend.send_marker(int(markercode))
+
+def _send_batch(batch):
+    """Internal helper to forward a batch of (markercode, timestamp, lsl timestamp) tuples to the backends."""
+    with dispatch_lock:
+        global lsl_backend
+        if lsl_backend is not None:
+            last = len(batch)-1
+            for k,(markercode,timestamp,lsl_timestamp) in enumerate(batch):
+                if structured_lsl_format == 'compact' and isinstance(markercode,StructuredMarker):
+                    if markercode.template_id not in announced_templates:
+                        # announce the template before its first use
+                        definition = 'Experiment Control/Marker Templates/Define/{identifier:%i}/%s' % (markercode.template_id,marker_templates[markercode.template_id])
+                        lsl_backend.push_sample(lsl_backend.pylsl.vectorstr([definition]), lsl_timestamp, False)
+                        announced_templates.add(markercode.template_id)
+                    code = markercode.compact()
+                else:
+                    code = str(markercode)
+                # only the last sample of the batch flushes the outlet (so the batch goes out as one chunk)
+                lsl_backend.push_sample(lsl_backend.pylsl.vectorstr([code]), lsl_timestamp, k == last)
+
+        global marker_log
+        if marker_log is not None:
+            if hasattr(marker_log,'write_marker'):
+                for (markercode,timestamp,lsl_timestamp) in batch:
+                    marker_log.write_marker(timestamp,markercode)
+            else:
+                marker_log.write(''.join([repr(timestamp) + ': ' + str(markercode) + '\n' for (markercode,timestamp,lsl_timestamp) in batch]))
+
+        global river_backend
+        if river_backend is not None:
+            for (markercode,timestamp,lsl_timestamp) in batch:
+                river_backend.send_marker(int(markercode))
+
+
+def _stop_dispatcher():
+    """Internal helper to shut down the dispatcher thread (at exit) after all pending markers have been sent."""
+    global dispatcher_thread
+    thread = dispatcher_thread
+    dispatcher_thread = None
+    marker_event.set()
+    thread.join(1.0)
+    flush_markers()
+
+
+def _dispatch_markers():
+    """Internal dispatcher thread that forwards queued markers in batches and periodically flushes the marker log."""
+    last_flush = time.time()
+    while dispatcher_thread is not None:
+        marker_event.wait(LOG_FLUSH_INTERVAL)
+        marker_event.clear()
+        try:
+            with dispatch_lock:
+                batch = _drain_queue()
+                if len(batch) > 0:
+                    _send_batch(batch)
+                if marker_log is not None and time.time() - last_flush >= LOG_FLUSH_INTERVAL:
+                    marker_log.flush()
+                    last_flush = time.time()
+        except Exception as e:
+            print "Error while dispatching markers:", e
@@ -0,0 +1,258 @@
+"""
+Compact binary marker log format (.mlog) with a reader for post-hoc analysis.
+
+The file starts with a header (magic 'SNAPMLOG' and a format version), followed by a sequence of records:
+* string records ('S'): uint32 id, uint32 length, the marker string (each distinct marker string is stored once)
+* marker records ('M'): float64 timestamp (framework.clock.now()), uint32 id of the marker string
+When the log is closed, a footer ('X') is appended that contains the complete string table and a sparse
+time index (file offset, min and max timestamp and number of markers of every block of BLOCK_SIZE markers),
+followed by the offset of the footer and the magic 'SNAPMEND'. If a log has not been closed properly
+(e.g., after a crash), the reader recovers the string table and index by scanning the file.
+
+Usage:
+    reader = MarkerLogReader('logs/markerlog-3.mlog')
+    for timestamp,code in reader.read(t0,t1):
+        ...
+    convert_to_text('logs/markerlog-3.mlog','logs/markerlog-3.log')
+
+Can also be run as a script to convert a binary log to the text format:
+    python markerlog.py logs/markerlog-3.mlog [logs/markerlog-3.log]
+"""
+
+import struct
+import sys
+
+MAGIC = 'SNAPMLOG'
+END_MAGIC = 'SNAPMEND'
+VERSION = 1
+
+# the number of markers per block of the sparse time index
+BLOCK_SIZE = 1000
+
+HEADER = struct.Struct('<8sH')
+STRING_RECORD = struct.Struct('<BII')
+MARKER_RECORD = struct.Struct('<BdI')
+FOOTER_RECORD = struct.Struct('<BII')
+FOOTER_STRING = struct.Struct('<II')
+FOOTER_BLOCK = struct.Struct('<QddI')
+TRAILER = struct.Struct('<Q8s')
+
+STRING_TAG = ord('S')
+MARKER_TAG = ord('M')
+FOOTER_TAG = ord('X')
+
+
+class MarkerLogWriter:
+    """Append-only writer for the binary marker log format."""
+
+    def __init__(self,
+                 filename,              # the name of the file to create
+                 buffering=-1):         # the buffer size of the file (as in open())
+        self.name = filename
+        self._file = open(filename,'wb',buffering)
+        self._file.write(HEADER.pack(MAGIC,VERSION))
+        self._offset = HEADER.size      # current write offset
+        self._strings = {}              # table of interned marker strings (string -> id)
+        self._blocks = []               # the sparse time index: list of [offset, min timestamp, max timestamp, count]
+
+
+    def write_marker(self,timestamp,markercode):
+        """Append a marker with the given framework.clock.now() timestamp; the markercode can be a string or a number."""
+        code = _encode(markercode)
+        parts = []
+        id = self._strings.get(code)
+        if id is None:
+            # intern the string
+            id = len(self._strings)
+            self._strings[code] = id
+            parts.append(STRING_RECORD.pack(STRING_TAG,id,len(code)))
+            parts.append(code)
+        # update the sparse time index
+        if len(self._blocks) == 0 or self._blocks[-1][3] >= BLOCK_SIZE:
+            self._blocks.append([self._offset + sum([len(p) for p in parts]),timestamp,timestamp,0])
+        block = self._blocks[-1]
+        if timestamp < block[1]:
+            block[1] = timestamp
+        if timestamp > block[2]:
+            block[2] = timestamp
+        block[3] += 1
+        parts.append(MARKER_RECORD.pack(MARKER_TAG,timestamp,id))
+        data = ''.join(parts)
+        self._file.write(data)
+        self._offset += len(data)
+
+
+    def flush(self):
+        """Flush buffered data to disk."""
+        self._file.flush()
+
+
+    def close(self):
+        """Write the footer (string table and time index) and close the file."""
+        if self._file.closed:
+            return
+        parts = [FOOTER_RECORD.pack(FOOTER_TAG,len(self._strings),len(self._blocks))]
+        for code,id in self._strings.iteritems():
+            parts.append(FOOTER_STRING.pack(id,len(code)))
+            parts.append(code)
+        for block in self._blocks:
+            parts.append(FOOTER_BLOCK.pack(*block))
+        parts.append(TRAILER.pack(self._offset,END_MAGIC))
+        self._file.write(''.join(parts))
+        self._file.close()
+
+
+class MarkerLogReader:
+    """Reader for the binary marker log format that supports reading time ranges."""
+
+    def __init__(self,filename):
+        self.name = filename
+        self._file = open(filename,'rb')
+        magic,version = HEADER.unpack(self._file.read(HEADER.size))
+        if magic != MAGIC:
+            raise IOError('The file "' + filename + '" is not a SNAP binary marker log.')
+        if version > VERSION:
+            raise IOError('The file "' + filename + '" has an unsupported format version (' + str(version) + ').')
+        self.strings = {}               # table of marker strings (id -> string)
+        self.blocks = []                # the sparse time index: list of (offset, min timestamp, max timestamp, count)
+        if not self._read_footer():
+            self._scan()
+
+
+    def __len__(self):
+        """The number of markers in the log."""
+        return sum([b[3] for b in self.blocks])
+
+
+    def time_range(self):
+        """Get the (first,last) timestamp in the log, or None if the log is empty."""
+        if len(self.blocks) == 0:
+            return None
+        return (min([b[1] for b in self.blocks]),max([b[2] for b in self.blocks]))
+
+
+    def read(self,
+             t0=None,       # the beginning of the time range to read (inclusive), or None for the beginning of the log
+             t1=None):      # the end of the time range to read (exclusive), or None for the end of the log
+        """Iterate over the (timestamp, markercode) pairs within the given time range, in the order in which they were logged."""
+        if t0 is None:
+            t0 = float('-inf')
+        if t1 is None:
+            t1 = float('inf')
+        for offset,bmin,bmax,count in self.blocks:
+            # skip blocks that do not overlap the time range
+            if bmax < t0 or bmin >= t1:
+                continue
+            self._file.seek(offset)
+            for timestamp,id in self._read_markers(count):
+                if t0 <= timestamp < t1:
+                    yield (timestamp,self.strings[id])
+
+
+    def close(self):
+        self._file.close()
+
+
+    def _read_markers(self,count):
+        """Internal helper to read the next count marker records from the current position (skipping string records)."""
+        f = self._file
+        while count > 0:
+            tag = f.read(1)
+            if len(tag) == 0:
+                return
+            if ord(tag) == MARKER_TAG:
+                data = f.read(MARKER_RECORD.size-1)
+                if len(data) < MARKER_RECORD.size-1:
+                    return
+                tag,timestamp,id = MARKER_RECORD.unpack(tag + data)
+                count -= 1
+                yield (timestamp,id)
+            elif ord(tag) == STRING_TAG:
+                tag,id,length = STRING_RECORD.unpack(tag + f.read(STRING_RECORD.size-1))
+                f.seek(length,1)
+            else:
+                return
+
+
+    def _read_footer(self):
+        """Internal helper to read the string table and time index from the footer; returns False if there is none."""
+        f = self._file
+        f.seek(0,2)
+        size = f.tell()
+        if size < HEADER.size + TRAILER.size:
+            return False
+        f.seek(size - TRAILER.size)
+        offset,magic = TRAILER.unpack(f.read(TRAILER.size))
+        if magic != END_MAGIC:
+            return False
+        f.seek(offset)
+        tag,num_strings,num_blocks = FOOTER_RECORD.unpack(f.read(FOOTER_RECORD.size))
+        for k in xrange(num_strings):
+            id,length = FOOTER_STRING.unpack(f.read(FOOTER_STRING.size))
+            self.strings[id] = f.read(length)
+        for k in xrange(num_blocks):
+            self.blocks.append(FOOTER_BLOCK.unpack(f.read(FOOTER_BLOCK.size)))
+        return True
+
+
+    def _scan(self):
+        """Internal helper to recover the string table and time index of a log that has not been closed properly."""
+        f = self._file
+        f.seek(HEADER.size)
+        block = None
+        while True:
+            offset = f.tell()
+            tag = f.read(1)
+            if len(tag) == 0:
+                break
+            if ord(tag) == STRING_TAG:
+                data = f.read(STRING_RECORD.size-1)
+                if len(data) < STRING_RECORD.size-1:
+                    break
+                tag,id,length = STRING_RECORD.unpack(tag + data)
+                code = f.read(length)
+                if len(code) < length:
+                    break
+                self.strings[id] = code
+            elif ord(tag) == MARKER_TAG:
+                data = f.read(MARKER_RECORD.size-1)
+                if len(data) < MARKER_RECORD.size-1:
+                    break
+                tag,timestamp,id = MARKER_RECORD.unpack(tag + data)
+                if block is None or block[3] >= BLOCK_SIZE:
+                    block = [offset,timestamp,timestamp,0]
+                    self.blocks.append(block)
+                block[1] = min(block[1],timestamp)
+                block[2] = max(block[2],timestamp)
+                block[3] += 1
+            else:
+                break
+        self.blocks = [tuple(b) for b in self.blocks]
+
+
+def convert_to_text(infile,outfile=None):
+    """Convert a binary marker log into the text format (lines of the form 'timestamp: markercode'). Returns the name of the text file."""
+    if outfile is None:
+        outfile = (infile[:-5] if infile.endswith('.mlog') else infile) + '.log'
+    reader = MarkerLogReader(infile)
+    try:
+        with open(outfile,'w') as f:
+            for timestamp,code in reader.read():
+                f.write(repr(timestamp) + ': ' + code + '\n')
+    finally:
+        reader.close()
+    return outfile
+
+
+def _encode(markercode):
+    """Internal helper to turn a marker code into a byte string."""
+    if isinstance(markercode,unicode):
+        return markercode.encode('utf-8')
+    return str(markercode)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        print 'Usage: python markerlog.py infile.mlog [outfile.log]'
+    else:
+        print 'Wrote', convert_to_text(sys.argv[1],sys.argv[2] if len(sys.argv) > 2 else None)
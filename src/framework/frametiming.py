@@ -0,0 +1,181 @@
+"""
+Frame-timing instrumentation for the SNAP main loop.
+
+A single global FrameTimingRecorder (see recorder below) is fed by LatentModule.tick() and
+LatentModule.sleep(); it keeps fixed-size ring buffers of the most recent inter-frame intervals,
+of how late each sleep() resumed compared to its nominal resume time, of the time spent in the
+tick functions and in the sub-task ticks, and of the number of sub-tasks woken up per frame. The
+statistics can be queried via the launcher's remote-control port (command "timing") and can
+optionally be streamed out via the lab streaming layer.
+"""
+
+import collections
+import threading
+import socket
+import time
+
+
+class FrameTimingRecorder:
+    """
+    Ring-buffer recorder for frame timing statistics. All times are in seconds.
+
+    The recorder is thread-safe; it is written to from the engine thread (tick) and from latent
+    code (sleep), and read out from the remote-control server thread.
+    """
+
+    def __init__(self,
+                 capacity=1000):    # the number of most recent measurements to retain per quantity
+        self._lock = threading.Lock()
+        self._lsl_outlet = None     # optional LSL outlet for streaming out per-frame measurements (see enable_lsl_stream)
+        self.resize(capacity)
+
+
+    def resize(self,capacity):
+        """Change the capacity of the ring buffers; this discards all previous measurements."""
+        with self._lock:
+            self.capacity = capacity
+            self.intervals = collections.deque(maxlen=capacity)     # inter-frame intervals
+            self.lateness = collections.deque(maxlen=capacity)      # how late each sleep() resumed relative to its nominal resume time
+            self.tick_times = collections.deque(maxlen=capacity)    # time spent in the current/default tick function per frame
+            self.subtask_times = collections.deque(maxlen=capacity) # time spent in ticking sub-tasks per frame
+            self.woken = collections.deque(maxlen=capacity)         # number of sub-tasks woken up from the wake-up queue per frame
+            self.num_frames = 0                 # total number of frames recorded
+            self.num_hiccups = 0                # number of frames whose interval exceeded the module's max_inter_frame_interval
+            self.last_frame_time = None         # the framework.clock.now() at which the most recent frame was ticked
+            self._frame_lateness = 0.0          # max lateness of the sleep()'s that resumed during the current frame
+
+
+    def record_frame(self,
+                     interval,          # the time since the previous frame
+                     tick_time,         # time spent in the current or default tick function
+                     subtask_time,      # time spent ticking the sub-tasks
+                     hiccup=False,      # whether the interval was considered a hiccup
+                     woken=0):          # the number of sub-tasks that were woken up during the frame
+        """Record the timing of one frame (called by the root LatentModule's tick())."""
+        with self._lock:
+            self.intervals.append(interval)
+            self.tick_times.append(tick_time)
+            self.subtask_times.append(subtask_time)
+            self.woken.append(woken)
+            self.num_frames += 1
+            if hiccup:
+                self.num_hiccups += 1
+            lateness = self._frame_lateness
+            self._frame_lateness = 0.0
+        if self._lsl_outlet is not None:
+            try:
+                self._lsl_outlet.push_sample(self._lsl_outlet.pylsl.vectorf([interval,tick_time,subtask_time,lateness,woken]))
+            except:
+                pass
+
+
+    def begin_frame(self,timestamp):
+        """Record the framework.clock.now() at which the current frame is being ticked (called by the root LatentModule's tick())."""
+        self.last_frame_time = timestamp
+
+
+    def record_lateness(self,lateness):
+        """Record by how much a sleep() resumed after its nominal resume time (negative if early)."""
+        with self._lock:
+            self.lateness.append(lateness)
+            if lateness > self._frame_lateness:
+                self._frame_lateness = lateness
+
+
+    def last_interval(self):
+        """Get the most recent inter-frame interval, or None if no frame has been recorded yet."""
+        with self._lock:
+            if len(self.intervals) > 0:
+                return self.intervals[-1]
+        return None
+
+
+    def frame_period(self,
+                     window=60,         # the number of most recent frames to consider
+                     default=1/60.0):   # the value to assume if no frames have been recorded yet
+        """
+        Get a robust estimate of the current frame period (the median of the most recent inter-frame intervals).
+        """
+        with self._lock:
+            n = len(self.intervals)
+            values = [self.intervals[k] for k in xrange(max(0,n-window),n)]
+        if len(values) == 0:
+            return default
+        values.sort()
+        return values[len(values)//2]
+
+
+    def predict_flip(self,
+                     frames_ahead=0,    # the number of frames after the most recently ticked one at which the content is rendered
+                     flip_latency=1.0): # the number of frame periods between the tick of a frame and its buffer flip 
+        """
+        Predict the framework.clock.now() at which content that is rendered frames_ahead frames after the most
+        recently ticked frame will appear on screen. Returns None if no frame has been recorded yet.
+        """
+        if self.last_frame_time is None:
+            return None
+        return self.last_frame_time + (frames_ahead + flip_latency)*self.frame_period()
+
+
+    def summary(self):
+        """Get a dictionary of summary statistics over the currently retained measurements."""
+        with self._lock:
+            result = {'frames':self.num_frames, 'hiccups':self.num_hiccups}
+            for name,values in (('interval',self.intervals),('lateness',self.lateness),('tick',self.tick_times),('subtasks',self.subtask_times)):
+                result[name] = _describe(list(values))
+            result['woken'] = _describe([float(v) for v in self.woken])
+            return result
+
+
+    def report(self):
+        """Get a human-readable, single-line-per-quantity report of the summary statistics (times in milliseconds)."""
+        s = self.summary()
+        lines = ['frames=%i hiccups=%i' % (s['frames'],s['hiccups'])]
+        for name in ('interval','lateness','tick','subtasks'):
+            d = s[name]
+            if d['count'] == 0:
+                lines.append('%s: n/a' % name)
+            else:
+                lines.append('%s: n=%i mean=%.3f std=%.3f min=%.3f median=%.3f p99=%.3f max=%.3f' % (name,d['count'],1000*d['mean'],1000*d['std'],1000*d['min'],1000*d['median'],1000*d['p99'],1000*d['max']))
+        d = s['woken']
+        if d['count'] > 0:
+            lines.append('woken: mean=%.2f max=%i' % (d['mean'],d['max']))
+        return '\n'.join(lines)
+
+
+    def enable_lsl_stream(self,name="SNAP-FrameTiming"):
+        """
+        Stream out per-frame measurements via the lab streaming layer; each sample has the channels
+        interval, tick, subtasks, lateness (the max lateness of any sleep() that resumed during the frame) and
+        woken (the number of sub-tasks woken up during the frame).
+        Returns whether the stream could be created.
+        """
+        try:
+            import pylsl.pylsl as pylsl
+            info = pylsl.stream_info(name,"FrameTiming",5,0,pylsl.cf_float32,"SNAPtiming-" + socket.gethostname() + time.asctime())
+            channels = info.desc().append_child("channels")
+            for label in ['interval','tick','subtasks','lateness','woken']:
+                channels.append_child("channel").append_child_value("label",label).append_child_value("unit","count" if label == 'woken' else "seconds")
+            self._lsl_outlet = pylsl.stream_outlet(info)
+            self._lsl_outlet.pylsl = pylsl
+            print "The frame timing is now being streamed via the lab streaming layer."
+            return True
+        except:
+            print "Error initializing the frame timing LSL stream."
+            return False
+
+
+def _describe(values):
+    """Internal helper to compute summary statistics of a list of numbers."""
+    n = len(values)
+    if n == 0:
+        return {'count':0}
+    values.sort()
+    mean = sum(values)/n
+    var = sum([(v-mean)**2 for v in values])/n
+    return {'count':n, 'mean':mean, 'std':var**0.5, 'min':values[0], 'max':values[-1],
+            'median':values[n//2], 'p99':values[min(n-1,int(0.99*n))]}
+
+
+# the global frame timing recorder
+recorder = FrameTimingRecorder()
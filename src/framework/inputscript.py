@@ -0,0 +1,70 @@
+"""
+Scripted input for unattended (e.g., headless) experiment runs.
+
+An input script is a text file in which each line schedules a Panda3d event (as if a key had been pressed
+or a device had sent it), in the form:
+
+    <time> <event> [<argument> ...]
+
+where time is in seconds since the script was started (or, if prefixed with '+', since the previous line),
+event is the event name (e.g. space, f, mouse1 or a custom event such as target-response) and the optional
+arguments are Python literals that are passed along with the event. Blank lines and lines starting with #
+are ignored. The special event name 'exit' ends the run. Example:
+
+    # confirm the instructions, then respond to the first two trials
+    2.0 space
+    +5.5 f
+    +1.25 j
+    600 exit
+"""
+
+import ast
+import framework.clock
+
+
+class InputScript:
+    """A sequence of timed events that is played back against the framework clock."""
+
+    def __init__(self,filename):
+        self.filename = filename
+        self.events = []                # list of (time offset, event name, argument list), sorted by time
+        self.position = 0               # index of the next event to send
+        self.start_time = None          # the framework.clock.now() at which the playback started (None if not yet started)
+        self.exit_requested = False     # whether the 'exit' event has been reached
+        offset = 0.0
+        with open(filename,'r') as f:
+            for lineno,line in enumerate(f,1):
+                line = line.strip()
+                if len(line) == 0 or line.startswith('#'):
+                    continue
+                parts = line.split(None,2)
+                if len(parts) < 2:
+                    raise ValueError(filename + ':' + str(lineno) + ': expected "<time> <event> [<arguments>]".')
+                try:
+                    offset = offset + float(parts[0][1:]) if parts[0].startswith('+') else float(parts[0])
+                    args = list(ast.literal_eval('(' + parts[2] + ',)')) if len(parts) > 2 else []
+                except (ValueError,SyntaxError),e:
+                    raise ValueError(filename + ':' + str(lineno) + ': ' + str(e))
+                self.events.append((offset,parts[1],args))
+        self.events.sort(key=lambda e: e[0])
+
+
+    def start(self):
+        """Start the playback at the current time."""
+        self.start_time = framework.clock.now()
+        self.position = 0
+
+
+    def poll(self):
+        """Send all events that are due by now (called once per frame); returns whether the script has finished."""
+        if self.start_time is None:
+            self.start()
+        elapsed = framework.clock.now() - self.start_time
+        while self.position < len(self.events) and self.events[self.position][0] <= elapsed:
+            offset,event,args = self.events[self.position]
+            self.position += 1
+            if event == 'exit':
+                self.exit_requested = True
+            else:
+                messenger.send(event,args)
+        return self.exit_requested or self.position >= len(self.events)
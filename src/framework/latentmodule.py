@@ -5,7 +5,13 @@
 
 import framework.tickmodule
 import framework.basicstimuli
-import threading, time, traceback
+import framework.frametiming
+import framework.clock
+import threading, time, traceback, inspect, heapq
+try:
+    import greenlet
+except ImportError:
+    greenlet = None
 
 class LatentModule(framework.tickmodule.TickModule, framework.basicstimuli.BasicStimuli):
     """
@@ -31,6 +37,14 @@ class LatentModule(framework.tickmodule.TickModule, framework.basicstimuli.Basic
     elaborate hierarchy of event handlers, sequences and intervals (as usual in Panda3d), or you
     can implement the majority of code as "regular code" with interleaved time-consumption functions,
     or mix these styles.
+    
+    By default, run() executes in its own thread. Alternatively, the 'coroutine' backend (see
+    framework.tickmodule.latent_backend) runs it as a coroutine on the engine thread, which is resumed
+    directly from tick(); this avoids thread switches and scales to hundreds of concurrent sub-tasks:
+    * if greenlet is installed, any run() function can be executed this way
+    * if run() is a generator function, it is driven without greenlet (regardless of the backend); in this 
+      case it must not call time-consumption functions but instead yield the number of seconds to sleep 
+      (or a tuple of the duration and a tick function), as in: yield 1.5
     """
 
     def __init__(self,
@@ -47,10 +61,14 @@ class LatentModule(framework.tickmodule.TickModule, framework.basicstimuli.Basic
         framework.basicstimuli.BasicStimuli.__init__(self)
 
         self._thread = None             # the internal runner thread; None if not running
+        self._backend = framework.tickmodule.latent_backend # the execution backend for run(); either 'thread' or 'coroutine'
+        self._coroutine = None          # the generator or greenlet that executes run() if using the coroutine backend; None if not running
         self._resumecond = threading.Condition(framework.tickmodule.shared_lock) # condition variable that signals that the sleep period is over
+        self._yieldcond = threading.Condition(framework.tickmodule.shared_lock)  # condition variable that signals that the runner thread has yielded (cooperative scheduling only)
+        self._in_slice = False          # whether the runner thread is currently executing a time slice handed to it by the engine (cooperative scheduling only)
         self._cancelled = False         # signals whether cancel() has been invoked (i.e. that run() shall terminate at the next opportunity)
 
-        now = time.time()
+        now = framework.clock.now()
         self._resumeat = now            # the point in time when the currently running time-consumption function should resume (if any)
         self._exectime = now            # the time point when the last time-consumption function was invoked
         self._lasttick = now            # the time point of the last tick()
@@ -63,6 +81,15 @@ class LatentModule(framework.tickmodule.TickModule, framework.basicstimuli.Basic
         self._default_tick = default_tick # the tick function that is running whenever no current tick function is specified
         
         self._subtasks = []             # optional list of any semi-parallel sub-tasks; tick and cancel are propagated down to them
+        self._is_subtask = False        # whether this module has been launch()ed as a sub-task of another module (only root modules record frame timing)
+        self._root = self               # the root module of the sub-task tree that this module belongs to (owns the wake-up queue)
+        self._record_frames = True      # whether this module feeds the frame timing statistics when ticked as a root module (the launcher
+                                        # enables this for only one of several concurrently executing modules)
+        self._wakeups = []              # wake-up queue of the sub-task tree: a heap of [resumeat, sequence number, task] entries (root module only)
+        self._wakeup_seq = 0            # sequence number of the most recent wake-up queue entry (root module only)
+        self._wakeup_lock = threading.Lock() # protects the wake-up queue against concurrent resume() calls (root module only)
+        self._ticking = {}              # the sub-tasks in the tree that need to be ticked every frame (or have pending messages), keyed by id (root module only)
+        self._self_ticking = {}         # the sub-tasks in the tree whose class overrides tick(); these are ticked via tick() every frame, keyed by id (root module only)
         self._messages = []             # queue of messages to be sent off at the next tick
         self._to_destroy = []           # list of objects to .destroy() upon cancel
 
@@ -86,12 +113,25 @@ class LatentModule(framework.tickmodule.TickModule, framework.basicstimuli.Basic
         """
         Launch a new latent sub-task that will be executed interleaved ("semi-parallel") with the current task.
         start(), cancel() and tick() will be executed for it automatically as appropriate.
+        If this task presents its stimuli on a non-default engine (e.g., in a session's own window, see set_engine()),
+        a sub-task that still uses the default engine is retargeted to the same engine.
         """
+        if self._has_custom_engine() and hasattr(newtask,'_has_custom_engine') and not newtask._has_custom_engine():
+            engine = self._engine
+            newtask.set_engine(base=engine.base,direct=engine.direct,pandac=engine.pandac,parent=engine.parent)
         if inherit_timing_parameters:
             newtask._make_up_for_lost_time = self._make_up_for_lost_time
             newtask._max_compensated_time = self._max_compensated_time
             newtask._max_inter_frame_interval = self._max_inter_frame_interval
+        newtask._is_subtask = True
+        newtask._backend = self._backend
+        newtask._root = self._root
+        if type(newtask).tick.__func__ is not LatentModule.tick.__func__:
+            # (the override may rely on being called once per frame, as documented for TickModule.tick)
+            self._root._self_ticking[id(newtask)] = newtask
         newtask.start()
+        # (sub-tasks that are no longer alive are pruned here rather than at every tick)
+        self._subtasks = [t for t in self._subtasks if t.is_alive()]
         self._subtasks.append(newtask)
         return newtask
 
@@ -105,20 +145,43 @@ class LatentModule(framework.tickmodule.TickModule, framework.basicstimuli.Basic
         Sleep for a number of seconds; optionally execute some tick function at every frame.
         Event handlers may fire during this time, and content is rendered every frame.
         """
-        self._exectime = time.time()
-        if self._make_up_for_lost_time and abs(self._resumeat - self._exectime) < self._max_compensated_time:
-            self._resumeat = self._resumeat + duration
-        else:
-            self._resumeat = self._exectime + duration
+        self._arm_sleep(duration,cur_tick)
+        self._wait_for_resume()
 
-        self._cur_tick = cur_tick
+
+    def sleep_until(self,timepoint,cur_tick=None):
+        """
+        Sleep until a given point in time (a framework.clock.now() value); optionally execute some tick function at every frame.
+        Unlike sleep(), this is not subject to lost-time compensation, i.e., it resumes at the frame that is closest to the timepoint.
+        """
+        self._arm_sleep(timepoint - framework.clock.now(),cur_tick,absolute=True)
+        self._wait_for_resume()
+
+
+    def _wait_for_resume(self):
+        """
+        Internal helper that waits until the current resume time has come up (or the module has been cancelled).
+        """
         if self._cancelled:
             # make sure that run() terminates
             raise self.ModuleCancelled
-        self._resumecond.wait(self._resumeat - self._exectime)
+        if self._coroutine is not None:
+            if greenlet is None or not isinstance(self._coroutine,greenlet.greenlet):
+                raise RuntimeError("A generator-based run() function must yield the sleep duration instead of calling time-consumption functions.")
+            # hand control back to whoever resumed us; we will be resumed from within tick()
+            self._coroutine.parent.switch()
+        elif framework.tickmodule.scheduling == 'cooperative':
+            # hand control back to the engine; we will be resumed from within tick()
+            self._yield_slice()
+            self._resumecond.wait()
+        else:
+            # wait for the corresponding real time (indefinitely if the clock is stepped externally; tick() will wake us up)
+            self._resumecond.wait(framework.clock.real_duration(self._resumeat - self._exectime))
         if self._cancelled:
             # make sure that run() terminates
             raise self.ModuleCancelled
+        # record how late we resumed relative to the nominal resume time
+        framework.frametiming.recorder.record_lateness(framework.clock.now() - self._resumeat)
 
 
     def waitfor(self,eventid,duration=100000,cur_tick=None):            
@@ -195,7 +258,7 @@ class LatentModule(framework.tickmodule.TickModule, framework.basicstimuli.Basic
         beginning of the watch period), or an empty list if it did not occur.
         """
         try:
-            self._measuretime = time.time()
+            self._measuretime = framework.clock.now()
             # register an event handler
             self._received_dict = {eventid:[]}
             self._events_received = []
@@ -225,7 +288,7 @@ class LatentModule(framework.tickmodule.TickModule, framework.basicstimuli.Basic
         as true, instead a list of event codes in order of appearance is returned 
         """
         try:
-            self._measuretime = time.time()
+            self._measuretime = framework.clock.now()
             # register event handlers and reset the dict
             self._received_dict = {}
             self._events_received = []
@@ -261,7 +324,7 @@ class LatentModule(framework.tickmodule.TickModule, framework.basicstimuli.Basic
         results = watchfor_multiple_end(h);
         """
         # register event handlers and reset the dict
-        self._measuretime = time.time()        
+        self._measuretime = framework.clock.now()        
         self._received_dict = {}
         self._events_received = []
         for eventid in eventids:
@@ -292,14 +355,15 @@ class LatentModule(framework.tickmodule.TickModule, framework.basicstimuli.Basic
         """
         Resume from a time-consumption function, e.g., in response to some event.
         """
-        self._resumeat = time.time()
+        self._resumeat = framework.clock.now()
+        self._schedule_wakeup()
 
 
     def consumed_duration(self):
         """
         The amount of time that has been consumed since the most recent time-consumption function was entered.
         """
-        return time.time() - self._exectime
+        return framework.clock.now() - self._exectime
     
 
     # ==============================================
@@ -311,6 +375,9 @@ class LatentModule(framework.tickmodule.TickModule, framework.basicstimuli.Basic
         Convenience function for sending messages.
         """
         self._messages.append(msg)
+        if self._root is not self:
+            # make sure that the message gets sent at the next tick
+            self._root._ticking[id(self)] = self
 
 
     def prune(self):
@@ -318,6 +385,15 @@ class LatentModule(framework.tickmodule.TickModule, framework.basicstimuli.Basic
         Optionally release any large cached resources (e.g. textures) to make space for the next module.
         """
 
+
+    def asset_manifest(self):
+        """
+        Optionally declare the media files that the module will need, as a list of file names or
+        (kind,filename) pairs (see precache_many()). The launcher pre-loads these in the background
+        once the module has been loaded (and configured), so that they are warm when run() needs them.
+        """
+        return []
+
     # ==================================================
     # === Implementation of the TickModule interface ===
     # ==================================================
@@ -329,15 +405,33 @@ class LatentModule(framework.tickmodule.TickModule, framework.basicstimuli.Basic
         try:
             framework.tickmodule.shared_lock.acquire()
             #framework.tickmodule.engine_lock.acquire()
-            if self._thread is None:
+            if self._coroutine is None and (self._backend == 'coroutine' or inspect.isgeneratorfunction(self.run)):
+                if inspect.isgeneratorfunction(self.run):
+                    # (generator-based run() functions are always driven as coroutines)
+                    self._coroutine = self.run()
+                elif greenlet is not None:
+                    self._coroutine = greenlet.greenlet(self._run_coroutine_wrap)
+                else:
+                    print "The coroutine backend requires either a generator-based run() function or the greenlet package; falling back to threads."
+                    self._backend = 'thread'
+            if self._coroutine is not None:
+                self._cancelled = False
+                self._resumeat = framework.clock.now()
+                self._reset_subtasks()
+                # execute the first slice of run() right away
+                self._resume_coroutine()
+            elif self._thread is None:
                 # create the runner thread and launch it
                 self._thread = threading.Thread(target=self._run_wrap)
                 self._thread.daemon = True
                 self._thread.start()
                 self._cancelled = False
-                self._resumeat = time.time()
+                self._resumeat = framework.clock.now()
                 # make sure that the sub-tasks are clean
-                self._subtasks = []  
+                self._reset_subtasks()
+                if framework.tickmodule.scheduling == 'cooperative':
+                    # execute the first slice of run() right away
+                    self._run_slice()
         finally:
             #framework.tickmodule.engine_lock.release()
             framework.tickmodule.shared_lock.release()
@@ -355,12 +449,23 @@ class LatentModule(framework.tickmodule.TickModule, framework.basicstimuli.Basic
         framework.tickmodule.shared_lock.acquire()
         #framework.tickmodule.engine_lock.acquire()
                 
-        # then cancel the main thread
-        if self._thread is not None:
+        # then cancel the main thread (or coroutine)
+        if self._coroutine is not None:
+            self._cancelled = True
+            if not (getattr(self._coroutine,'gi_running',False) or (greenlet is not None and self._coroutine is greenlet.getcurrent())):
+                # let the coroutine run its cleanup code (unless it is cancelling itself)
+                self._resume_coroutine()
+            #framework.tickmodule.engine_lock.release()
+            framework.tickmodule.shared_lock.release()
+        elif self._thread is not None:
             thread = self._thread
             # set the cancellation flag and notify the thread
             self._cancelled = True
-            self._resumecond.notify()
+            if framework.tickmodule.scheduling == 'cooperative' and thread is not threading.current_thread():
+                # let the thread run its cleanup code until it has terminated
+                self._run_slice()
+            else:
+                self._resumecond.notify()
             # wait until the thread has terminated
             #framework.tickmodule.engine_lock.release()
             framework.tickmodule.shared_lock.release()
@@ -387,38 +492,57 @@ class LatentModule(framework.tickmodule.TickModule, framework.basicstimuli.Basic
             #framework.tickmodule.engine_lock.acquire()
             
             # determine the inter-frame time delta (if it's not a hickup)
-            now = time.time()
+            now = framework.clock.now()
             delta = now - self._lasttick
-            if delta < self._max_inter_frame_interval:
+            hiccup = delta >= self._max_inter_frame_interval
+            if not hiccup:
                 self._frametime = delta
             self._lasttick = now
             
-            # send all queued messages
-            for msg in self._messages:
-                messenger.send(msg)
-            self._messages = []            
-                        
+            if not self._is_subtask and self._record_frames:
+                framework.frametiming.recorder.begin_frame(now)
+
             # if we are closer to the frame at which we should resume than the one before, end the sleep period 
-            if now > self._resumeat - self._frametime/2:
-                # time-consumption function may finish now
-                self._resumecond.notify()
-            elif self._cur_tick is not None:
-                # invoke current tick function
-                if self._cur_tick(delta) is False:
-                    self.resume()
-            elif self._default_tick is not None:
-                # invoke default tick function
-                if self._default_tick(delta) is False:
-                    self.resume()
-                
-            # propagate tick to sub-tasks    
-            for t in self._subtasks[:]:
-                if not t.is_alive():
-                    # optimization: remove from subtasks if not alive anymore
-                    self._subtasks.remove(t)
-                else:
-                    # invoke tick
-                    t.tick()
+            tick_begin = time.time()
+            self._tick_self(delta, now > self._resumeat - self._frametime/2)
+
+            # propagate tick to those sub-tasks that are due to wake up or that need to be ticked
+            subtasks_begin = time.time()
+            woken = 0
+            if self._root is self:
+                # tick the sub-tasks that override tick() (these are not in the wake-up queue)
+                for key,t in self._self_ticking.items():
+                    if t.is_alive():
+                        t.tick()
+                    else:
+                        del self._self_ticking[key]
+                # collect the sub-tasks whose resume time has come up
+                due = []
+                threshold = now + self._frametime/2
+                with self._wakeup_lock:
+                    while len(self._wakeups) > 0 and self._wakeups[0][0] < threshold:
+                        resumeat,seq,t = heapq.heappop(self._wakeups)
+                        # (entries are stale if the task has re-scheduled or terminated in the meantime)
+                        if t._resumeat == resumeat and t.is_alive():
+                            due.append(t)
+                for t in due:
+                    t._tick_self(delta, True)
+                woken = len(due)
+                # invoke the tick functions of the remaining ticking sub-tasks (and send their messages)
+                for key,t in self._ticking.items():
+                    if key in self._self_ticking:
+                        # (ticked above)
+                        del self._ticking[key]
+                        continue
+                    if t.is_alive() and t not in due:
+                        t._tick_self(delta, False)
+                    if not (t.is_alive() and (t._cur_tick is not None or t._default_tick is not None)):
+                        del self._ticking[key]
+
+            # record the frame timing (only once per frame, i.e. by the root module)
+            if not self._is_subtask and self._record_frames:
+                subtasks_end = time.time()
+                framework.frametiming.recorder.record_frame(delta,subtasks_begin-tick_begin,subtasks_end-subtasks_begin,hiccup,woken)
 
         except Exception as inst:
             print "Exception during tick():"
@@ -436,7 +560,7 @@ class LatentModule(framework.tickmodule.TickModule, framework.basicstimuli.Basic
 
     def is_alive(self):
         """ Check whether the current module is (still) running."""
-        return self._thread is not None    
+        return self._thread is not None or self._coroutine is not None
 
 
     class ModuleCancelled(Exception):
@@ -466,16 +590,167 @@ class LatentModule(framework.tickmodule.TickModule, framework.basicstimuli.Basic
         finally:
             # make sure that we release the lock and reset the state
             self._thread = None
+            self._yield_slice()
             #framework.tickmodule.engine_lock.release()
             framework.tickmodule.shared_lock.release()
 
         
 
+    def _run_coroutine_wrap(self):
+        """
+        Internal wrapper around the run function; executed as a greenlet on the engine thread
+        (which already holds the shared_lock).
+        """
+        try:
+            self.run()
+        except self.ModuleCancelled:
+            pass
+        except Exception,e:
+            print "Exception during run():"
+            print e
+            traceback.print_exc()
+        finally:
+            self._coroutine = None
+
+
+    def _resume_coroutine(self):
+        """
+        Internal helper for the coroutine backend: resume run() until it enters its next 
+        time-consumption function (or yields, if a generator), or terminates.
+        """
+        coroutine = self._coroutine
+        if greenlet is not None and isinstance(coroutine,greenlet.greenlet):
+            # make sure that control returns to us when the greenlet sleeps or finishes
+            coroutine.parent = greenlet.getcurrent()
+            coroutine.switch()
+            return
+        try:
+            if self._cancelled:
+                coroutine.throw(self.ModuleCancelled)
+                # the generator ignored the cancellation
+                coroutine.close()
+                self._coroutine = None
+                return
+            framework.frametiming.recorder.record_lateness(framework.clock.now() - self._resumeat)
+            request = coroutine.next()
+        except (StopIteration,self.ModuleCancelled):
+            self._coroutine = None
+            return
+        except Exception,e:
+            print "Exception during run():"
+            print e
+            traceback.print_exc()
+            self._coroutine = None
+            return
+        # interpret the yielded value as a sleep request
+        if type(request) in (list,tuple):
+            self._arm_sleep(*request)
+        elif request is None:
+            self._arm_sleep()
+        else:
+            self._arm_sleep(request)
+
+
+    def _arm_sleep(self,duration=100000,cur_tick=None,absolute=False):
+        """
+        Internal helper to set up the resume time (and tick function) of a time-consumption function.
+        If absolute is True, lost-time compensation is not applied.
+        """
+        self._exectime = framework.clock.now()
+        if self._make_up_for_lost_time and not absolute and abs(self._resumeat - self._exectime) < self._max_compensated_time:
+            self._resumeat = self._resumeat + duration
+        else:
+            self._resumeat = self._exectime + duration
+        self._cur_tick = cur_tick
+        self._schedule_wakeup()
+
+
+    def _tick_self(self,delta,due):
+        """
+        Internal helper to tick this module itself (but not its sub-tasks): send any queued 
+        messages and then either wake up the time-consumption function (if due) or invoke the 
+        current tick function.
+        """
+        # send all queued messages
+        for msg in self._messages:
+            messenger.send(msg)
+        self._messages = []            
+
+        if due:
+            # time-consumption function may finish now
+            if self._coroutine is not None:
+                self._resume_coroutine()
+            elif framework.tickmodule.scheduling == 'cooperative':
+                self._run_slice()
+            else:
+                self._resumecond.notify()
+        elif self._cur_tick is not None:
+            # invoke current tick function
+            if self._cur_tick(delta) is False:
+                self.resume()
+        elif self._default_tick is not None:
+            # invoke default tick function
+            if self._default_tick(delta) is False:
+                self.resume()
+
+
+    def _schedule_wakeup(self):
+        """
+        Internal helper to enter this (sub-)task into the wake-up queue of its root module
+        for the current resume time; also registers it for ticking if it has a tick function.
+        """
+        root = self._root
+        if root is self or id(self) in root._self_ticking:
+            # the root module checks its own resume time at every tick (and ticks the sub-tasks that override tick())
+            return
+        with root._wakeup_lock:
+            root._wakeup_seq += 1
+            heapq.heappush(root._wakeups,(self._resumeat,root._wakeup_seq,self))
+            if root._wakeup_seq % 1000 == 0:
+                # periodically compact the queue by dropping stale entries (e.g., of terminated tasks)
+                root._wakeups = [e for e in root._wakeups if e[2]._resumeat == e[0] and e[2].is_alive()]
+                heapq.heapify(root._wakeups)
+        if self._cur_tick is not None or self._default_tick is not None:
+            root._ticking[id(self)] = self
+
+
+    def _reset_subtasks(self):
+        """
+        Internal helper to clear the list of sub-tasks (and the wake-up queue, for a root module).
+        """
+        self._subtasks = []
+        if self._root is self:
+            with self._wakeup_lock:
+                self._wakeups = []
+                self._ticking = {}
+                self._self_ticking = {}
+
+
+    def _run_slice(self):
+        """
+        Internal helper for cooperative scheduling: let the runner thread execute until it enters its next
+        time-consumption function (or terminates). Must be called with the shared_lock held.
+        """
+        self._in_slice = True
+        self._resumecond.notify()
+        while self._in_slice and self._thread is not None:
+            self._yieldcond.wait()
+
+
+    def _yield_slice(self):
+        """
+        Internal helper for cooperative scheduling: signal that the runner thread has finished its current
+        time slice. Must be called with the shared_lock held.
+        """
+        self._in_slice = False
+        self._yieldcond.notify()
+
+
     def _on_wait_event(self,eventid):
         """
         Internal event handler for waitfor (triggers resume).
         """
-        self._times_received.append(time.time()-self._exectime)
+        self._times_received.append(framework.clock.now()-self._exectime)
         self.marker(229)
         self._events_received.append(eventid)
         self.resume()
@@ -485,7 +760,7 @@ class LatentModule(framework.tickmodule.TickModule, framework.basicstimuli.Basic
         """
         Internal event handler for watchfor(_multiple).
         """
-        self._received_dict[eventid].append(time.time()-self._measuretime)
+        self._received_dict[eventid].append(framework.clock.now()-self._measuretime)
         idx = [i for i,x in enumerate(self._received_dict.iterkeys()) if x == eventid]
         self.marker(230+idx[0])
         self._events_received.append(eventid)
@@ -0,0 +1,295 @@
+"""
+Media cache for stimulus presentation.
+
+Keeps loaded media (pictures, sounds, models, movies and fonts) alive so that stimulus functions
+such as write(), picture() or sound() hit warm assets, subject to a memory budget with
+least-recently-used eviction. Media can be pre-loaded in bulk by a pool of background threads
+(see precache_many()). There is one cache per Panda3d loader (see get_cache()), so that it is
+shared between successive modules.
+
+Like all other code that touches the engine from outside the engine thread, the cache calls the
+loader only while holding framework.tickmodule.shared_lock; the background threads read each file
+ahead of that, so that the disk access happens while the lock is free.
+"""
+
+import collections
+import threading
+import Queue
+import os
+import traceback
+import framework.tickmodule
+
+# the default memory budget of a cache, in bytes
+DEFAULT_BUDGET = 512*1024*1024
+
+# the default number of background threads used by precache_many()
+DEFAULT_THREADS = 4
+
+# the block size in which files are read ahead of loading them, in bytes
+READ_AHEAD_BLOCK = 1024*1024
+
+# assumed memory footprint of assets whose size cannot be estimated (models, fonts), in bytes
+DEFAULT_ASSET_SIZE = 1024*1024
+
+# file extensions by which the kind of an asset is deduced, if not given
+EXTENSION_KINDS = {'.wav':'sound', '.ogg':'sound', '.mp3':'sound', '.flac':'sound',
+                   '.png':'picture', '.jpg':'picture', '.jpeg':'picture', '.tga':'picture', '.bmp':'picture', '.tif':'picture', '.dds':'picture',
+                   '.egg':'model', '.bam':'model', '.pz':'model',
+                   '.avi':'movie', '.mpg':'movie', '.mpeg':'movie', '.mp4':'movie', '.ogv':'movie', '.wmv':'movie',
+                   '.ttf':'font', '.otf':'font'}
+
+
+class PrecacheJob:
+    """Progress of a bulk pre-caching job (see MediaCache.precache_many())."""
+
+    def __init__(self,total):
+        self.total = total              # the total number of assets to load
+        self.done = 0                   # the number of assets processed so far (including failures)
+        self.failed = []                # list of (kind,filename) pairs that failed to load
+        self._finished = threading.Event()
+        if total == 0:
+            self._finished.set()
+
+    def finished(self):
+        """Whether all assets have been processed."""
+        return self._finished.is_set()
+
+    def wait(self,timeout=None):
+        """Wait until all assets have been processed (or the timeout has expired); returns whether the job is finished."""
+        self._finished.wait(timeout)
+        return self._finished.is_set()
+
+    def progress(self):
+        """The fraction of processed assets (between 0 and 1)."""
+        return 1.0 if self.total == 0 else self.done / float(self.total)
+
+
+class MediaCache:
+    """
+    A cache of loaded media with a memory budget and least-recently-used eviction.
+    Assets are identified by their kind ('picture', 'sound', 'model', 'movie' or 'font') and file name.
+    """
+
+    def __init__(self,
+                 loader,                # the Panda3d loader to use (e.g. base.loader)
+                 budget=DEFAULT_BUDGET):# the memory budget, in bytes
+        self.loader = loader
+        self.budget = budget
+        self._lock = threading.RLock()
+        self._entries = collections.OrderedDict()   # map from (kind,filename) to (asset,size), in order of least recent use
+        self.bytes = 0                  # the estimated memory footprint of the cached assets
+        self.hits = 0                   # number of requests that were served from the cache
+        self.misses = 0                 # number of requests that required loading the asset
+        self.evictions = 0              # number of assets evicted to stay within the budget
+
+
+    def get(self,kind,filename):
+        """Get the given asset, loading it if necessary."""
+        key = (kind,filename)
+        entry = self._lookup(key)
+        if entry is not None:
+            return entry[0]
+        # bring the file into the OS cache while the shared_lock is free
+        _read_ahead(filename)
+        # the loader is part of the engine and may only be used under the shared_lock (this also makes
+        # sure that an asset that is requested by several threads at once is loaded only once)
+        with framework.tickmodule.shared_lock:
+            entry = self._lookup(key)
+            if entry is not None:
+                return entry[0]
+            with self._lock:
+                self.misses += 1
+            asset = self._load(kind,filename)
+            size = self._estimate_size(kind,asset)
+            with self._lock:
+                self._entries[key] = (asset,size)
+                self.bytes += size
+                self._enforce_budget()
+            return asset
+
+
+    def contains(self,kind,filename):
+        """Check whether the given asset is currently cached."""
+        with self._lock:
+            return (kind,filename) in self._entries
+
+
+    def uncache(self,kind,filename):
+        """Remove the given asset from the cache (and unload it from the loader), if present."""
+        with self._lock:
+            entry = self._entries.pop((kind,filename),None)
+            if entry is not None:
+                self.bytes -= entry[1]
+        if entry is not None:
+            self._unload(kind,entry[0])
+
+
+    def clear(self):
+        """Remove all assets from the cache."""
+        with self._lock:
+            entries = self._entries.items()
+            self._entries.clear()
+            self.bytes = 0
+        for (kind,filename),(asset,size) in entries:
+            self._unload(kind,asset)
+
+
+    def precache_many(self,
+                      filenames,        # list of file names or (kind,filename) pairs
+                      kind=None,        # the kind of the assets (if not given in filenames); deduced from the file extension if None
+                      threads=DEFAULT_THREADS): # the number of background threads to use
+        """Load the given assets into the cache using a pool of background threads. Returns a PrecacheJob to track the progress."""
+        items = []
+        for f in filenames:
+            if type(f) in (list,tuple):
+                items.append(tuple(f))
+            elif f is not None:
+                items.append((kind or kind_of(f),f))
+        job = PrecacheJob(len(items))
+        work = Queue.Queue()
+        for item in items:
+            work.put(item)
+        def worker():
+            while True:
+                try:
+                    k,f = work.get_nowait()
+                except Queue.Empty:
+                    return
+                try:
+                    self.get(k,f)
+                except Exception as e:
+                    print "Could not pre-cache " + k + " '" + str(f) + "':", e
+                    job.failed.append((k,f))
+                finally:
+                    with self._lock:
+                        job.done += 1
+                        if job.done == job.total:
+                            job._finished.set()
+        for t in range(min(threads,len(items))):
+            thread = threading.Thread(target=worker)
+            thread.daemon = True
+            thread.start()
+        return job
+
+
+    def stats(self):
+        """Get a dictionary of cache statistics."""
+        with self._lock:
+            total = self.hits + self.misses
+            return {'entries':len(self._entries), 'bytes':self.bytes, 'budget':self.budget, 'hits':self.hits,
+                    'misses':self.misses, 'evictions':self.evictions, 'hit_rate':(self.hits/float(total) if total > 0 else 0.0)}
+
+
+    # --- internal ---
+
+    def _lookup(self,key):
+        """Internal helper to get the (asset,size) entry for the given key and mark it as most recently used, or None if not cached."""
+        with self._lock:
+            entry = self._entries.pop(key,None)
+            if entry is not None:
+                # re-insert as the most recently used entry
+                self._entries[key] = entry
+                self.hits += 1
+            return entry
+
+
+    def _load(self,kind,filename):
+        """Internal helper to load an asset."""
+        if kind == 'picture':
+            return self.loader.loadTexture(filename)
+        elif kind == 'sound':
+            return self.loader.loadSfx(filename)
+        elif kind == 'model':
+            return self.loader.loadModel(filename)
+        elif kind == 'font':
+            return self.loader.loadFont(filename)
+        elif kind == 'movie':
+            tex = self.loader.loadTexture(filename)
+            try:
+                snd = self.loader.loadSfx(filename)
+            except:
+                snd = None
+            return (tex,snd)
+        raise ValueError("Unsupported media kind: " + str(kind))
+
+
+    def _unload(self,kind,asset):
+        """Internal helper to unload an asset from the loader."""
+        try:
+            with framework.tickmodule.shared_lock:
+                if kind == 'picture':
+                    self.loader.unloadTexture(asset)
+                elif kind == 'sound':
+                    self.loader.unloadSfx(asset)
+                elif kind == 'model':
+                    self.loader.unloadModel(asset)
+                elif kind == 'movie':
+                    self.loader.unloadTexture(asset[0])
+                    if asset[1] is not None:
+                        self.loader.unloadSfx(asset[1])
+        except:
+            traceback.print_exc()
+
+
+    def _estimate_size(self,kind,asset):
+        """Internal helper to estimate the memory footprint of an asset, in bytes."""
+        try:
+            if kind == 'picture':
+                return _texture_size(asset)
+            elif kind == 'sound':
+                # assume 16-bit stereo at 44.1kHz
+                return int(asset.length()*44100*4)
+            elif kind == 'movie':
+                return _texture_size(asset[0])
+        except:
+            pass
+        return DEFAULT_ASSET_SIZE
+
+
+    def _enforce_budget(self):
+        """Internal helper to evict the least recently used assets until the cache is within its budget (lock must be held)."""
+        while self.bytes > self.budget and len(self._entries) > 1:
+            (kind,filename),(asset,size) = self._entries.popitem(last=False)
+            self.bytes -= size
+            self.evictions += 1
+            self._unload(kind,asset)
+
+
+def kind_of(filename):
+    """Deduce the kind of an asset from its file name (defaults to 'model')."""
+    name = filename.lower()
+    if name.endswith('.pz'):
+        name = name[:-3]
+    return EXTENSION_KINDS.get(os.path.splitext(name)[1],'model')
+
+
+def get_cache(loader):
+    """Get the media cache for the given Panda3d loader (created on first use)."""
+    with _caches_lock:
+        cache = _caches.get(id(loader))
+        if cache is None:
+            cache = _caches[id(loader)] = MediaCache(loader)
+        return cache
+
+
+def _read_ahead(filename):
+    """Internal helper to read a media file (if it is a plain file on disk) so that loading it afterwards does not wait for the disk."""
+    try:
+        if os.path.isfile(filename):
+            with open(filename,'rb') as f:
+                while f.read(READ_AHEAD_BLOCK):
+                    pass
+    except (IOError,OSError,TypeError):
+        pass
+
+
+def _texture_size(tex):
+    """Internal helper to estimate the memory footprint of a texture."""
+    try:
+        return tex.estimateTextureMemory()
+    except:
+        return tex.getXSize()*tex.getYSize()*max(1,tex.getNumComponents())*max(1,tex.getComponentWidth())
+
+
+_caches = {}                    # map from id(loader) to the MediaCache for that loader
+_caches_lock = threading.Lock()
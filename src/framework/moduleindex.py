@@ -0,0 +1,126 @@
+"""
+Persistent index of the experiment modules under the modules directory.
+
+Finding a module by name requires walking the whole modules tree, which can take seconds on
+network drives with many study folders. The ModuleIndex maps module names to the directories
+that contain them and is saved to disk, so that it is built only once; on every query, the
+modification times of the indexed directories are checked and only directories that have
+changed since (e.g., because a file or sub-directory was added or removed) are re-scanned.
+"""
+
+import cPickle
+import threading
+import os
+
+# version of the on-disk format
+INDEX_VERSION = 1
+
+
+class ModuleIndex:
+    """A persistent map from module names to the directories that contain them."""
+
+    def __init__(self,
+                 root='modules',        # the directory tree to index
+                 cachefile=None):       # the file in which the index is stored across sessions (should not be under root), or None
+        self.root = root
+        self.cachefile = cachefile
+        self._lock = threading.Lock()
+        self._dirs = {}                 # map from directory path to (mtime, list of module names in that directory)
+        self._names = None              # map from normcase'd module name to (module name, list of directories) (derived from _dirs; None if out of date)
+        self._load()
+
+
+    def locate(self,name):
+        """Get the list of directories that contain a module with the given name (normally at most one).
+        The name is compared as a file name would be on this platform (i.e., case-insensitively on Windows)."""
+        with self._lock:
+            self._refresh()
+            return list(self._names.get(os.path.normcase(name),(name,[]))[1])
+
+
+    def modules(self):
+        """Get a sorted list of (name, list of directories) pairs of all modules."""
+        with self._lock:
+            self._refresh()
+            return sorted([(name,list(dirs)) for name,dirs in self._names.itervalues()])
+
+
+    def rebuild(self):
+        """Discard the index and re-scan the whole tree."""
+        with self._lock:
+            self._dirs = {}
+            self._refresh()
+
+
+    # --- internal ---
+
+    def _refresh(self):
+        """Internal helper to re-scan all directories that have changed since they were last indexed (lock must be held)."""
+        changed = False
+        if self.root not in self._dirs:
+            self._scan(self.root)
+            changed = True
+        for path,(mtime,names) in self._dirs.items():
+            try:
+                if os.stat(path).st_mtime == mtime:
+                    continue
+            except OSError:
+                pass
+            # the directory has changed or disappeared: re-index it (and any sub-directories that are new)
+            self._scan(path)
+            changed = True
+        if changed or self._names is None:
+            self._names = {}
+            for path,(mtime,names) in self._dirs.iteritems():
+                for name in names:
+                    self._names.setdefault(os.path.normcase(name),(name,[]))[1].append(path)
+            for name,dirs in self._names.itervalues():
+                dirs.sort()
+        if changed:
+            self._save()
+
+
+    def _scan(self,path):
+        """Internal helper to (re-)index the given directory and any of its sub-directories that are not yet indexed."""
+        try:
+            mtime = os.stat(path).st_mtime
+            entries = os.listdir(path)
+        except OSError:
+            # the directory is gone: drop it and everything below it
+            prefix = os.path.join(path,'')
+            for p in self._dirs.keys():
+                if p == path or p.startswith(prefix):
+                    del self._dirs[p]
+            return
+        names = []
+        for entry in entries:
+            full = os.path.join(path,entry)
+            if entry.endswith('.py'):
+                names.append(entry[:-3])
+            elif os.path.isdir(full) and full not in self._dirs:
+                self._scan(full)
+        self._dirs[path] = (mtime,names)
+
+
+    def _load(self):
+        """Internal helper to load the index from the cache file, if any."""
+        if self.cachefile is None or not os.path.exists(self.cachefile):
+            return
+        try:
+            with open(self.cachefile,'rb') as f:
+                data = cPickle.load(f)
+            if data.get('version') == INDEX_VERSION and data.get('root') == self.root:
+                self._dirs = data['dirs']
+        except Exception as e:
+            print "Could not read the module index '" + self.cachefile + "' (will be rebuilt):", e
+
+
+    def _save(self):
+        """Internal helper to save the index to the cache file, if any."""
+        if self.cachefile is None:
+            return
+        try:
+            with open(self.cachefile,'wb') as f:
+                cPickle.dump({'version':INDEX_VERSION, 'root':self.root, 'dirs':self._dirs},f,cPickle.HIGHEST_PROTOCOL)
+        except Exception as e:
+            print "Could not write the module index '" + self.cachefile + "':", e
@@ -1,6 +1,6 @@
 import pyrecast
 from pandac.PandaModules import VBase4,Point3,Vec3
-import time
+import framework.clock
 
 # ===========================================================================================
 # === This module contains classes for path-finding and navigation (using recast/detour). ===
@@ -93,7 +93,7 @@ class NavCrowd:
         self.crowd = pyrecast.dtCrowd()
         self.crowd.init(maxagents,maxagentradius,self.nav.mesh)
         self.debuginfo = pyrecast.dtCrowdAgentDebugInfo()
-        self.last_time = time.time()
+        self.last_time = framework.clock.now()
         self._active_indices = []        # the list of indices that are currently in use
         taskMgr.add(self.update, 'NavCrowd.update()')
 
@@ -205,7 +205,7 @@ class NavCrowd:
         """
         Internal update function, called once per frame.
         """
-        cur_time = time.time()
+        cur_time = framework.clock.now()
         self.crowd.update(cur_time - self.last_time,self.debuginfo)
         self.last_time = cur_time
         return task.cont
@@ -0,0 +1,285 @@
+"""
+Session record-and-replay.
+
+A SessionRecorder captures everything that drives an experiment session from the outside, each with its
+framework.clock.now() timestamp, into a compact binary session log (.slog):
+* the Panda3d input events that reach accept() handlers (keyboard, mouse, etc.)
+* the remote-control commands received by the launcher (as the raw protocol lines, per port)
+* the callbacks from remote client machines (e.g., key presses, joystick and speech input forwarded via rpyc),
+  if the module wraps them via callback()
+* the seeds of the random number generators, which are drawn anew whenever a module is started (see seed_random())
+
+A SessionReplay feeds the recorded inputs back at the same (relative) times, and hands out the recorded seeds
+in order; the launcher does this in headless mode (--replay), i.e., under the virtual clock and thus much faster
+than real time, so that a specific run can be reproduced and profiled offline.
+
+The file starts with a header (magic 'SNAPSLOG', a format version and the clock time at which the recording
+started), followed by a sequence of records, each consisting of a tag byte, a float64 timestamp (seconds since
+the origin of the recording, i.e. the launcher's first frame; records from before that are negative), a uint32
+payload length and the payload (a marshal-encoded tuple):
+* event records ('E'): (event name, argument tuple)
+* command records ('C'): (remote-control port, protocol line)
+* callback records ('K'): (callback name, argument tuple)
+* seed records ('R'): (seed,)
+* end records ('X'): () -- written when the recording is closed
+
+Arguments that marshal cannot encode (e.g., rpyc proxies of remote tuples) are converted to plain tuples or
+lists if possible; events with other arguments (e.g., engine objects such as windows) are not recorded.
+
+Usage (in a module):
+    self.conn.root.mastercallbacks(framework.sessionlog.callback('client0.keydown',self.on_keydown),...)
+"""
+
+import marshal
+import struct
+import threading
+import random
+import sys
+import os
+import framework.clock
+
+MAGIC = 'SNAPSLOG'
+VERSION = 1
+
+HEADER = struct.Struct('<8sHd')
+RECORD = struct.Struct('<BdI')
+
+EVENT_TAG = ord('E')
+COMMAND_TAG = ord('C')
+CALLBACK_TAG = ord('K')
+SEED_TAG = ord('R')
+END_TAG = ord('X')
+
+
+class SessionRecorder:
+    """Append-only writer for the binary session log format; thread-safe."""
+
+    def __init__(self,
+                 filename,              # the name of the file to create
+                 buffering=65536):      # the buffer size of the file (as in open())
+        self.name = filename
+        self._lock = threading.Lock()
+        self._file = open(filename,'wb',buffering)
+        self.origin = framework.clock.now()  # the clock time relative to which the records are timestamped (see set_origin())
+        self._file.write(HEADER.pack(MAGIC,VERSION,self.origin))
+        self.num_records = 0            # the number of records written so far
+        self.num_skipped = 0            # the number of events that were not recorded since their arguments could not be encoded
+
+
+    def set_origin(self,timepoint=None):
+        """Measure the timestamps of subsequent records relative to the given clock time (default: now), e.g. the first frame."""
+        self.origin = framework.clock.now() if timepoint is None else timepoint
+
+
+    def record_event(self,name,args):
+        """Record a Panda3d input event with the given argument list."""
+        args = _encodable(args)
+        if args is None:
+            self.num_skipped += 1
+        else:
+            self._write(EVENT_TAG,(name,args))
+
+
+    def record_command(self,port,line):
+        """Record a remote-control protocol line that was received on the given port."""
+        self._write(COMMAND_TAG,(port,line))
+
+
+    def record_callback(self,name,args):
+        """Record a callback (e.g., from a remote client) with the given argument list."""
+        args = _encodable(args)
+        if args is None:
+            self.num_skipped += 1
+        else:
+            self._write(CALLBACK_TAG,(name,args))
+
+
+    def record_seed(self,seed):
+        """Record a random seed."""
+        self._write(SEED_TAG,(seed,))
+
+
+    def flush(self):
+        """Flush buffered data to disk."""
+        with self._lock:
+            self._file.flush()
+
+
+    def close(self):
+        """Write the end record and close the file."""
+        with self._lock:
+            if self._file.closed:
+                return
+            self._file.write(RECORD.pack(END_TAG,framework.clock.now() - self.origin,0))
+            self._file.close()
+
+
+    def _write(self,tag,payload):
+        """Internal helper to append a record."""
+        data = marshal.dumps(payload)
+        with self._lock:
+            if self._file.closed:
+                return
+            self._file.write(RECORD.pack(tag,framework.clock.now() - self.origin,len(data)) + data)
+            self.num_records += 1
+
+
+def read_session_log(filename):
+    """Read a session log; returns a list of (tag, timestamp, payload) records (a log that has not been closed properly is read up to its last complete record)."""
+    records = []
+    with open(filename,'rb') as f:
+        header = f.read(HEADER.size)
+        if len(header) < HEADER.size or HEADER.unpack(header)[0] != MAGIC:
+            raise IOError('The file "' + filename + '" is not a SNAP session log.')
+        magic,version,origin = HEADER.unpack(header)
+        if version > VERSION:
+            raise IOError('The file "' + filename + '" has an unsupported format version (' + str(version) + ').')
+        while True:
+            data = f.read(RECORD.size)
+            if len(data) < RECORD.size:
+                break
+            tag,timestamp,length = RECORD.unpack(data)
+            data = f.read(length)
+            if len(data) < length:
+                break
+            records.append((tag,timestamp,marshal.loads(data) if length > 0 else ()))
+    return records
+
+
+class SessionReplay:
+    """Plays back a recorded session against the framework clock (same interface as framework.inputscript.InputScript)."""
+
+    def __init__(self,
+                 filename,              # the session log to play back
+                 dispatch_command):     # function that dispatches a recorded remote-control line, called as dispatch_command(port,line)
+        self.filename = filename
+        records = read_session_log(filename)
+        self.records = [r for r in records if r[0] != SEED_TAG]      # list of (tag, timestamp, payload) records to play back
+        self.seeds = [r[2][0] for r in records if r[0] == SEED_TAG]   # the recorded seeds that have not yet been used
+        self.dispatch_command = dispatch_command
+        self.position = 0               # index of the next record to play back
+        self.start_time = None          # the framework.clock.now() at which the playback started (None if not yet started)
+        self.exit_requested = False     # whether the end of the recording has been reached
+
+
+    def start(self):
+        """Start the playback at the current time."""
+        self.start_time = framework.clock.now()
+        self.position = 0
+
+
+    def poll(self):
+        """Play back all records that are due by now (called once per frame); returns whether the playback has finished."""
+        if self.start_time is None:
+            self.start()
+        elapsed = framework.clock.now() - self.start_time
+        while self.position < len(self.records) and self.records[self.position][1] <= elapsed:
+            tag,timestamp,payload = self.records[self.position]
+            self.position += 1
+            if tag == EVENT_TAG:
+                messenger.send(payload[0],list(payload[1]))
+            elif tag == COMMAND_TAG:
+                self.dispatch_command(payload[0],payload[1])
+            elif tag == CALLBACK_TAG:
+                fn = _callbacks.get(payload[0])
+                if fn is None:
+                    print 'Replay: no callback named "' + payload[0] + '" has been registered; skipping it.'
+                else:
+                    fn(*payload[1])
+            elif tag == END_TAG:
+                self.exit_requested = True
+        return self.exit_requested or self.position >= len(self.records)
+
+
+    def next_seed(self):
+        """Get the next recorded seed (or None if all have been used up)."""
+        return self.seeds.pop(0) if self.seeds else None
+
+
+def start_recording(filename):
+    """Start recording the session into the given file."""
+    global recorder
+    recorder = SessionRecorder(filename)
+
+
+def stop_recording():
+    """Stop recording (if recording)."""
+    global recorder
+    if recorder is not None:
+        recorder.close()
+        print 'Recorded ' + str(recorder.num_records) + ' inputs into "' + recorder.name + '" (' + str(recorder.num_skipped) + ' events with non-recordable arguments skipped).'
+        recorder = None
+
+
+def start_replay(filename,dispatch_command):
+    """Start replaying the given session log; returns the SessionReplay (which must be polled once per frame)."""
+    global replay
+    replay = SessionReplay(filename,dispatch_command)
+    return replay
+
+
+def callback(name,fn):
+    """
+    Wrap a callback function (e.g., one that is called by a remote client) so that its calls are recorded
+    under the given name (which must be unique and stable across runs), and register it so that it can be
+    called when a session is replayed. Returns the wrapped function.
+    """
+    def wrapper(*args):
+        if recorder is not None:
+            recorder.record_callback(name,args)
+        return fn(*args)
+    _callbacks[name] = fn
+    return wrapper
+
+
+def seed_random(seed=None):
+    """
+    Seed the random number generators (random and, if loaded, numpy.random) and record the seed. If a session is
+    being replayed, the next recorded seed is used; otherwise, if no seed is given, a new one is drawn. Returns the seed.
+    """
+    if replay is not None:
+        recorded = replay.next_seed()
+        if recorded is not None:
+            seed = recorded
+    if seed is None:
+        seed = struct.unpack('<I',os.urandom(4))[0]
+    random.seed(seed)
+    if 'numpy' in sys.modules:
+        sys.modules['numpy'].random.seed(seed)
+    if recorder is not None:
+        recorder.record_seed(seed)
+    return seed
+
+
+# --- internal ---
+
+def _encodable(args):
+    """Internal helper to convert an argument list into a marshal-encodable tuple (or None if not possible)."""
+    try:
+        marshal.dumps(tuple(args))
+        return tuple(args)
+    except ValueError:
+        pass
+    result = []
+    for a in args:
+        try:
+            marshal.dumps(a)
+        except ValueError:
+            # e.g., an rpyc proxy of a remote tuple
+            try:
+                a = tuple(a)
+                marshal.dumps(a)
+            except Exception:
+                return None
+        result.append(a)
+    return tuple(result)
+
+
+# the current recorder (if recording)
+recorder = None
+
+# the current replay (if replaying)
+replay = None
+
+# map from callback name to the registered function (see callback())
+_callbacks = {}
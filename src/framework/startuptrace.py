@@ -0,0 +1,76 @@
+"""
+Startup-time instrumentation for the SNAP launcher.
+
+A single global StartupTrace (see trace below) records how long each phase of the launcher's startup
+took (parsing the options, initializing the marker backends, importing and configuring Panda3d,
+opening the window, loading the initial module, etc.), in wall-clock time since this module was
+first imported, until the first frame has been rendered. The trace can be queried via the launcher's
+remote-control port (command "startup").
+"""
+
+import contextlib
+import threading
+import time
+
+
+class StartupTrace:
+    """Recorder for the durations of the startup phases. All times are in seconds."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.origin = time.time()       # the wall-clock time at which the trace was started
+        self.phases = []                # list of [name, start time relative to origin, duration or None if still running]
+        self.completed = None           # the time (relative to origin) at which the startup completed, or None
+
+
+    @contextlib.contextmanager
+    def phase(self,name):
+        """Context manager that records the duration of the enclosed startup phase under the given name."""
+        entry = self.begin(name)
+        try:
+            yield
+        finally:
+            self.end(entry)
+
+
+    def begin(self,name):
+        """Begin a phase; returns a handle that must be passed to end()."""
+        entry = [name,time.time() - self.origin,None]
+        with self._lock:
+            self.phases.append(entry)
+        return entry
+
+
+    def end(self,entry):
+        """End the given phase."""
+        with self._lock:
+            entry[2] = time.time() - self.origin - entry[1]
+
+
+    def complete(self):
+        """Mark the startup as complete (called once the first frame has been rendered); returns the total startup time."""
+        with self._lock:
+            if self.completed is None:
+                self.completed = time.time() - self.origin
+            return self.completed
+
+
+    def summary(self):
+        """Get a dictionary with the total startup time (None if not yet complete) and a list of the phases."""
+        with self._lock:
+            return {'total':self.completed,
+                    'phases':[{'name':name,'start':start,'duration':duration} for name,start,duration in self.phases]}
+
+
+    def report(self):
+        """Get a human-readable, single-line-per-phase report of the startup (times in milliseconds)."""
+        s = self.summary()
+        lines = []
+        for p in s['phases']:
+            lines.append('%8.1f %8s  %s' % (1000*p['start'],'...' if p['duration'] is None else '%.1f' % (1000*p['duration']),p['name']))
+        lines.append('total: ' + ('n/a (still starting up)' if s['total'] is None else '%.1f' % (1000*s['total'])))
+        return '\n'.join(lines)
+
+
+# the global startup trace
+trace = StartupTrace()
@@ -0,0 +1,137 @@
+"""
+Loading of study config (.cfg) files.
+
+A study config names a module in its first line, followed by lines of Python code that are executed in the scope
+of the module's Main instance (see studies/MAKING A STUDY.TXT). Configs are compiled only once per file version
+(they are cached by file name, modification time and size): lines that consist only of plain assignments of
+literal values (e.g. trials = 100; pausetime = 20) are parsed into (name, value) pairs, which are assigned directly
+and checked against the attributes of the module, and all other lines are compiled to code objects. Syntax errors
+are therefore reported before the module is loaded.
+"""
+
+import ast
+import copy
+import os
+import threading
+
+# settings whose values are of these types can be assigned without copying
+IMMUTABLE_TYPES = (int, long, float, complex, bool, str, unicode, type(None))
+
+# the maximum length of a value in the change report
+REPORT_VALUE_LENGTH = 60
+
+
+class StudyConfig:
+    """A compiled study config."""
+
+    def __init__(self,filename):
+        self.filename = filename
+        self.module = None              # the name of the module to load
+        self.steps = []                 # list of (line number, name, value) assignments or (line number, None, code object) statements
+        with open(filename,'r') as f:
+            self.module = f.readline().strip()
+            for lineno,line in enumerate(f,2):
+                if len(line.strip()) == 0 or line.strip().startswith('#'):
+                    continue
+                try:
+                    tree = ast.parse(line.strip(),filename,'exec')
+                except SyntaxError,e:
+                    raise SyntaxError(filename + ':' + str(lineno) + ': ' + str(e.msg) + ' in: ' + line.strip())
+                assignments = _literal_assignments(tree)
+                if assignments is not None:
+                    self.steps += [(lineno,name,value) for name,value in assignments]
+                else:
+                    self.steps.append((lineno,None,compile(tree,filename + ':' + str(lineno),'exec')))
+
+
+    def apply(self,instance):
+        """
+        Apply the config to the given module instance. Returns a list of (name, old value, new value) for all
+        settings that were changed (the old value is None if the module had no such setting).
+        """
+        namespace = instance.__dict__
+        before = dict(namespace)
+        for lineno,name,value in self.steps:
+            if name is not None:
+                # declarative assignment: check it against the module's attributes
+                if not hasattr(instance,name):
+                    print 'Warning: ' + self.filename + ':' + str(lineno) + ': the module has no setting named "' + name + '" (typo?).'
+                elif not _compatible(getattr(instance,name),value):
+                    print 'Warning: ' + self.filename + ':' + str(lineno) + ': "' + name + '" is assigned a ' + type(value).__name__ + ', but the module\'s default is a ' + type(getattr(instance,name)).__name__ + '.'
+                namespace[name] = value if isinstance(value,IMMUTABLE_TYPES) else copy.deepcopy(value)
+            else:
+                exec value in namespace
+        changes = []
+        for name,value in namespace.iteritems():
+            if name == '__builtins__':
+                continue
+            # settings that were not assigned on the instance before may still have a class-level default
+            old = before[name] if name in before else getattr(type(instance),name,None)
+            if old is not value and _differs(old,value):
+                changes.append((name,old,value))
+        return sorted(changes)
+
+
+def load(filename):
+    """Get the compiled config for the given file (compiled anew only if the file has changed since the last call)."""
+    key = os.path.abspath(filename)
+    st = os.stat(key)
+    with _lock:
+        entry = _cache.get(key)
+        if entry is not None and entry[0] == (st.st_mtime,st.st_size):
+            return entry[1]
+    config = StudyConfig(filename)
+    with _lock:
+        _cache[key] = ((st.st_mtime,st.st_size),config)
+    return config
+
+
+def format_changes(changes):
+    """Format a list of changes (as returned by StudyConfig.apply()) for display."""
+    if not changes:
+        return '  (no settings changed)'
+    return '\n'.join(['  ' + name + ': ' + ('(new)' if old is None else _shorten(repr(old))) + ' -> ' + _shorten(repr(new)) for name,old,new in changes])
+
+
+# --- internal ---
+
+def _literal_assignments(tree):
+    """Internal helper to get the (name, value) pairs of a parsed line if it consists only of plain assignments of literals (otherwise None)."""
+    result = []
+    for stmt in tree.body:
+        if not isinstance(stmt,ast.Assign) or len(stmt.targets) != 1 or not isinstance(stmt.targets[0],ast.Name):
+            return None
+        try:
+            result.append((stmt.targets[0].id,ast.literal_eval(stmt.value)))
+        except ValueError:
+            return None
+    return result
+
+
+def _compatible(default,value):
+    """Internal helper to check whether a configured value fits the type of a module's default value."""
+    if default is None or value is None:
+        return True
+    if isinstance(default,bool) or isinstance(value,bool):
+        return isinstance(default,bool) == isinstance(value,bool) or isinstance(value,(int,long))
+    for group in ((int,long,float),(str,unicode),(list,tuple)):
+        if isinstance(default,group):
+            return isinstance(value,group)
+    return isinstance(value,type(default))
+
+
+def _differs(old,new):
+    """Internal helper to check whether a setting's value has changed (values that cannot be compared count as changed)."""
+    try:
+        return type(old) != type(new) or bool(old != new)
+    except Exception:
+        return True
+
+
+def _shorten(text):
+    """Internal helper to shorten a value's representation for display."""
+    return text if len(text) <= REPORT_VALUE_LENGTH else text[:REPORT_VALUE_LENGTH-3] + '...'
+
+
+_lock = threading.Lock()
+_cache = {}                             # map from absolute file name to ((mtime, size), StudyConfig)
@@ -46,6 +46,20 @@ class TickModule(DirectObject):
 # (tick, render, event handling or script code)
 shared_lock = threading.RLock()
 
+# the scheduling mode for latent code (see LatentModule):
+# * in 'free' mode, the runner threads of latent modules resume whenever they can grab the shared_lock
+#   (i.e., whenever the engine releases it between frames)
+# * in 'cooperative' mode, the engine holds the shared_lock for the duration of each frame and the runner 
+#   threads are resumed synchronously from within tick(), i.e. at a defined point in each frame; the
+#   runner thread hands control back once it enters its next time-consumption function (or terminates)
+scheduling = 'free'
+
+# the default execution backend for the run() function of latent modules:
+# * 'thread' runs each module (and each launch()ed sub-task) in its own thread
+# * 'coroutine' runs them as coroutines on the engine thread (generator-based or using greenlet, if installed)
+# modules whose run() function is a generator are always run as coroutines, regardless of this setting
+latent_backend = 'thread'
+
 # this lock is currently unused by it intended to lock the Panda3d engine from concurrent access by either
 # Tickmodules or other threads (e.g., network handlers).
 engine_lock = threading.RLock()
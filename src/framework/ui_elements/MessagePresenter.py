@@ -1,5 +1,5 @@
 # -*- coding:utf-8 -*-
-import time
+import framework.clock
 from framework.eventmarkers.eventmarkers import send_marker, init_markers
 
 
@@ -53,13 +53,13 @@ class MessagePresenter(object):
         * clearafter: Optionally, the presented message may automatically be cleared after this amount of time
                       has passed (equivalent to calling clear() after that time.
         """
-        now = time.time()
+        now = framework.clock.now()
         if now > self._locked_until:
             if lockduration is None:
                 lockduration = self.lockduration
             if clearafter is None:
                 clearafter = self.clearafter
-            self._locked_until = time.time()+lockduration
+            self._locked_until = framework.clock.now()+lockduration
             self._present(message)
             self.clear_after(clearafter)
             return True
@@ -86,12 +86,12 @@ class MessagePresenter(object):
     def clear_after(self,clearafter):
         """Clear the presenter after some time."""
         if clearafter > 0:
-            self._next_clear = time.time() + clearafter
+            self._next_clear = framework.clock.now() + clearafter
             taskMgr.doMethodLater(clearafter, self._clear_task, 'MessagePresenter.clear()')
 
     def _clear_task(self,task):
         """Task to clear the icon after done."""
-        if time.time() >= self._next_clear-0.1: # we don't clear if the clear schedule has been overridden in the meantime...                                
+        if framework.clock.now() >= self._next_clear-0.1: # we don't clear if the clear schedule has been overridden in the meantime...                                
             self.clear()                        # the 0.1 is a timing tolerance parameter
         return task.done 
             
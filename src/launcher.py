@@ -7,16 +7,20 @@ The SNAP experiment launcher program. To be run on the subject's PC.
   (one at a time).
 
 * The module to be launched (and various other options) can be specified at the command line; here is a complete listing of all possible config options and their defaults:
-  launcher.py --module Sample1 --studypath studies/Sample1 --autolaunch 1 --developer 1 --engineconfig defaultsettings.prc --datariver 0 --labstreaming 1 --fullscreen 0 --windowsize 800x600 --windoworigin 50/50 --noborder 0 --nomousecursor 0 --timecompensation 1
+  launcher.py --module Sample1 --studypath studies/Sample1 --autolaunch 1 --developer 1 --engineconfig defaultsettings.prc --datariver 0 --labstreaming 1 --fullscreen 0 --windowsize 800x600 --windoworigin 50/50 --noborder 0 --nomousecursor 0 --timecompensation 1 --timingstream 0 --scheduling free --backend thread --asyncmarkers 1 --logformat text --moduleindex logs/moduleindex.cache --commandbudget 0.005 --instances "" --headless 0 --framerate 60 --inputscript "" --clock monotonic --clockspeed 1 --record "" --replay ""
     
 * If in developer mode, several key bindings are enabled:
    Esc: exit program
    F1: start module
    F2: cancel module
+   F5: prune module resources
+   F6: reload module from disk
   
 * In addition to modules, there are "study configuration files" (aka study configs),
   which are in in the studies directory. These specify the module to launch in the first line
   and assignments to member variables of the module instance in the remaining lines (all Python syntax allowed).
+  Configs are compiled once and cached until the file changes; plain name=value assignments are checked against the 
+  module's settings (unknown names and mismatching types are reported), and the changed settings are listed on load.
   
   A config can be specified in the command line just by passing the appropriate .cfg file name, as in the following example.
   In addition, the directory where to look for the .cfg file can be specified as the studypath.
@@ -29,17 +33,75 @@ The SNAP experiment launcher program. To be run on the subject's PC.
   config configname.cfg  --> load a config named configname.cfg (make sure that the studypath is set correctly so that it's found)
   setup name=value       --> assign a value to a member variable in the current module instance
                              can also involve multiple assignments separated by semicolons, full Python syntax allowed.
+  reload                 --> reload the current module (and any other modules under the modules folder that it uses) from disk,
+                             without restarting the engine; member variables that were assigned via setup or a config are carried over
+  timing                 --> reply with a report of the recent frame timing statistics (inter-frame intervals, sleep lateness,
+                             time spent in tick functions and sub-tasks in milliseconds, sub-tasks woken per frame), terminated by an empty line
+  progress               --> reply with the progress of the background pre-loading of the current module's media (see LatentModule.asset_manifest()),
+                             as a line of the form "prefetch: done/total (N failed)", or "prefetch: idle" if nothing is being pre-loaded
+  list                   --> reply with the names of all modules under the modules folder, one per line as in "name: folder", terminated by an empty line
+  startup                --> reply with a trace of the launcher's startup, one line per phase (start time and duration in milliseconds
+                             since the launcher was started, and the phase name) plus the total time until the first frame, terminated by an empty line
+
+* In addition, the remote-control port understands a structured protocol where each line is a JSON request of the form
+  {"v": 1, "id": 17, "cmd": "setup", "arg": "speed=2"}, to which the launcher replies (once the command has been executed
+  on the engine thread) with one JSON line of the form {"v": 1, "id": 17, "ok": true, "result": ...} or
+  {"v": 1, "id": 17, "ok": false, "error": "..."}. Requests can be pipelined (replies come back in order), and a JSON list of
+  requests is executed as a batch and answered with a list of replies (if a command in a batch fails, the remaining ones are 
+  skipped and reported as errors). Besides the commands above (where load, config and reload fail if the module could not be 
+  loaded and timing, progress, list and startup return their data as JSON), the following command is supported:
+  status                 --> reply with the protocol version, the current module, whether it is executing, the number of queued
+                             remote commands, the command being executed in the background (if any), the pre-loading progress 
+                             and a summary of the frame timing statistics; unless sent in a batch, this is answered immediately
+
+* Remote commands are executed by the engine thread between frames, for at most the time given by --commandbudget per frame; 
+  the long-running commands load, config, reload and prune are handed off to a background worker (one at a time; subsequent 
+  commands wait for them to complete), so that the frames keep flowing while they run. Structured requests are answered once
+  the respective command has completed.
    
+* The launcher can host several module sessions side by side (e.g., the LSE server and its two clients for local testing), 
+  via --instances module@port,module@port,...; each additional session gets its own window and remote-control port (with 
+  the same protocol as above), while the engine, the loaded media and the LSL outlets are shared. The developer keys apply 
+  to the first session. Stimuli of a module in an additional session (and of the sub-tasks that it launch()es) are drawn 
+  into that session's window (see BasicStimuli.set_engine()); the module can also reach the window's scene graph via 
+  self._engine.base.render, .camera etc., and should pass self._engine.parent as the parent of any ui_elements it creates.
+
+* For automated (e.g., regression-test) runs on machines without a display, the launcher can run in headless mode (--headless 1),
+  without a window or audio output and under a virtual clock that advances by exactly one frame period (1/--framerate seconds)
+  per frame, regardless of how long the frame actually took; this way, sleep(), waitfor() and the Panda3d task timers run
+  much faster than real time. Latent code is then scheduled cooperatively. Keyboard and other input can be supplied via an
+  input script (--inputscript, see framework/inputscript.py). The launcher exits once the (first) module has finished or
+  the input script has reached its exit event.
+
+* A session can be recorded into a compact binary session log via --record filename.slog (see framework/sessionlog.py): 
+  this captures the input events that reach the modules' event handlers, the remote-control commands, the callbacks from
+  remote clients (if the module registers them) and the random seeds (which are drawn anew and recorded whenever a module 
+  is started), each with its timestamp. A recorded session can be replayed in headless mode via --replay filename.slog 
+  (which implies --headless 1), e.g. to reproduce and profile a specific run offline and faster than real time; the 
+  launcher exits once the end of the recording has been reached.
+
+* All experiment timing (sleep(), stimulus onsets, event marker timestamps, etc.) is read from the framework clock (see 
+  framework/clock.py), which can be selected via --clock: monotonic (the default; a high-resolution clock that is not 
+  affected by adjustments of the system time), lsl (LSL's local_clock(), so that marker timestamps need no clock-offset 
+  correction), wall (the system time, as in earlier versions) or accelerated (runs --clockspeed times faster than real time,
+  e.g. for simulations with a window; note that the Panda3d task timers are not accelerated). Headless mode always uses a 
+  virtual clock.
+
 * The underlying Panda3d engine can be configured via a custom .prc file (specified as --engineconfig=filename.prc), see
   http://www.panda3d.org/manual/index.php/Configuring_Panda3D
   
 * For quick-and-dirty testing you may also override the launch options below under "Default Launcher Configuration", but note that you cannot check these changes back into the main source repository of SNAP.  
     
 '''
-import optparse, sys, os, fnmatch, traceback
+import optparse, sys, os, traceback, types
+import framework.startuptrace
+startup = framework.startuptrace.trace.begin('parse options')
 
 SNAP_VERSION = '1.01'
 
+# version of the structured (JSON) remote-control protocol
+PROTOCOL_VERSION = 1
+
 
 # -----------------------------------------------------------------------------------------
 # --- Default Launcher Configuration (selectively overridden by command-line arguments) ---
@@ -82,10 +144,53 @@ DATA_RIVER = False
 # Enable lab streaming layer support for marker sending.
 LAB_STREAMING = True
 
+# Whether markers are dispatched asynchronously (timestamped at call time, but sent to LSL, the marker log
+# and DataRiver in batches by a background thread) rather than synchronously by the calling thread
+ASYNC_MARKERS = True
+
+# The format of the marker log in the logs directory; either 'text' (markerlog-N.log) or 'binary' (markerlog-N.mlog,
+# a compact indexed format; see framework/eventmarkers/markerlog.py for a reader and a converter to text)
+MARKER_LOG_FORMAT = 'text'
+
 # This is the default port on which the launcher listens for remote control 
 # commands (e.g. launching an experiment module)
 SERVER_PORT = 7897
 
+# The file in which the index of the modules under the modules folder is kept across sessions (so that modules
+# can be found without searching the whole folder tree each time); set this to None to keep the index in memory only
+MODULE_INDEX = "logs/moduleindex.cache"
+
+# The maximum time per frame, in seconds, that the engine thread spends executing remote commands (at least one
+# command is executed per frame); long-running commands, such as loading a module, are executed in the background
+REMOTE_COMMAND_BUDGET = 0.005
+
+# Additional module sessions to host in the same launcher process, as a comma-separated list of module@port entries, 
+# e.g. "LSE_GameClient@7898,LSE_GameClient@7899" (the module can also be a .cfg file, and the port defaults to the next free 
+# one after SERVER_PORT); each session gets its own window and remote-control port, and all share the engine, media and LSL outlets
+INSTANCES = ""
+
+# Whether to run without a window and audio output, under a virtual clock that advances by one frame period per frame
+# (i.e., faster than real time); this implies cooperative scheduling and exits once the module has finished
+HEADLESS = False
+
+# The frame rate that is simulated in headless mode (the virtual clock advances by 1/HEADLESS_FRAME_RATE per frame)
+HEADLESS_FRAME_RATE = 60
+
+# Optionally a script of timed input events to play back (see framework/inputscript.py), e.g. for headless runs
+INPUT_SCRIPT = None
+
+# Optionally a file into which the session's inputs (events, remote commands, client callbacks, random seeds) are recorded
+RECORD_SESSION = None
+
+# Optionally a recorded session to replay (in headless mode)
+REPLAY_SESSION = None
+
+# The clock that is used for all experiment timing: monotonic, lsl, wall or accelerated (see framework/clock.py)
+CLOCK = "monotonic"
+
+# The speed of the accelerated clock, in clock seconds per real second
+CLOCK_SPEED = 1
+
 # Whether the Launcher starts in developer mode; if true, modules can be loaded,
 # started and cancelled via keyboard shortcuts (not recommended for production 
 # experiments)
@@ -94,6 +199,17 @@ DEVELOPER_MODE = True
 # Whether lost time (e.g., to processing or jitter) is compensated for by making the next sleep() slightly shorter
 COMPENSATE_LOST_TIME = True
 
+# The scheduling mode for latent module code; either 'free' (the module threads run whenever the engine is not
+# busy) or 'cooperative' (the module code is resumed synchronously at a defined point in each frame, during tick())
+SCHEDULING = 'free'
+
+# The execution backend for latent module code; either 'thread' (one thread per module/sub-task) or 'coroutine'
+# (coroutines on the engine thread, which requires either greenlet or generator-based run() functions)
+LATENT_BACKEND = 'thread'
+
+# Whether the frame timing statistics (inter-frame intervals, sleep lateness, tick durations) are streamed out via LSL
+FRAME_TIMING_STREAM = False
+
 
 
 # ------------------------------
@@ -130,35 +246,98 @@ parser.add_option("-r","--datariver", dest="datariver", default=DATA_RIVER,
                   help="Whether to enable DataRiver support in the launcher.")
 parser.add_option("-l","--labstreaming", dest="labstreaming", default=LAB_STREAMING,
                   help="Whether to enable lab streaming layer (LSL) support in the launcher.")
+parser.add_option("-y","--asyncmarkers", dest="asyncmarkers", default=ASYNC_MARKERS,
+                  help="Whether to dispatch markers asynchronously (timestamped at call time, sent in batches by a background thread).")
+parser.add_option("-g","--logformat", dest="logformat", default=MARKER_LOG_FORMAT,
+                  help="Format of the marker log: text or binary (compact, indexed; see framework/eventmarkers/markerlog.py).")
 parser.add_option("-p","--serverport", dest="serverport", default=SERVER_PORT,
                   help="The port on which the launcher listens for remote control commands (e.g. loading a module).")
 parser.add_option("-t","--timecompensation", dest="timecompensation", default=COMPENSATE_LOST_TIME,
                   help="Compensate time lost to processing or jitter by making the successive sleep() call shorter by a corresponding amount of time (good for real time, can be a hindrance during debugging).")
+parser.add_option("-k","--scheduling", dest="scheduling", default=SCHEDULING,
+                  help="Scheduling mode for latent module code: either free (module threads run whenever the engine is not busy) or cooperative (module code is resumed synchronously at a defined point in each frame; lower CPU use and deterministic resume latency).")
+parser.add_option("-n","--backend", dest="backend", default=LATENT_BACKEND,
+                  help="Execution backend for latent module code: either thread (one thread per module and sub-task) or coroutine (coroutines resumed from the engine thread; requires greenlet or generator-based run() functions). Modules with a generator-based run() function always run as coroutines.")
+parser.add_option("-i","--timingstream", dest="timingstream", default=FRAME_TIMING_STREAM,
+                  help="Whether to stream out frame timing statistics (inter-frame intervals, sleep lateness, tick durations) via the lab streaming layer.")
+parser.add_option("-x","--moduleindex", dest="moduleindex", default=MODULE_INDEX,
+                  help="The file in which the index of the modules under the modules folder is cached across sessions (none to disable).")
+parser.add_option("-u","--commandbudget", dest="commandbudget", default=REMOTE_COMMAND_BUDGET,
+                  help="The maximum time per frame, in seconds, that is spent executing remote commands (long-running commands such as load are executed in the background).")
+parser.add_option("-j","--instances", dest="instances", default=INSTANCES,
+                  help="Additional module sessions to host in this launcher, as a comma-separated list of module@port entries (each with its own window and remote-control port).")
+parser.add_option("-z","--headless", dest="headless", default=HEADLESS,
+                  help="Whether to run without window and audio output, under a virtual clock that runs faster than real time (for automated runs).")
+parser.add_option("-v","--framerate", dest="framerate", default=HEADLESS_FRAME_RATE,
+                  help="The frame rate that is simulated in headless mode.")
+parser.add_option("-q","--inputscript", dest="inputscript", default=INPUT_SCRIPT,
+                  help="A script of timed input events to play back (see framework/inputscript.py).")
+parser.add_option("-K","--clock", dest="clock", default=CLOCK,
+                  help="The clock that is used for all experiment timing: monotonic, lsl, wall or accelerated (ignored in headless mode).")
+parser.add_option("-S","--clockspeed", dest="clockspeed", default=CLOCK_SPEED,
+                  help="The speed of the accelerated clock, in clock seconds per real second.")
+parser.add_option("-R","--record", dest="record", default=RECORD_SESSION,
+                  help="A file into which the session's inputs are recorded (see framework/sessionlog.py).")
+parser.add_option("-P","--replay", dest="replay", default=REPLAY_SESSION,
+                  help="A recorded session to replay in headless mode (see framework/sessionlog.py).")
 (opts,args) = parser.parse_args()
+headless = (opts.headless == True) or (opts.headless == '1') or bool(opts.replay)
+framework.startuptrace.trace.end(startup)
 
 # --- Pre-engine initialization ---
 
 print 'Performing pre-engine initialization...'
 from framework.eventmarkers.eventmarkers import send_marker, init_markers
-init_markers(opts.labstreaming,True,opts.datariver)
+import framework.frametiming
+import threading
+
+def init_backends():
+    """Initialize the marker backends and the timing stream (LSL, DataRiver); runs in the background while the engine starts up."""
+    with framework.startuptrace.trace.phase('init markers'):
+        init_markers(opts.labstreaming,True,opts.datariver,(opts.asyncmarkers == True) or (opts.asyncmarkers == '1'),opts.logformat)
+    if (opts.timingstream == True) or (opts.timingstream == '1'):
+        with framework.startuptrace.trace.phase('init timing stream'):
+            framework.frametiming.recorder.enable_lsl_stream()
+backend_init = threading.Thread(target=init_backends)
 
 # --- Engine initialization ---
 
 print 'Loading the Panda3d engine...',
+startup = framework.startuptrace.trace.begin('import engine')
 # panda3d support
 from direct.showbase.ShowBase import ShowBase
 from direct.task.Task import Task
-from pandac.PandaModules import WindowProperties
+from pandac.PandaModules import WindowProperties, NodePath, Camera, PerspectiveLens, OrthographicLens, PGTop
 from panda3d.core import loadPrcFile, loadPrcFileData, Filename, DSearchPath, VBase4 
 # thread coordination
 import framework.tickmodule
-import threading
+if headless and opts.backend != 'coroutine' and opts.scheduling != 'cooperative':
+    print "(using cooperative scheduling in headless mode)",
+    opts.scheduling = 'cooperative'
+framework.tickmodule.scheduling = opts.scheduling
+framework.tickmodule.latent_backend = opts.backend
+# module discovery and study configs
+import framework.moduleindex
+import framework.studyconfig
+# clock service and input for headless runs
+import framework.clock
+import framework.inputscript
+import framework.sessionlog
+import atexit
+from pandac.PandaModules import ClockObject
 # network support
 import Queue
 import SocketServer
+import json
+import time
+framework.startuptrace.trace.end(startup)
 print "done."
 
+# (this is started only now since Python's import lock would otherwise serialize it with the engine imports)
+backend_init.start()
+
 print "Applying the engine configuration file/settings..."
+startup = framework.startuptrace.trace.begin('engine configuration')
 
 # load the selected engine configuration (studypath takes precedence over the SNAP root path)
 config_searchpath = DSearchPath()
@@ -182,6 +361,13 @@ if opts.noborder is not None:
     loadPrcFileData('', 'undecorated ' + opts.noborder)
 if opts.nomousecursor is not None:
     loadPrcFileData('', 'nomousecursor ' + opts.nomousecursor)
+if headless:
+    loadPrcFileData('', 'window-type none')
+    loadPrcFileData('', 'audio-library-name null')
+    framework.clock.set_clock(framework.clock.VirtualClock())
+else:
+    framework.clock.set_clock(framework.clock.create_clock(opts.clock,float(opts.clockspeed)))
+framework.startuptrace.trace.end(startup)
 
 
 
@@ -189,86 +375,71 @@ if opts.nomousecursor is not None:
 # --- Main application definition ---
 # -----------------------------------
 
-class MainApp(ShowBase):    
-    """The Main SNAP application."""
-    
-    def __init__(self,opts):
-        ShowBase.__init__(self)
+class Session:
+    """
+    A module instance hosted by the launcher, with its own remote-control port and (optionally) its own window.
+    Several sessions can run side by side in one launcher, sharing the engine, the media cache and the LSL outlets.
+    """
 
+    def __init__(self,app,opts,port,window=None):
+        self._app = app                  # the MainApp that hosts the session
         self._module = None              # the currently loaded module
         self._instance = None            # instance of the module's Main class
         self._executing = False          # whether we are executing the module
         self._remote_commands = Queue.Queue() # a message queue filled by the TCP server
         self._opts = opts                # the configuration options
-        self._console = None             # graphical console, if any
-        
-        # send an initial start marker
-        send_marker(999)
-
-        # preload some data and init some settings
-        self.set_defaults()
-
-        # register the main loop
-        self._main_task = self.taskMgr.add(self._main_loop_tick,"main_loop_tick")
-        
-        # register global keys if desired
-        if opts.developer:
-            self.accept("escape",exit)
-            self.accept("f1",self._remote_commands.put,['start'])
-            self.accept("f2",self._remote_commands.put,['cancel'])
-            self.accept("f5",self._remote_commands.put,['prune'])
-            self.accept("f12",self._init_console)
-                
-        # load the initial module or config if desired
-        if opts.module is not None:
-            if opts.module.endswith(".cfg"):
-                self.load_config(opts.module)
-            else:
-                self.load_module(opts.module)
-                
-        # start the module if desired
-        if (opts.autolaunch == True) or (opts.autolaunch=='1'):
-            self.start_module()
+        self._window = window            # the SessionWindow of the session, or None if it uses the main window
+        self._prefetch_job = None        # progress of the background pre-loading of the current module's media, if any
+        self._pending = None             # the remote-control message whose commands are currently being executed (PendingCommands), if any
+        self._background = None          # the long-running remote command that is currently being executed in the background (BackgroundCommand), if any
+        self._setup_variables = set()    # names of the member variables of the current module instance that were assigned via setup or a config
+        self.port = port                 # the port on which the session listens for remote-control commands
 
-        # start the TCP server for remote control
-        self._init_server(opts.serverport)
 
-        
     def set_defaults(self):
         """Sets some environment defaults that might be overridden by the modules."""
-        font = loader.loadFont('arial.ttf',textureMargin=5)
-        font.setPixelsPerUnit(128)
-        base.win.setClearColorActive(True)
-        base.win.setClearColor((0.3, 0.3, 0.3, 1))
-        winprops = WindowProperties() 
-        winprops.setTitle('SNAP') 
-        base.win.requestProperties(winprops) 
-        
-        
-    def load_module(self,name):
-        """Try to load the given module, if any. The module can be in any folder under modules."""
+        self._app.set_defaults(self._window)
+
+
+    def load(self,name):
+        """Load the given module or (if the name ends in .cfg) study config."""
+        if name.endswith(".cfg"):
+            return self.load_config(name)
+        else:
+            return self.load_module(name)
+
+
+    def load_module(self,name,prefetch=True):
+        """
+        Try to load the given module, if any. The module can be in any folder under modules.
+        If prefetch is True, the media declared in the module's asset manifest are pre-loaded in the background.
+        Returns whether the module was loaded successfully.
+        """
         if name is not None and len(name) > 0:
             print 'Importing experiment module "' + name + '"...',            
             # find it under modules...
-            locations = []
-            for root, dirnames, filenames in os.walk('modules'):
-                for filename in fnmatch.filter(filenames, name+'.py'):
-                    locations.append(root)
+            locations = self._app._module_index.locate(name)
             if len(locations) == 1:
-                if self._instance is not None:
-                    self.prune_module()
-                self.set_defaults()
                 if locations[0] not in sys.path:
                     sys.path.insert(0, locations[0])
                 try:
-                    # import it
-                    self._module = __import__(name)
-                    print 'done.'
-                    # instantiate the main class 
-                    print "Instantiating the module's Main class...",
-                    self._instance = self._module.Main()
-                    self._instance._make_up_for_lost_time = self._opts.timecompensation
+                    # import it (this does not touch the engine, so it can run in parallel to the frames)
+                    module = __import__(name)
                     print 'done.'
+                    with framework.tickmodule.shared_lock:
+                        if self._instance is not None:
+                            self.prune_module()
+                        self.set_defaults()
+                        self._module = module
+                        # instantiate the main class 
+                        print "Instantiating the module's Main class...",
+                        self._instance = self._module.Main()
+                        self._attach_instance()
+                        self._setup_variables = set()
+                        print 'done.'
+                        if prefetch:
+                            self.prefetch_assets()
+                    return True
                 except ImportError,e:
                     print "The experiment module '"+ name + "' could not be imported correctly. Make sure that its own imports are properly found by Python; reason:"
                     print e
@@ -278,32 +449,168 @@ class MainApp(ShowBase):
                 print "The module named '" + name + "' was not found in the modules folder or any of its sub-folders."                    
             else:
                 print "The module named '" + name + "' was found in multiple sub-folders of the modules folder; make sure that you are not using a duplicate name."                    
+        return False
 
 
     def load_config(self,name):
-        """Try to load a study config file (see studies directory)."""
+        """Try to load a study config file (see studies directory). Returns whether the config was loaded successfully."""
         print 'Attempting to load config "'+ name+ '"...'
         file = os.path.join(self._opts.studypath,name)
         try:
             if not os.path.exists(file):
                 print 'file "' + file + '" not found.'
             else:
-                with open(file,'r') as f:
-                    self.load_module(f.readline().strip())
-                    print 'Now setting variables...',
-                    for line in f.readlines():
-                        exec line in self._instance.__dict__
+                # compiled configs are cached, so this re-parses the file only if it has changed
+                config = framework.studyconfig.load(file)
+                if not self.load_module(config.module,prefetch=False):
+                    return False
+                with framework.tickmodule.shared_lock:
+                    print 'Now setting variables...'
+                    changes = config.apply(self._instance)
+                    for name,old,new in changes:
+                        self._setup_variables.add(name)
+                    print framework.studyconfig.format_changes(changes)
                     print 'done; config is loaded.'
+                    # the manifest may depend on the config variables, so prefetch only now
+                    self.prefetch_assets()
+                return True
         except Exception,e:
             print 'Error while loading the study config file "' + file + '".'
             print e
             traceback.print_exc()
+        return False
             
+    # assign member variables of the currently loaded module (given as Python code)
+    def setup_module(self,code):
+        namespace = self._instance.__dict__
+        before = dict(namespace)
+        exec code in namespace
+        # remember which variables have been assigned so that they survive a reload
+        for name,value in namespace.iteritems():
+            if name != '__builtins__' and (name not in before or before[name] is not value):
+                self._setup_variables.add(name)
+
+    # reload the currently loaded module and the modules under the modules folder that it imports from disk; returns whether successful
+    # (modules that are also in use by another session are not reloaded)
+    def reload_module(self):
+        if self._module is None:
+            print 'No module loaded; nothing to reload.'
+            return False
+        shared = set()
+        for session in self._app._sessions:
+            if session is not self and session._module is not None:
+                if session._module is self._module:
+                    print 'Module "' + self._module.__name__ + '" is also running in the session on port ' + str(session.port) + '; not reloading it.'
+                    return False
+                shared.add(session._module.__name__)
+                shared.update([m.__name__ for m in _module_dependencies(session._module)])
+        with framework.tickmodule.shared_lock:
+            self.cancel_module()
+            self.prune_module()
+            carried = dict([(name,self._instance.__dict__[name]) for name in self._setup_variables if name in self._instance.__dict__])
+        print 'Reloading module "' + self._module.__name__ + '" from disk...',
+        try:
+            # reload the modules that it depends on first (leaves first), so that the imports of each pick up the new code
+            # (the framework is not reloaded, since it holds the engine state, caches and LSL outlets)
+            skipped = []
+            for module in _module_dependencies(self._module):
+                if module.__name__ in shared:
+                    skipped.append(module.__name__)
+                else:
+                    reload(module)
+            self._module = reload(self._module)
+            print 'done.'
+            if skipped:
+                print 'Not reloaded since in use by other sessions:', ', '.join(skipped)
+            with framework.tickmodule.shared_lock:
+                print "Instantiating the module's Main class...",
+                self._instance = self._module.Main()
+                self._attach_instance()
+                self._instance.__dict__.update(carried)
+                print 'done; carried over', len(carried), 'variables.'
+                self.prefetch_assets()
+            return True
+        except Exception,e:
+            print "The experiment module could not be reloaded; reason:"
+            print e
+            traceback.print_exc()
+            return False
+
+    # pre-load the media declared by the currently loaded module in the background
+    def prefetch_assets(self):
+        self._prefetch_job = None
+        if self._instance is not None:
+            try:
+                manifest = self._instance.asset_manifest()
+                if manifest:
+                    print 'Pre-loading', len(manifest), 'media files in the background...'
+                    self._prefetch_job = self._instance.precache_many(manifest)
+            except Exception as inst:
+                print "Exception while pre-loading the module's media:"
+                print inst
+
+    # get the progress of the background pre-loading as a dictionary (or None if nothing is being pre-loaded)
+    def prefetch_progress(self):
+        job = self._prefetch_job
+        if job is None:
+            return None
+        return {'done':job.done, 'total':job.total, 'failed':[f for k,f in job.failed]}
+
+    # get a dictionary that describes the current state of the session
+    def status(self):
+        return {'protocol':PROTOCOL_VERSION,
+                'snap':SNAP_VERSION,
+                'port':self.port,
+                'module':self._module.__name__ if self._module is not None else None,
+                'executing':self._executing,
+                'queued':self._remote_commands.qsize(),
+                'busy':self._background.command if self._background is not None else None,
+                'prefetch':self.prefetch_progress(),
+                'timing':framework.frametiming.recorder.summary()}
+
+    # execute a remote-control command (e.g. "setup x=5"); returns the result, if any, and raises an exception on failure
+    def execute_command(self,cmd):
+        if cmd == "start":
+            if self._instance is None:
+                raise RuntimeError("No module loaded.")
+            self.start_module()
+        elif (cmd == "cancel") or (cmd == "stop"):
+            self.cancel_module()
+        elif cmd == "prune":
+            with framework.tickmodule.shared_lock:
+                self.prune_module()
+        elif cmd == "reload":
+            if not self.reload_module():
+                raise RuntimeError("The module could not be reloaded.")
+        elif cmd.startswith("load "):
+            if not self.load_module(cmd[5:]):
+                raise RuntimeError("The module '" + cmd[5:] + "' could not be loaded.")
+        elif cmd.startswith("setup "):
+            if self._instance is None:
+                raise RuntimeError("No module loaded.")
+            self.setup_module(cmd[6:])
+        elif cmd.startswith("config "):
+            name = cmd[7:] if cmd.endswith(".cfg") else cmd[7:]+".cfg"
+            if not self.load_config(name):
+                raise RuntimeError("The config '" + name + "' could not be loaded.")
+        elif cmd == "status":
+            return self.status()
+        elif cmd == "timing":
+            return framework.frametiming.recorder.summary()
+        elif cmd == "startup":
+            return framework.startuptrace.trace.summary()
+        elif cmd == "progress":
+            return self.prefetch_progress()
+        elif cmd == "list":
+            return dict(self._app._module_index.modules())
+        else:
+            raise ValueError("Unknown command: " + cmd)
+
     # start executing the currently loaded module
     def start_module(self):        
         if self._instance is not None:
             self.cancel_module()
-            print 'Starting module execution...',
+            print 'Starting module execution (random seed ' + str(framework.sessionlog.seed_random()) + ')...',
             self._instance.start()
             print 'done.'
             self._executing = True
@@ -329,21 +636,97 @@ class MainApp(ShowBase):
                 print inst
             print 'done.'
 
+
+    # tick the module instance, if it is executing; returns whether it was ticked
+    def tick(self,record_frames=True):
+        if (self._instance is not None) and self._executing:
+            # (only one of several concurrently executing modules feeds the frame timing statistics)
+            self._instance._record_frames = record_frames
+            self._instance.tick()
+            return True
+        return False
+
+    # check whether the module has been started and has finished running by itself
+    def finished(self):
+        return self._executing and hasattr(self._instance,'is_alive') and not self._instance.is_alive()
+
             
     # --- internal ---
 
+    def _attach_instance(self):
+        """Apply the launcher settings to a new module instance and direct its stimuli to the session's window, if any."""
+        self._instance._make_up_for_lost_time = self._opts.timecompensation
+        if self._window is not None:
+            engine = self._instance._engine
+            self._instance.set_engine(base=self._window,direct=engine.direct,pandac=engine.pandac,parent=self._window.aspect2d)
+
+    def submit_line(self,data,write):
+        """
+        Queue up a line of the remote-control protocol (a plain command, or a structured request or batch) for execution;
+        replies to structured requests are written via the given function. Status requests are answered immediately.
+        """
+        if data[0] in '{[':
+            try:
+                request = json.loads(data)
+            except ValueError as e:
+                write(json.dumps(_make_reply({},error='Malformed request: ' + str(e))) + '\n')
+                return
+            batch = isinstance(request,list)
+            if not batch and isinstance(request,dict) and request.get('cmd') == 'status':
+                # status queries are answered immediately (e.g., while a module is being loaded)
+                write(json.dumps(_make_reply(request,result=self.status()),default=str) + '\n')
+                return
+            item = RemoteRequest(request if batch else [request],batch,write)
+        else:
+            item = data
+        recorder = framework.sessionlog.recorder
+        if recorder is not None:
+            recorder.record_command(self.port,data)
+        self._remote_commands.put(item)
+
+
     def _init_server(self,port):
         """Initialize the remote control server."""
-        destination = self._remote_commands 
+        session = self
         class ThreadedTCPRequestHandler(SocketServer.StreamRequestHandler):
             def handle(self):
                 try:
                     print "Client connection opened."
+                    write_lock = threading.Lock()
+                    def write(text):
+                        # replies to structured requests are written from the engine thread
+                        with write_lock:
+                            try:
+                                self.wfile.write(text)
+                            except:
+                                pass
                     while True:
                         data = self.rfile.readline().strip()
                         if len(data)==0:
                             break                        
-                        destination.put(data)
+                        if data[0] in '{[':
+                            # structured request (or batch of requests)
+                            session.submit_line(data,write)
+                        elif data == "timing":
+                            # timing queries are answered directly
+                            self.wfile.write(framework.frametiming.recorder.report() + '\n\n')
+                        elif data == "startup":
+                            # startup traces are answered directly, too
+                            self.wfile.write(framework.startuptrace.trace.report() + '\n\n')
+                        elif data == "list":
+                            # module listings are answered directly, too
+                            for module,locations in session._app._module_index.modules():
+                                self.wfile.write(module + ': ' + ', '.join(locations) + '\n')
+                            self.wfile.write('\n')
+                        elif data == "progress":
+                            # progress queries are answered directly, too
+                            job = session._prefetch_job
+                            if job is None:
+                                self.wfile.write('prefetch: idle\n')
+                            else:
+                                self.wfile.write('prefetch: %i/%i (%i failed)\n' % (job.done,job.total,len(job.failed)))
+                        else:
+                            session.submit_line(data,write)
                 except:
                     print "Connection closed by client."
 
@@ -361,6 +744,178 @@ class MainApp(ShowBase):
             print "failed; the port is already taken (probably the previous process is still around)."
     
   
+    # process queued-up remote control messages, within the per-frame time budget
+    def _process_remote_commands(self):
+        deadline = time.time() + float(self._opts.commandbudget)
+        while True:
+            if self._background is not None:
+                # a long-running command is in progress: wait for it to complete before executing any further ones
+                if self._background.is_alive():
+                    return
+                print 'Remote command "' + self._background.command + '" completed after %.2f seconds.' % self._background.duration
+                self._pending.complete(self._background.result,self._background.error)
+                self._background = None
+            if self._pending is None or self._pending.finished():
+                try:
+                    self._pending = PendingCommands(self._remote_commands.get_nowait())
+                except Queue.Empty:
+                    self._pending = None
+                    return
+                continue
+            try:
+                cmd = self._pending.next_command()
+            except Exception as e:
+                self._pending.complete(error=str(e))
+                continue
+            if _is_background_command(cmd):
+                self._background = BackgroundCommand(self.execute_command,cmd)
+                self._background.start()
+            else:
+                try:
+                    self._pending.complete(self.execute_command(cmd))
+                except Exception as e:
+                    self._pending.complete(error=str(e) or e.__class__.__name__)
+            if time.time() >= deadline:
+                return
+
+
+
+
+class SessionWindow:
+    """
+    An additional window for a session, with its own 3d scene graph, camera and 2d overlay (aspect2d).
+    Attributes that are not specific to the window (taskMgr, loader, ...) are those of the global base object,
+    so that the window can stand in for base as the engine of a module (see BasicStimuli.set_engine()).
+    """
+
+    def __init__(self,title):
+        self.title = title
+        props = WindowProperties()
+        props.setTitle(title)
+        self.win = base.openWindow(props=props,makeCamera=False)
+        aspect = base.getAspectRatio(self.win)
+        # 3d scene graph and camera
+        self.render = NodePath('render')
+        self.camera = self.render.attachNewNode('camera')
+        lens = PerspectiveLens()
+        lens.setAspectRatio(aspect)
+        self.camNode = Camera('cam',lens)
+        self.cam = self.camera.attachNewNode(self.camNode)
+        region = self.win.makeDisplayRegion()
+        region.setCamera(self.cam)
+        # 2d overlay
+        self.render2d = NodePath('render2d')
+        self.render2d.setDepthTest(False)
+        self.render2d.setDepthWrite(False)
+        self.render2d.setMaterialOff(1)
+        self.render2d.setTwoSided(True)
+        self.aspect2d = self.render2d.attachNewNode(PGTop('aspect2d'))
+        self.aspect2d.setScale(1.0/aspect,1.0,1.0)
+        lens2d = OrthographicLens()
+        lens2d.setFilmSize(2,2)
+        lens2d.setNearFar(-1000,1000)
+        self.cam2d = self.render2d.attachNewNode(Camera('cam2d',lens2d))
+        region2d = self.win.makeDisplayRegion()
+        region2d.setSort(10)
+        region2d.setClearDepthActive(True)
+        region2d.setCamera(self.cam2d)
+
+    def __getattr__(self,name):
+        # everything else is shared with the main engine
+        return getattr(base,name)
+
+
+
+
+class MainApp(ShowBase):    
+    """The Main SNAP application."""
+    
+    def __init__(self,opts):
+        with framework.startuptrace.trace.phase('open window'):
+            ShowBase.__init__(self)
+
+        self._opts = opts                # the configuration options
+        self._console = None             # graphical console, if any
+        self._default_font = None        # the default font (loaded once, on first use)
+        with framework.startuptrace.trace.phase('load module index'):
+            self._module_index = framework.moduleindex.ModuleIndex('modules',None if opts.moduleindex in (None,'','none') else opts.moduleindex)
+        self._sessions = [Session(self,opts,int(opts.serverport))] # the hosted module sessions; the first one uses the main window
+        self._input_script = None        # the InputScript (or SessionReplay) that is being played back, if any
+        self._clock_origin = framework.clock.now() # the time of the virtual clock at the first frame (headless mode only)
+        self._real_origin = time.time()  # the wall-clock time at startup (headless mode only)
+
+        if headless:
+            # advance the engine's clock (and thereby the virtual clock) by exactly one frame period per frame
+            globalClock.setMode(ClockObject.MNonRealTime)
+            globalClock.setFrameRate(float(opts.framerate))
+        if opts.replay:
+            if opts.inputscript:
+                print "Ignoring the input script since a session is being replayed."
+            self._input_script = framework.sessionlog.start_replay(opts.replay,self._dispatch_replayed_command)
+        elif opts.inputscript:
+            self._input_script = framework.inputscript.InputScript(opts.inputscript)
+        if opts.record:
+            framework.sessionlog.start_recording(opts.record)
+            atexit.register(framework.sessionlog.stop_recording)
+            self._install_event_recorder()
+        
+        # send an initial start marker
+        send_marker(999)
+
+        # register the main loop
+        self._main_task = self.taskMgr.add(self._main_loop_tick,"main_loop_tick")
+        
+        # register global keys if desired (these apply to the first session)
+        if opts.developer:
+            commands = self._sessions[0]._remote_commands
+            self.accept("escape",exit)
+            self.accept("f1",commands.put,['start'])
+            self.accept("f2",commands.put,['cancel'])
+            self.accept("f5",commands.put,['prune'])
+            self.accept("f6",commands.put,['reload'])
+            self.accept("f12",self._init_console)
+
+        # open the additional sessions, if any (each in its own window)
+        modules = [opts.module]
+        for k,spec in enumerate([s.strip() for s in (opts.instances or '').split(',') if len(s.strip()) > 0]):
+            name,port = spec.split('@') if '@' in spec else (spec,int(opts.serverport)+k+1)
+            self._sessions.append(Session(self,opts,int(port),None if headless else SessionWindow('SNAP @' + str(port))))
+            modules.append(name)
+
+        for session,name in zip(self._sessions,modules):
+            # preload some data and init some settings
+            with framework.startuptrace.trace.phase('set defaults @' + str(session.port)):
+                session.set_defaults()
+            # load the initial module or config if desired
+            if name is not None:
+                with framework.startuptrace.trace.phase('load ' + name + ' @' + str(session.port)):
+                    session.load(name)
+                
+            # start the module if desired
+            if (opts.autolaunch == True) or (opts.autolaunch=='1'):
+                session.start_module()
+
+            # start the TCP server for remote control
+            with framework.startuptrace.trace.phase('start server @' + str(session.port)):
+                session._init_server(session.port)
+
+        
+    def set_defaults(self,window=None):
+        """Sets some environment defaults that might be overridden by the modules (for the given SessionWindow, if any)."""
+        if self._default_font is None:
+            self._default_font = loader.loadFont('arial.ttf',textureMargin=5)
+            self._default_font.setPixelsPerUnit(128)
+        win = base.win if window is None else window.win
+        if win is None:
+            # headless mode
+            return
+        win.setClearColorActive(True)
+        win.setClearColor((0.3, 0.3, 0.3, 1))
+        winprops = WindowProperties() 
+        winprops.setTitle('SNAP' if window is None else window.title) 
+        win.requestProperties(winprops) 
+        
+        
     # init a console that is scoped to the current module
     def _init_console(self):
         """Initialize a pull-down console. Note that this console is a bit glitchy -- use at your own risk."""
@@ -368,58 +923,238 @@ class MainApp(ShowBase):
             try:
                 print "Initializing console...",
                 from framework.console.interactiveConsole import pandaConsole, INPUT_CONSOLE, INPUT_GUI, OUTPUT_PYTHON
-                self._console = pandaConsole(INPUT_CONSOLE|INPUT_GUI|OUTPUT_PYTHON, self._instance.__dict__)
+                self._console = pandaConsole(INPUT_CONSOLE|INPUT_GUI|OUTPUT_PYTHON, self._sessions[0]._instance.__dict__)
                 print "done."
             except Exception as inst:
                 print "failed:"
                 print inst
 
 
+    # record the engine's input events that reach any accept() handlers
+    def _install_event_recorder(self):
+        engine_event = [False]           # whether the event being sent comes from the engine's event queue
+        process_event = self.eventMgr.processEvent
+        send = self.messenger.send
+        def recording_process_event(event):
+            engine_event[0] = True
+            try:
+                process_event(event)
+            finally:
+                engine_event[0] = False
+        def recording_send(event,*args,**kwargs):
+            if engine_event[0]:
+                # (events that the handlers send in turn are not recorded, since they are reproduced by the replay)
+                engine_event[0] = False
+                recorder = framework.sessionlog.recorder
+                if recorder is not None and self.messenger.whoAccepts(event):
+                    recorder.record_event(event,args[0] if len(args) > 0 else kwargs.get('sentArgs',[]))
+            return send(event,*args,**kwargs)
+        self.eventMgr.processEvent = recording_process_event
+        self.messenger.send = recording_send
+
+
+    # dispatch a remote-control line from a replayed session to the session on the given port
+    def _dispatch_replayed_command(self,port,line):
+        for session in self._sessions:
+            if session.port == port:
+                # replies have nowhere to go
+                session.submit_line(line,lambda text: None)
+                return
+        print 'Replay: no session on port ' + str(port) + '; skipping the command "' + line + '".'
+
+
+    # end a headless run
+    def _finish_headless_run(self,reason):
+        elapsed = framework.clock.now() - self._clock_origin
+        print 'Headless run ended (' + reason + ') after %.1f seconds of virtual time (%.1f seconds of real time).' % (elapsed,time.time() - self._real_origin)
+        print framework.frametiming.recorder.report()
+        sys.exit(0)
+
+
     # main loop step, ticked every frame
     def _main_loop_tick(self,task):
-        #framework.tickmodule.engine_lock.release()
-        framework.tickmodule.shared_lock.release()
+        if framework.tickmodule.scheduling != 'cooperative':
+            #framework.tickmodule.engine_lock.release()
+            framework.tickmodule.shared_lock.release()
+
+        if headless:
+            framework.clock.clock.set(self._clock_origin + globalClock.getFrameTime())
+
+        if framework.startuptrace.trace.completed is None:
+            print 'Startup completed after %.2f seconds (send "startup" to the remote-control port for details).' % framework.startuptrace.trace.complete()
+            if framework.sessionlog.recorder is not None:
+                # the replay starts at the first frame, too
+                framework.sessionlog.recorder.set_origin()
+
+        # play back any scripted input
+        if self._input_script is not None and self._input_script.poll() and self._input_script.exit_requested:
+            self._finish_headless_run('the input playback has ended')
 
         # process any queued-up remote control messages
-        try:
-            while True:
-                cmd = str(self._remote_commands.get_nowait()).strip()            
-                if cmd == "start":
-                    self.start_module()
-                elif (cmd == "cancel") or (cmd == "stop"):
-                    self.cancel_module()
-                elif cmd == "prune":
-                    self.prune_module()
-                elif cmd.startswith("load "):
-                    self.load_module(cmd[5:])
-                elif cmd.startswith("setup "):
-                    try:
-                        exec cmd[6:] in self._instance.__dict__
-                    except:
-                        pass
-                elif cmd.startswith("config "):
-                    if not cmd.endswith(".cfg"):
-                        self.load_config(cmd[7:]+".cfg")
-                    else:
-                        self.load_config(cmd[7:])
-        except Queue.Empty:
-            pass
+        for session in self._sessions:
+            session._process_remote_commands()
 
-        # tick the current module
-        if (self._instance is not None) and self._executing:
-            self._instance.tick()
+        # tick the current modules
+        record_frames = True
+        for session in self._sessions:
+            if session.tick(record_frames):
+                record_frames = False
 
-        framework.tickmodule.shared_lock.acquire()
-        #framework.tickmodule.engine_lock.acquire()
+        if headless and self._sessions[0].finished():
+            self._finish_headless_run('the module has finished')
+
+        if framework.tickmodule.scheduling != 'cooperative':
+            framework.tickmodule.shared_lock.acquire()
+            #framework.tickmodule.engine_lock.acquire()
         return Task.cont
 
 
 
+# ------------------------------------------
+# --- Structured remote-control protocol ---
+# ------------------------------------------
+
+class RemoteRequest:
+    """A structured request (or batch of requests) received via the remote-control port; executed on the engine thread."""
+
+    def __init__(self,requests,batch,write):
+        self.requests = requests        # list of request objects (decoded JSON)
+        self.batch = batch              # whether the requests were sent as a batch (and are answered with a list)
+        self._write = write             # function that writes a line of text back to the client
+
+    def respond(self,reply):
+        """Send the given reply (or list of replies) back to the client."""
+        self._write(json.dumps(reply,default=str) + '\n')
+
+
+class PendingCommands:
+    """The commands of a queued-up remote-control message (plain-text command or RemoteRequest) that remain to be executed."""
+
+    def __init__(self,item):
+        if isinstance(item,RemoteRequest):
+            self.request = item
+            self.commands = item.requests
+        else:
+            self.request = None
+            self.commands = [str(item).strip()]
+        self.replies = []               # replies to the commands that have completed so far
+        self.failed = False             # whether a command has failed (in which case the remaining ones are skipped)
+
+    def finished(self):
+        """Whether all commands have completed."""
+        return len(self.replies) == len(self.commands)
+
+    def next_command(self):
+        """Get the text of the next command to execute."""
+        if self.failed:
+            raise RuntimeError('Skipped because a previous command in the batch failed.')
+        command = self.commands[len(self.replies)]
+        return command if self.request is None else _parse_request(command)
+
+    def complete(self,result=None,error=None):
+        """Record the outcome of the next command; the replies are sent back once all commands have completed."""
+        command = self.commands[len(self.replies)]
+        if self.request is None:
+            if error is not None:
+                print 'Error executing remote command "' + command + '":', error
+            self.replies.append(None)
+        else:
+            self.replies.append(_make_reply(command,result,error))
+            if self.finished():
+                self.request.respond(self.replies if self.request.batch else self.replies[0])
+        if error is not None:
+            self.failed = True
+
+
+class BackgroundCommand(threading.Thread):
+    """A long-running remote command (e.g. load) that is executed by a worker thread while the frames keep flowing."""
+
+    def __init__(self,execute,command):
+        threading.Thread.__init__(self,name='RemoteCommand')
+        self.daemon = True
+        self.command = command          # the text of the command
+        self.result = None              # the result of the command, once completed
+        self.error = None               # the error message if the command failed
+        self.duration = None            # the time it took to execute the command, in seconds
+        self._execute = execute
+
+    def run(self):
+        t0 = time.time()
+        try:
+            self.result = self._execute(self.command)
+        except Exception as e:
+            traceback.print_exc()
+            self.error = str(e) or e.__class__.__name__
+        self.duration = time.time() - t0
+
+
+def _is_background_command(cmd):
+    """Whether the given remote command is long-running and therefore executed in the background."""
+    return cmd in ('prune','reload') or cmd.startswith('load ') or cmd.startswith('config ')
+
+
+def _parse_request(request):
+    """Extract the command text from a structured request (e.g. {"cmd": "setup", "arg": "x=5"} gives "setup x=5")."""
+    if not isinstance(request,dict) or not isinstance(request.get('cmd'),basestring):
+        raise ValueError('Requests must be JSON objects with a "cmd" field.')
+    if request.get('v',PROTOCOL_VERSION) != PROTOCOL_VERSION:
+        raise ValueError('Unsupported protocol version: ' + str(request.get('v')) + ' (supported: ' + str(PROTOCOL_VERSION) + ').')
+    cmd = request['cmd'].strip()
+    if request.get('arg') is not None:
+        cmd += ' ' + str(request['arg']).strip()
+    return str(cmd)
+
+
+def _make_reply(request,result=None,error=None):
+    """Create the reply to a structured request."""
+    reply = {'v':PROTOCOL_VERSION, 'id':request.get('id') if isinstance(request,dict) else None}
+    if error is None:
+        reply['ok'] = True
+        reply['result'] = result
+    else:
+        reply['ok'] = False
+        reply['error'] = error
+    return reply
+
+
+def _module_dependencies(module):
+    """
+    Get the modules under the modules folder that the given module imports, directly or indirectly, such that 
+    each module comes after the modules that it imports (not including the given module itself).
+    """
+    folder = os.path.join(os.path.abspath('modules'),'')
+    order = []
+    visited = set([module.__name__])
+    def visit(module):
+        for value in module.__dict__.values():
+            # modules are referenced either directly (import x) or through the classes and functions imported from them (from x import y)
+            if isinstance(value,types.ModuleType):
+                dependency = value
+            else:
+                name = getattr(value,'__module__',None) if isinstance(value,(type,types.ClassType,types.FunctionType)) else None
+                dependency = sys.modules.get(name) if isinstance(name,basestring) else None
+            if dependency is None or dependency.__name__ in visited:
+                continue
+            filename = getattr(dependency,'__file__',None)
+            if filename is not None and os.path.abspath(filename).startswith(folder):
+                visited.add(dependency.__name__)
+                visit(dependency)
+                order.append(dependency)
+    visit(module)
+    return order
+
+
+
 # ----------------------
 # --- SNAP Main Loop ---
 # ----------------------
 
+# the marker backends must be ready before the first marker is sent
+with framework.startuptrace.trace.phase('wait for marker backends'):
+    backend_init.join()
 app = MainApp(opts)
+# (in cooperative mode the module code runs from within the frame, so the lock is only released 
+#  between frames to let other threads, e.g. network callbacks, access the engine)
 while True:
     framework.tickmodule.shared_lock.acquire()
     #framework.tickmodule.engine_lock.acquire()
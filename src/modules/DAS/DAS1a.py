@@ -10,10 +10,9 @@ from framework.ui_elements.RandomPresenter import RandomPresenter
 from framework.deprecated.subtasks.VisualSearchTask import VisualSearchTask
 from direct.gui.DirectGui import *
 from panda3d.core import *
-import framework.speech
 import itertools
 import random
-import time
+import framework.clock
 
 
 class Main(StimulusStream):
@@ -213,7 +212,9 @@ class Main(StimulusStream):
         target_button = DirectButton(command=messenger.send,extraArgs=['target-touchscreen'],rolloverSound=None,clickSound=None,**self.button_params)
         if self.allow_speech:
             try:
-                framework.speech.listenfor(['ack'],lambda phrase,listener: self.send_message('target-spoken'))
+                # (imported on first use, since it pulls in the Windows speech API)
+                import framework.speech_io.speech
+                framework.speech_io.speech.listenfor(['ack'],lambda phrase,listener: self.send_message('target-spoken'))
                 self.accept('target-spoken',self.highlight_mic)
                 speech_operational = True
             except:
@@ -490,12 +491,12 @@ class Main(StimulusStream):
 
     def highlight_mic(self):
         self.voiceimage.icon.setScale(self.voiceimage.scale*1.3)
-        self.voiceimage.reset_scale_at = time.time() + 0.75
+        self.voiceimage.reset_scale_at = framework.clock.now() + 0.75
         taskMgr.doMethodLater(0.75, self.reset_mic, 'DAS1.reset_mic()')
     
     def reset_mic(self,task):
         """Task to reset the mic image to normal size."""
-        if time.time() >= self.voiceimage.reset_scale_at-0.1: # we don't reset if the schedule has been overridden in the meantime...                                
+        if framework.clock.now() >= self.voiceimage.reset_scale_at-0.1: # we don't reset if the schedule has been overridden in the meantime...                                
             self.voiceimage.icon.setScale(self.voiceimage.scale)
         return task.done 
           
\ No newline at end of file
@@ -9,7 +9,7 @@ from framework.ui_elements.EventWatcher import EventWatcher
 from direct.gui.DirectGui import DirectButton
 from panda3d.core import *
 import random
-import time
+import framework.clock
 import pickle
 
 
@@ -783,7 +783,7 @@ class Main(LatentModule):
     
             self.marker(16)
     
-            no_target_before = time.time()      # don't present a target before this time
+            no_target_before = framework.clock.now()      # don't present a target before this time
             self.init_response_parameters()        
     
             self.write('Press the space bar to start.','space',wordwrap=25,scale=0.04)
@@ -954,9 +954,9 @@ class Main(LatentModule):
                         for s in range(numstims):
                             
                             # show a target or a non-target?
-                            istarget = time.time() > no_target_before and random.random() < self.target_probability
+                            istarget = framework.clock.now() > no_target_before and random.random() < self.target_probability
                             if istarget:
-                                no_target_before = time.time() + self.target_free_time
+                                no_target_before = framework.clock.now() + self.target_free_time
                             
                             # turn the target into a cue?
                             iscue = outstanding_cue is None and random.random() < self.cue_probability
@@ -1112,7 +1112,7 @@ class Main(LatentModule):
                 self.rewardlogic.score_event(self.loss_target_miss)
            
         # set up a new response window
-        self.response_window[side] = time.time() + timeout
+        self.response_window[side] = framework.clock.now() + timeout
         self.response_outstanding[side] = True
         self.response_reward[side] = reward
         self.response_wascued[side] = wascued
@@ -1133,7 +1133,7 @@ class Main(LatentModule):
         
         # double-pressing is disabled for now (too complicated...)
         if self.response_dp_window[side] is not None:
-            if time.time < self.response_dp_window[side]:                
+            if framework.clock.now() < self.response_dp_window[side]:                
                 # called within a valid double-press situation: score!
                 if keytype == 'target-touchscreen' and self.response_dp_was_hiexpense[side]:
                     self.marker(70)
@@ -1156,7 +1156,7 @@ class Main(LatentModule):
             # pressed outside a valid response window: baseline loss
             self.marker(73)
             self.rewardlogic.score_event(self.loss_nontarget_press)
-        elif time.time() < self.response_window[side]:
+        elif framework.clock.now() < self.response_window[side]:
             # within a valid response window            
             if not self.response_wascued[side]:
                 
@@ -1182,7 +1182,7 @@ class Main(LatentModule):
             else:
                 self.marker(76)
                 # with cue; requires special double-press logic
-                self.response_dp_window[side] = time.time() + self.response_dp_duration
+                self.response_dp_window[side] = framework.clock.now() + self.response_dp_duration
                 self.response_dp_reward[side] = self.response_reward[side]
                 self.response_dp_was_hiexpense[side] = (keytype=='target-touchscreen')
                 taskMgr.doMethodLater(self.response_dp_window[side], self.doublepress_timeout, 'EventWatcher.doublepress_timeout()',extraArgs=[side])                    
@@ -1196,7 +1196,7 @@ class Main(LatentModule):
         if not self.response_outstanding[side]:
             # no response outstanding anymore
             return
-        elif time.time() < self.response_window[side]:
+        elif framework.clock.now() < self.response_window[side]:
             # the timer was for a previous response window (which has been overridden since then)
             return
         else:
@@ -1213,7 +1213,7 @@ class Main(LatentModule):
         if self.response_dp_window[side] is None:
             # the timeout was reset in the meantime
             return
-        elif time.time() < self.response_dp_window[side]:
+        elif framework.clock.now() < self.response_dp_window[side]:
             # the timer was for a previous response window (which has been overridden since then)  
             return
         else:
@@ -3,13 +3,9 @@ import threading
 import rpyc, rpyc.core, rpyc.utils.classic, rpyc.utils.server  
 from pandac.PandaModules import *
 from direct.task import Task
-import pygame,time
+import time
 import framework.ui_elements.ScrollPresenter, framework.ui_elements.TextPresenter, framework.ui_elements.ImagePresenter, framework.ui_elements.AudioPresenter, framework.ui_elements.WorldspaceGizmos
 import direct.gui.OnscreenImage
-try:
-    import framework.speech_io.speech
-except Exception as e:
-    print "Could not import speech IO: ", e
 
 #
 # This is the client component of the LSE experiment implementation.
@@ -34,6 +30,7 @@ class Main(LatentModule):
         self.localtesting = False                # if both clients run on one machine -- then they need to use different input peripherals 
         self.allow_speech = (self.client_id == 0) if self.localtesting else True # this is for debugging
         
+        self.pygame = None                      # the pygame module (imported in run())
         self.joystick = None
         self.last_x = 0
         self.last_y = 0
@@ -71,7 +68,9 @@ class Main(LatentModule):
         self.accept('buttonDown', self.on_keydown) 
         self.accept('buttonUp', self.on_keyup)
 
-        # init joystick control
+        # init joystick control (pygame and the speech API are imported on first use, since they take a while to load)
+        import pygame
+        self.pygame = pygame
         pygame.init()
         try:
             self.joystick = pygame.joystick.Joystick(self.client_id if self.localtesting else 0) 
@@ -84,6 +83,7 @@ class Main(LatentModule):
         # init speech control
         if self.allow_speech:
             try:
+                import framework.speech_io.speech
                 framework.speech_io.speech.listenfor(['yes','no','skip','report','red','green','blue','yellow','north','south','east','west','front','back','left','right','alpha move here','bravo move here','alpha move in front of me','bravo move in front of me','alpha move to truck','bravo move to truck','alpha move behind me','bravo move behind me','alpha move to my left','bravo move to my left','alpha move to my right','bravo move to my right','suspicious object'],self.on_speech)
             except:
                 print "Could not initialiate speech control; falling back to touch screen only."
@@ -113,7 +113,7 @@ class Main(LatentModule):
     
     def update_joystick(self,task):
         if self.callbacks_connected and self.joystick is not None:
-            for e in pygame.event.get(): pass
+            for e in self.pygame.event.get(): pass
             x = self.joystick.get_axis(1)
             y = self.joystick.get_axis(0)
             if self.joystick.get_numaxes() >= 5:
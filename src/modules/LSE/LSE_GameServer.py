@@ -19,9 +19,11 @@ from framework.latentmodule import LatentModule
 from framework.ui_elements import ScrollPresenter, TextPresenter, EventWatcher
 from framework.ui_elements.WorldspaceGizmos import *
 from framework.basicstimuli import BasicStimuli
-from framework.eventmarkers.eventmarkers import send_marker
+from framework.eventmarkers.eventmarkers import send_marker, register_marker_template
 import framework.navigation.navigation as navigation
 import framework.tickmodule
+import framework.clock
+import framework.sessionlog
 import pylsl.pylsl as pylsl
 import rpyc
 
@@ -875,12 +877,12 @@ class QueryPresenter(LatentModule):
         if loss_missed is None:
             loss_missed = self.default_loss_missed
 
-        now = time.time()
+        now = framework.clock.now()
         if now > self._locked_until:
             # call the presenter to present the query
             if type(lock_duration) == list or type(lock_duration) == tuple:
                 lock_duration = random.uniform(lock_duration[0],lock_duration[1])
-            self._locked_until = time.time()+lock_duration
+            self._locked_until = framework.clock.now()+lock_duration
             funcs = self.presenterfuncs[querydomain]
             for f in funcs:
                 f(query,lockduration=lock_duration)
@@ -889,7 +891,7 @@ class QueryPresenter(LatentModule):
                 # watch for a response event
                 watcher = EventWatcher.EventWatcher()
                 event_list = [expected_response]+wrong_responses+[skip_response]
-                print str(time.time()) + ": now watching for response; timeout is " + str(response_timeout)
+                print str(framework.clock.now()) + ": now watching for response; timeout is " + str(response_timeout)
                 watcher.watch_for(
                     eventtype=event_list,
                     handler=lambda eventtype,timepoint: self.on_response(
@@ -1106,12 +1108,12 @@ class LoadTask(LatentModule):
             next_loadlevel = self.load_distribution()
             # do a linear transition between the current and next load level 
             transition_duration = self.transition_duration()
-            t0 = time.time()
+            t0 = framework.clock.now()
             t1 = t0 + transition_duration
             while True:
                 self.marker('State/Task Load/%f, Participant/ID/%i' % (self.load_level,self.client_idx))
                 self.sleep(0.25)                
-                now = time.time()
+                now = framework.clock.now()
                 if now > t1:
                     break
                 self.load_level = prev_loadlevel + (next_loadlevel - prev_loadlevel) * (now - t0) / (t1-t0)
@@ -1235,8 +1237,8 @@ class IndicatorLightTask(LatentModule):
         """ Put the indicator in off state for a certain time. """
         # show the "off" picture for the inter-event interval
         if self.tick_rate is not None:
-            t_end = time.time()+self.event_interval()
-            while time.time() < t_end:
+            t_end = framework.clock.now()+self.event_interval()
+            while framework.clock.now() < t_end:
                 # show the off/tic pic
                 self.pic.setTexture(self.pic_tick_off); self.sleep(self.tick_rate[1])
                 self.marker('Stimulus/Visual/Indicator Light, Participant/ID/%i, Experiment Control/Task/Indicators/OffBlink' % self.client_idx)
@@ -1255,8 +1257,8 @@ class IndicatorLightTask(LatentModule):
         self.watcher.watch_for(self.on_correct, self.timeout, self.on_missed)
         self.marker('Stimulus/Visual/Indicator Light, Participant/ID/%i, Experiment Control/Task/Indicators/DemandsResponse' % self.client_idx)
         if self.tick_rate is not None:
-            t_end = time.time()+self.timeout
-            while time.time() < t_end:
+            t_end = framework.clock.now()+self.timeout
+            while framework.clock.now() < t_end:
                 # show the on/tic pic
                 self.pic.setTexture(self.pic_tick_on); self.sleep(self.tick_rate[1])
                 self.marker('Stimulus/Visual/Indicator Light, Participant/ID/%i, Experiment Control/Task/Indicators/OnBlink' % self.client_idx)
@@ -1475,8 +1477,8 @@ class CommTask(LatentModule):
         self.marker('Experiment Control/Task/Comms/Lull Begins, Participant/ID/%i' % self.client_idx)
         lull_duration = self.lull_time()
         no_callsign_fraction = self.no_callsign_fraction()
-        t_end = time.time() + lull_duration
-        while time.time() < t_end:
+        t_end = framework.clock.now() + lull_duration
+        while framework.clock.now() < t_end:
             # message for another callsign
             if random.random() < no_callsign_fraction:
                 # has no callsign
@@ -1497,14 +1499,14 @@ class CommTask(LatentModule):
         # begin an action sequence
         self.marker('Experiment Control/Task/Comms/Action Sequence Begins, Participant/ID/%i' % self.client_idx)
         situation_time = self.situation_time()
-        t_end = time.time() + situation_time
+        t_end = framework.clock.now() + situation_time
         other_callsign_fraction = self.other_callsign_fraction()
         no_callsign_fraction = self.no_callsign_fraction()
         time_fraction_until_questions = self.time_fraction_until_questions()
-        t_beginquestions = time.time() + situation_time * time_fraction_until_questions
+        t_beginquestions = framework.clock.now() + situation_time * time_fraction_until_questions
         questioned_fraction = self.questioned_fraction()
 
-        while time.time() < t_end:
+        while framework.clock.now() < t_end:
             if random.random() < other_callsign_fraction:
                 # message for another callsign
                 if random.random() < no_callsign_fraction:
@@ -1520,7 +1522,7 @@ class CommTask(LatentModule):
                 self.sleep(self.message_interval())
             else:
                 # message for the current callsign
-                if time.time() < t_beginquestions:
+                if framework.clock.now() < t_beginquestions:
                     # no question asked
                     sentence = self.substitute(random.choice(self.distractors),self.targetsign)
                     self.presenterfunc(sentence)
@@ -1704,7 +1706,7 @@ class SatmapTask(BasicStimuli):
                     try:
                         self.satmap_icon_remover_func(self.current_icons[idx])
                     except Exception as e:
-                        print time.time(), ": Got an async timeout result while trying to delete a satmap item:", e
+                        print framework.clock.now(), ": Got an async timeout result while trying to delete a satmap item:", e
 
                     # stimulus offset marker
                     self.marker('Experiment Control/Task/Satellite Map/Remove Icon/{identifier:%i|label:%s}, Participant/ID/%i'% (self.current_questions[idx].identifier, self.current_questions[idx].label, self.client_idx))
@@ -1956,6 +1958,13 @@ class ProbedObjectsTask(LatentModule):
             self.excluded_from_questions = [False]*len(self.removers)         # whether this entity is excluded from generating questions (e.g. due to potential ambiguity or since it was a distractor)
             self.last_visible_side = [None]*len(self.removers)                # this is 'left' or 'right' depending on where the entity was last visible (in the subject's fov) 
             self.is_visible = [False]*len(self.removers)                       # whether this entity is currently visible 
+
+    # templates of the markers that are emitted by the per-frame item status updates
+    MARKER_BECOMES_VISIBLE = register_marker_template('Experiment Control/Task/Sidewalk Items/Becomes Visible/{identifier:%i}, Participants/ID/%i')
+    MARKER_BECOMES_INVISIBLE = register_marker_template('Experiment Control/Task/Sidewalk Items/Becomes Invisible/{identifier:%i}, Participants/ID/%i')
+    MARKER_BECOMES_CLOSELY_VISIBLE = register_marker_template('Stimulus/Visual/3D Object/%s, Experiment Control/Task/Sidewalk Items/Becomes Closely Visible/{identifier:%i}, Participants/ID/%i')
+    MARKER_BECOMES_CANDIDATE = register_marker_template('Experiment Control/Task/Sidewalk Items/Becomes Question Candidate/{identifier:%i}, Participants/ID/%i')
+    MARKER_DROPPED_CANDIDATE = register_marker_template('Experiment Control/Task/Sidewalk Items/Dropped As Question Candidate/{identifier:%i}, Participants/ID/%i')
                     
     @livecoding
     def __init__(self,
@@ -2197,15 +2206,15 @@ class ProbedObjectsTask(LatentModule):
 
                 if ent.is_visible[a] != strictly_visible:
                     ent.is_visible[a] = strictly_visible
-                    self.marker('Experiment Control/Task/Sidewalk Items/Becomes %s/{identifier:%i}, Participants/ID/%i' % ('Visible' if strictly_visible else 'Invisible',ent.identifier,a))
+                    self.structured_marker(self.MARKER_BECOMES_VISIBLE if strictly_visible else self.MARKER_BECOMES_INVISIBLE,ent.identifier,a)
 
                 # promote objects to candidacy for possible later questioning if they have been in plain sight for long enough
                 if distance < self.candidate_radius and strictly_visible:
                     if ent.has_been_clearly_visible_since[a] is None:
-                        self.marker('Stimulus/Visual/3D Object/%s, Experiment Control/Task/Sidewalk Items/Becomes Closely Visible/{identifier:%i}, Participants/ID/%i' % (ent.label,ent.identifier,a))
-                        ent.has_been_clearly_visible_since[a] = time.time()
-                    if time.time() - ent.has_been_clearly_visible_since[a] > self.candidate_visible_duration and not ent.has_generated_question[a] and not ent.is_candidate[a]:
-                        self.marker('Experiment Control/Task/Sidewalk Items/Becomes Question Candidate/{identifier:%i}, Participants/ID/%i' % (ent.identifier,a))
+                        self.structured_marker(self.MARKER_BECOMES_CLOSELY_VISIBLE,ent.label,ent.identifier,a)
+                        ent.has_been_clearly_visible_since[a] = framework.clock.now()
+                    if framework.clock.now() - ent.has_been_clearly_visible_since[a] > self.candidate_visible_duration and not ent.has_generated_question[a] and not ent.is_candidate[a]:
+                        self.structured_marker(self.MARKER_BECOMES_CANDIDATE,ent.identifier,a)
                         ent.is_candidate[a] = True
                         # calculate on what side the stimulus was last sighted
                     ent.last_visible_side[a] = 'left' if agent_viewdirs[a].angleDeg(Vec3(ent.pos - apos)) < 0 else 'right'
@@ -2215,9 +2224,9 @@ class ProbedObjectsTask(LatentModule):
                 # demoting entities from candidacy after some timeout (and also from the potential conflict set)
                 if not strictly_visible:
                     if ent.has_been_invisible_since[a] is None:
-                        ent.has_been_invisible_since[a] = time.time()
-                    if time.time() - ent.has_been_invisible_since[a] > self.drop_candidate_after and ent.is_candidate[a]:
-                        self.marker('Experiment Control/Task/Sidewalk Items/Dropped As Question Candidate/{identifier:%i}, Participants/ID/%i' % (ent.identifier,a))
+                        ent.has_been_invisible_since[a] = framework.clock.now()
+                    if framework.clock.now() - ent.has_been_invisible_since[a] > self.drop_candidate_after and ent.is_candidate[a]:
+                        self.structured_marker(self.MARKER_DROPPED_CANDIDATE,ent.identifier,a)
                         ent.is_candidate[a] = False
                 else:
                     ent.has_been_invisible_since[a] = None
@@ -2233,12 +2242,12 @@ class ProbedObjectsTask(LatentModule):
                         # this is a special reportable object: we expect a response from the subject
                         if self.waitfor('cl' + str(a) + '-report',duration=self.reportable_timeout):
                             # subject reponded in time
-                            print str(time.time()) + ": subject responded in time to suspicious object"
+                            print str(framework.clock.now()) + ": subject responded in time to suspicious object"
                             self.marker('Experiment Control/Task/Action/Correct, Experiment Control/Task/Sidewalk Items/Reported Object/{identifier:%i}, Participants/ID/%i' % (ent.identifier,a))
                             self.report_scorecounters[a].score_event(self.gain_correct*self.reportable_score_multiplier,nosound=False)
                         else:
                             # failed to respond
-                            print str(time.time()) + ": subject failed to respond to suspicious object"
+                            print str(framework.clock.now()) + ": subject failed to respond to suspicious object"
                             self.marker('Experiment Control/Task/Action/Missed, Experiment Control/Task/Sidewalk Items/Failed To Report Object/{identifier:%i}, Participants/ID/%i' % (ent.identifier,a))
                             self.report_scorecounters[a].score_event(self.loss_missed*self.reportable_score_multiplier)
                         ent.has_generated_question[a] = True
@@ -2246,9 +2255,9 @@ class ProbedObjectsTask(LatentModule):
                     elif sufficiently_invisible:
                         # regular explicitly probed object
                         if ent.has_been_sufficiently_invisible_since[a] is None:
-                            ent.has_been_sufficiently_invisible_since[a] = time.time()
+                            ent.has_been_sufficiently_invisible_since[a] = framework.clock.now()
 
-                        if time.time() - ent.has_been_sufficiently_invisible_since[a] > self.ask_after:
+                        if framework.clock.now() - ent.has_been_sufficiently_invisible_since[a] > self.ask_after:
 
                             # check if the question can be scheduled unambiguously
                             collision = False
@@ -2274,7 +2283,7 @@ class ProbedObjectsTask(LatentModule):
                                         category="viewside", phrase="On what side was the last " + label + '?',
                                         correct_answer=direction, all_answers=['left','right'],label=label, client_idx=a)
 
-                                print "*** " + str(time.time()) + " issueing question for " + color + " " + label + " on " + direction + " side of the camera view"
+                                print "*** " + str(framework.clock.now()) + " issueing question for " + color + " " + label + " on " + direction + " side of the camera view"
                                 self.marker('Experiment Control/Task/Sidewalk Items/Generating Question/{item_identifier:%i|question_identifier:%i}, Participants/ID/%i' % (ent.identifier,question.identifier,a))
 
                                 # actually present the query
@@ -2293,7 +2302,7 @@ class ProbedObjectsTask(LatentModule):
                                 ent.has_generated_question[a] = True
                             else:
                                 # take this event as a distractor
-                                print "*** " + str(time.time()) + " generated distractor event for " + color + " " + label + " on " + direction + " side of the camera view"
+                                print "*** " + str(framework.clock.now()) + " generated distractor event for " + color + " " + label + " on " + direction + " side of the camera view"
                                 self.marker('Experiment Control/Task/Sidewalk Items/Take As Distractor/{item_identifier:%i|label:%s}, Participants/ID/%i' % (ent.identifier,ent.label,a))
                                 ent.excluded_from_questions[a] = True
 
@@ -2538,7 +2547,7 @@ class InvadingAgent(BasicStimuli):
     @livecoding
     def enter_wait(self):
         self.mode = "waiting"
-        self.wait_ends_at = time.time() + random.uniform(self.state_duration[0],self.state_duration[1])
+        self.wait_ends_at = framework.clock.now() + random.uniform(self.state_duration[0],self.state_duration[1])
         self.marker('Experiment Control/Task/Agents/Invaders/Wait/{identifier:%i|mood:%f|x:%f|y:%f|z:%f}' % (self.identifier,self.mood,self.pos[0],self.pos[1],self.pos[2]))
         print 'An agent chose to wait.'
 
@@ -2577,7 +2586,7 @@ class InvadingAgent(BasicStimuli):
         self.mode = "hiding"
         for inst in self.instances:
             inst.hide()
-        self.wait_ends_at = time.time() + random.uniform(self.state_duration[0],self.state_duration[1])
+        self.wait_ends_at = framework.clock.now() + random.uniform(self.state_duration[0],self.state_duration[1])
         print  'An agent has entered a building!'
         self.marker('Experiment Control/Task/Agents/Invaders/Hide/{identifier:%i|mood:%f|x:%f|y:%f|z:%f}' % (self.identifier,self.mood,self.pos[0],self.pos[1],self.pos[2]))
 
@@ -2588,10 +2597,10 @@ class InvadingAgent(BasicStimuli):
         self.pos = status.npos
         self.vel = status.vel
         if self.mode == "waiting":
-            if time.time() > self.wait_ends_at:
+            if framework.clock.now() > self.wait_ends_at:
                 self.enter_approach_hotspot()
         elif self.mode == "hiding":
-            if time.time() > self.wait_ends_at:
+            if framework.clock.now() > self.wait_ends_at:
                 print 'An agent came out of a building.'
                 # come out of the building again...
                 for inst in self.instances:
@@ -3342,13 +3351,19 @@ class ClientGame(SceneBase):
             try:
                 print 'Trying to connect to ' + self.hostname + ':' + str(self.port) + '...',
                 # connect and spawn a server thread that handles callbacks from the client machine in the background
-                # (this includes keypress events, etc.)  
-                self.conn = rpyc.classic.connect(self.hostname,port=self.port)
+                # (this includes keypress events, etc.); lists, dicts and numeric arrays that are passed
+                # to the client (e.g., positions and colors) are sent as copies rather than as references
+                self.conn = rpyc.classic.connect(self.hostname,port=self.port,config={'pass_containers_by_value':True})
                 self.callback_handler_thread = threading.Thread(target=self.conn.serve_all)
                 self.callback_handler_thread.setDaemon(True)
                 self.callback_handler_thread.start()
                 # link remote button-press events to the local handlers on_keydown and on_keyup 
-                self.conn.root.mastercallbacks(self.on_keydown,self.on_keyup,self.on_joystick,self.on_speech)
+                # (these are recorded if the session is being recorded, see framework/sessionlog.py)
+                prefix = 'client' + str(self.num) + '.'
+                self.conn.root.mastercallbacks(framework.sessionlog.callback(prefix + 'keydown',self.on_keydown),
+                                               framework.sessionlog.callback(prefix + 'keyup',self.on_keyup),
+                                               framework.sessionlog.callback(prefix + 'joystick',self.on_joystick),
+                                               framework.sessionlog.callback(prefix + 'speech',self.on_speech))
                 # link the stimulus-presentation engine to the remote computer's engine
                 self.set_engine(base=self.conn.builtins.base,direct=self.conn.modules.direct,pandac=self.conn.modules.pandac.PandaModules)
                 # and get an instance of the remote basicstimuli instance, too
@@ -3649,6 +3664,11 @@ class Main(SceneBase):
         self.marker('Experiment Control/Sequence/Experiment Ends')
         self.write('Experiment finished.','space')
 
+    def asset_manifest(self):
+        """ Media that is pre-loaded by the launcher in the background while the experiment is being configured. """
+        # (the terrain maps are read by GeoMipTerrain directly and therefore not listed here)
+        return [('model',self.hostile_filename),('model',self.friendly_filename)] + [('model','media/' + w + '.bam') for w in self.world_types]
+
 
     # ===========================
     # === INITIALIZATION CODE ===
@@ -3763,7 +3783,7 @@ class Main(SceneBase):
         self.camera.reparentTo(self.world_root)        
         self.camera.setPos(self.initial_experimenter_camera_pos[0],self.initial_experimenter_camera_pos[1],self.initial_experimenter_camera_pos[2])
         self.camera.lookAt(self.initial_experimenter_camera_target[0],self.initial_experimenter_camera_target[1],self.initial_experimenter_camera_target[2])
-        self.cam_lasttime = time.time()
+        self.cam_lasttime = framework.clock.now()
         self.terrain_lastupdate = 0
         self.cam_position = self.camera.getPos()
         self.cam_orientation = self.camera.getHpr()
@@ -4010,9 +4030,9 @@ class Main(SceneBase):
             self.message_presenter.submit('One of the players now guides the other through the map from an aerial perspective.')
             self.sleep(5)
             # move the agent up into the air (by gradually ramping up the force)
-            t0 = time.time()
+            t0 = framework.clock.now()
             while True:
-                fraction = (time.time() - t0) / self.rise_time                                    
+                fraction = (framework.clock.now() - t0) / self.rise_time                                    
                 if fraction > 1.0:
                     break
                 self.rise_force = self.rise_force_max * fraction
@@ -4071,8 +4091,8 @@ class Main(SceneBase):
             self.sleep(5)
             # run for a randomly predetermined time
             duration = random.uniform(self.secure_perimeter_duration[0],self.secure_perimeter_duration[1])
-            tEnd = time.time() + duration            
-            while time.time() < tEnd:
+            tEnd = framework.clock.now() + duration            
+            while framework.clock.now() < tEnd:
                 # check conditions for each invader         
                 for a in self.invaders:
                     if a.mode == "hiding":
@@ -4265,7 +4285,7 @@ class Main(SceneBase):
     @livecoding
     def update_physics(self,task):
         """Update the physics simulation."""
-        now = time.time()
+        now = framework.clock.now()
         if self.physics_lasttime is None:
             self.physics_lasttime = now
         dt = now - self.physics_lasttime
@@ -4363,8 +4383,9 @@ class Main(SceneBase):
 
     @livecoding
     def update_wanderers(self,task):
-        for a in self.wanderers:
-            a.update()
+        with self.client_batch():
+            for a in self.wanderers:
+                a.update()
         self.update_lsl_agentstate()
         if len(self.wanderers) > 0:
             return task.cont
@@ -4393,8 +4414,9 @@ class Main(SceneBase):
 
     @livecoding
     def update_invaders(self,task):
-        for a in self.invaders:
-            a.update()
+        with self.client_batch():
+            for a in self.invaders:
+                a.update()
         self.update_lsl_agentstate()
         if len(self.invaders)>0:
             return task.cont
@@ -4424,8 +4446,9 @@ class Main(SceneBase):
 
     @livecoding
     def update_controllables(self,task):
-        for a in self.controllables:
-            a.update()
+        with self.client_batch():
+            for a in self.controllables:
+                a.update()
         self.update_lsl_agentstate()
         if len(self.controllables)>0:
             return task.cont
@@ -4458,14 +4481,19 @@ class Main(SceneBase):
     @livecoding
     def broadcast_agentstate(self):
         """Update the observable state of the agents on the client machines."""
-        for k in range(len(self.agents)):
-            pos = self.agents[k].getPos(render)
-            hpr = self.agents[k].getHpr(render)
-            for cl in self.clients:
-                cl.update_agents_poshpr[k](pos.x,pos.y,pos.z,hpr.x,hpr.y,hpr.z)
+        with self.client_batch():
+            for k in range(len(self.agents)):
+                pos = self.agents[k].getPos(render)
+                hpr = self.agents[k].getHpr(render)
+                for cl in self.clients:
+                    cl.update_agents_poshpr[k](pos.x,pos.y,pos.z,hpr.x,hpr.y,hpr.z)
         self.update_lsl_playerstate()
 
 
+    def client_batch(self):
+        """Get a context manager within which the asynchronous updates to the client machines are sent as one packet per client."""
+        return rpyc.batch(*[cl.conn for cl in self.clients])
+
     #noinspection PyUnusedLocal
     @livecoding
     def broadcast_gamestate(self,task):
@@ -4482,7 +4510,7 @@ class Main(SceneBase):
     @livecoding
     def on_camtick(self,task):
         """Update experimenter' camera position."""
-        now = time.time()
+        now = framework.clock.now()
         dt = now - self.cam_lasttime
         self.cam_lasttime = now
         self.cam_position += self.cam_velocity * dt
@@ -4577,7 +4605,7 @@ class Main(SceneBase):
                              actual_speech=True    # whether the modality is in fact speech or rather a press of a labeled button 
                              ):
         """ Handles the subjects' speech responses. """          
-        print str(time.time()) + " client",cl_idx,"said:",phrase
+        print str(framework.clock.now()) + " client",cl_idx,"said:",phrase
 
         if actual_speech:
             self.marker('Response/Speech/%s, Participant/ID/%i' % (phrase,cl_idx))
@@ -4588,12 +4616,12 @@ class Main(SceneBase):
         if len(tokens) == 1:
             # single-word responses are directly translated into a message of the form 'cl0-word'
             message = 'cl' + str(cl_idx) + '-' + tokens[0].lower().strip()
-            print str(time.time()) + " generating message " + message
+            print str(framework.clock.now()) + " generating message " + message
             self.send_message(message)
         elif phrase.strip() == 'suspicious object':
             # special handling for the "suspicious object" utterance
             message = 'cl' + str(cl_idx) + '-report'
-            print str(time.time()) + " generating message " + message
+            print str(framework.clock.now()) + " generating message " + message
             self.send_message(message)
 
         # handle commands addressed at named entities/robots (the so-called controllables)
@@ -4632,7 +4660,7 @@ class Main(SceneBase):
                              ):
         """ Reset a lost player vehicle: places it on the map again and resets the orientation. """
         # reset can only be triggered once every few seconds
-        if time.time() > (self.last_reset_time[num] + self.min_reset_interval):
+        if framework.clock.now() > (self.last_reset_time[num] + self.min_reset_interval):
             print "Client " + str(num) + " pressed the reset button."
             self.marker('Response/Button Press/Reset Vehicle, Participant/ID/%i' % num)
             #noinspection PyUnresolvedReferences
@@ -4663,7 +4691,7 @@ class Main(SceneBase):
             mat.setRow(1,vforward)
             mat.setRow(2,vup)
             self.agents[num].getParent().setMat(render,mat)
-            self.last_reset_time[num] = time.time()
+            self.last_reset_time[num] = framework.clock.now()
             #noinspection PyUnresolvedReferences
             framework.tickmodule.shared_lock.release()
             try:
@@ -12,9 +12,8 @@ from framework.ui_elements.AudioPresenter import AudioPresenter
 from framework.ui_elements.TextPresenter import TextPresenter
 from panda3d.core import TextProperties,TextPropertiesManager
 from direct.gui.DirectGui import *
-import framework.speech
 import random
-import time
+import framework.clock
 import copy
 
 
@@ -154,8 +153,8 @@ class WarningLight(LatentModule):
         while True:
             # show the "off" picture for the inter-event interval
             if self.tick_rate is not None:
-                t_end = time.time()+self.event_interval()
-                while time.time() < t_end:
+                t_end = framework.clock.now()+self.event_interval()
+                while framework.clock.now() < t_end:
                     self.marker(self.markerbase+10)
                     # show the off/tic pic
                     self.picture(self.pic_tick_off, self.tick_rate[1], **self.pic_params)
@@ -169,8 +168,8 @@ class WarningLight(LatentModule):
             self.watcher.watch_for(self.correct, self.timeout, self.missed)
             self.marker(self.markerbase if self.focused else (self.markerbase+1))
             if self.tick_rate is not None:
-                t_end = time.time()+self.timeout
-                while time.time() < t_end:
+                t_end = framework.clock.now()+self.timeout
+                while framework.clock.now() < t_end:
                     self.marker(self.markerbase+11)
                     # show the on/tic pic
                     self.picture(self.pic_tick_on, self.tick_rate[1], **self.pic_params)
@@ -345,8 +344,8 @@ class WarningSound(LatentModule):
         while True:
             # off status
             if self.tick_rate is not None:
-                t_end = time.time()+self.event_interval()
-                while time.time() < t_end:
+                t_end = framework.clock.now()+self.event_interval()
+                while framework.clock.now() < t_end:
                     self.marker(self.markerbase+10)
                     # play the off/tic snd                    
                     self.sound(self.snd_tick_off, **self.snd_params)
@@ -361,8 +360,8 @@ class WarningSound(LatentModule):
             self.watcher.watch_for(self.correct, self.timeout, self.missed)
             self.marker(self.markerbase if self.focused else (self.markerbase+1))
             if self.tick_rate is not None:
-                t_end = time.time()+self.timeout
-                while time.time() < t_end:
+                t_end = framework.clock.now()+self.timeout
+                while framework.clock.now() < t_end:
                     self.marker(self.markerbase+11)
                     # play the on/tic sound
                     if self.snd_tick_on is not None:
@@ -534,7 +533,7 @@ class MathScheduler(LatentModule):
 
             # begin record-keeping...
             problems = 0
-            starttime = time.time()
+            starttime = framework.clock.now()
 
             for d in range(10):
                 self.accept('num-'+str(d),self.on_digit,[d])
@@ -570,7 +569,7 @@ class MathScheduler(LatentModule):
                 problems += 1
                 if self.end_numproblems is not None and problems > self.end_numnumproblems:
                     break
-                if self.end_timeout is not None and time.time() > starttime + self.end_timeout:
+                if self.end_timeout is not None and framework.clock.now() > starttime + self.end_timeout:
                     break
             
         finally:
@@ -926,7 +925,9 @@ class Main(LatentModule):
             # init speech control            
             if self.allow_speech:
                 try:
-                    framework.speech.listenfor(['roger','check','yes','no'],self.onspeech)
+                    # (imported on first use, since it pulls in the Windows speech API)
+                    import framework.speech_io.speech
+                    framework.speech_io.speech.listenfor(['roger','check','yes','no'],self.onspeech)
                 except:
                     print "Could not initialiate speech control; falling back to touch screen only."
             
@@ -1105,13 +1106,13 @@ class Main(LatentModule):
         if phrase.lower() == 'roger':
             self.send_message('comma-roger')
             self.icon_comma.setScale(self.voice_icon_enlarge_size)
-            self.icon_comma_reset_scale_at = time.time() + self.voice_icon_enlarge_duration
+            self.icon_comma_reset_scale_at = framework.clock.now() + self.voice_icon_enlarge_duration
             taskMgr.doMethodLater(self.voice_icon_enlarge_duration, self.reset_comma, 'reset_comma()')
             
         if phrase.lower() == 'check':
             self.send_message('sysmona-check')
             self.icon_sysmona.setScale(self.voice_icon_enlarge_size)
-            self.icon_sysmona_reset_scale_at = time.time() + self.voice_icon_enlarge_duration
+            self.icon_sysmona_reset_scale_at = framework.clock.now() + self.voice_icon_enlarge_duration
             taskMgr.doMethodLater(self.voice_icon_enlarge_duration, self.reset_sysmona, 'reset_sysmona()')
 
         if phrase.lower() == 'yes':
@@ -1121,12 +1122,12 @@ class Main(LatentModule):
             self.send_message('n')
             
     def reset_comma(self,task):
-        if time.time() >= self.icon_comma_reset_scale_at-0.1:                                
+        if framework.clock.now() >= self.icon_comma_reset_scale_at-0.1:                                
             self.icon_comma.setScale(0.1)
         return task.done 
 
     def reset_sysmona(self,task):
-        if time.time() >= self.icon_sysmona_reset_scale_at-0.1:                                
+        if framework.clock.now() >= self.icon_sysmona_reset_scale_at-0.1:                                
             self.icon_sysmona.setScale(0.1)
         return task.done 
 
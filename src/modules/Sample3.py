@@ -1,6 +1,6 @@
 from framework.latentmodule import LatentModule
 import random
-import time
+import framework.clock
 
 class Main(LatentModule):
     def __init__(self):
@@ -17,12 +17,12 @@ class Main(LatentModule):
         pos = [-0.7,0.7]        # position
         
         ball = self.picture('ball.png',duration=10000,scale=0.03,pos=pos,block=False)
-        now = time.time()
+        now = framework.clock.now()
         t_end = now + 20
         while True:
             # calc amount of time passed
-            dt = time.time() - now            
-            now = time.time()
+            dt = framework.clock.now() - now            
+            now = framework.clock.now()
             if now > t_end:
                 break
             
@@ -41,13 +41,13 @@ Classic-style usage::
     ...
 
 """
-from rpyc.core import (SocketStream, TunneledSocketStream, PipeStream, Channel,
+from rpyc.core import (SocketStream, BufferedSocketStream, TunneledSocketStream, PipeStream, Channel,
     Connection, Service, BaseNetref, AsyncResult, GenericException,
     AsyncResultTimeout, VoidService, SlaveService, inspect_methods)
 from rpyc.utils.factory import (connect_stream, connect_channel, connect_pipes,
     connect_stdpipes, connect, ssl_connect, discover, connect_by_service, connect_subproc, 
     connect_thread, ssh_connect)
-from rpyc.utils.helpers import async, timed, buffiter, BgServingThread, restricted, enable_local_cache, enable_async_methods, async_value
+from rpyc.utils.helpers import async, timed, buffiter, BgServingThread, restricted, enable_local_cache, enable_async_methods, async_value, batch
 from rpyc.utils import classic
 from rpyc.version import version, version_string, release_date
 
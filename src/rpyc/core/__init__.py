@@ -1,4 +1,4 @@
-from rpyc.core.stream import SocketStream, TunneledSocketStream, PipeStream
+from rpyc.core.stream import SocketStream, BufferedSocketStream, TunneledSocketStream, PipeStream
 from rpyc.core.channel import Channel
 from rpyc.core.protocol import Connection
 from rpyc.core.netref import BaseNetref, inspect_methods
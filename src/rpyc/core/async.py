@@ -42,8 +42,7 @@ class AsyncResult(object):
         if self._is_ready:
             return
         if self._ttl is None:
-            while not self._is_ready:
-                self._conn.serve()
+            self._conn._wait_for(lambda: self._is_ready)
         else:
             while True:
                 timeout = self._ttl - time.time()
@@ -5,6 +5,15 @@ The following types are supported: ``int``, ``long``, ``bool``, ``str``, ``float
 ``forzenset`` (of simple types) as well as the following singletons: ``None``, 
 ``NotImplemented``, and ``Ellipsis``.
 
+In addition, brine can serialize the following *mutable* containers by value: 
+``list`` and ``dict`` (of dumpable types; lists of floats are packed as raw 
+float64s), numeric ``array.array`` objects and numeric NumPy arrays (as their 
+raw data in little-endian byte order, plus the shape). Since the receiving party 
+gets a copy, these are only considered :func:`dumpable` if ``containers = True``
+(the protocol enables this per connection, see the ``pass_containers_by_value``
+option). NumPy is not imported by brine; if it is not available on the receiving 
+side, NumPy arrays are loaded as (nested) lists.
+
 Example::
 
     >>> x = ("he", 7, u"llo", 8, (), 900, None, True, Ellipsis, 18.2, 18.2j + 13,
@@ -18,6 +27,8 @@ Example::
     >>> x == z
     True
 """
+import sys
+import array
 from rpyc.lib.compat import Struct, BytesIO, all, is_py3k, BYTES_LITERAL
 
 
@@ -50,6 +61,13 @@ TAG_FLOAT = BYTES_LITERAL("\x18")
 TAG_SLICE = BYTES_LITERAL("\x19")
 TAG_FSET = BYTES_LITERAL("\x1a")
 TAG_COMPLEX = BYTES_LITERAL("\x1b")
+# mutable containers (the lengths of lists and dicts are dumped as ints, since tags 
+# from 0x20 on are taken by IMM_INTS)
+TAG_LIST = BYTES_LITERAL("\x1c")
+TAG_FLIST = BYTES_LITERAL("\x1d")
+TAG_DICT = BYTES_LITERAL("\x1e")
+TAG_ARRAY = BYTES_LITERAL("\x1f")
+TAG_NDARRAY = BYTES_LITERAL("\x07")
 if is_py3k:
     IMM_INTS = dict((i, bytes([i + 0x50])) for i in range(-0x30, 0xa0))
 else:
@@ -59,6 +77,28 @@ I1 = Struct("!B")
 I4 = Struct("!L")
 F8 = Struct("!d")
 C16 = Struct("!dd")
+# element kind (as in NumPy's dtype.kind) and item size of a packed numeric array
+KS = Struct("!cB")
+
+# map from the numeric array.array typecodes to their (kind, item size); the typecodes
+# whose item size differs between platforms (e.g., "l") are translated on loading
+ARRAY_KINDS = {}
+for _typecode in "bhilq":
+    try:
+        ARRAY_KINDS[_typecode] = (BYTES_LITERAL("i"), array.array(_typecode).itemsize)
+        ARRAY_KINDS[_typecode.upper()] = (BYTES_LITERAL("u"), array.array(_typecode.upper()).itemsize)
+    except ValueError:
+        # "q" requires Python 3.3
+        pass
+for _typecode in "fd":
+    ARRAY_KINDS[_typecode] = (BYTES_LITERAL("f"), array.array(_typecode).itemsize)
+ARRAY_TYPECODES = dict((v, k) for k, v in sorted(ARRAY_KINDS.items(), reverse = True))
+# struct format characters for the numeric element types (for loading arrays that have no local equivalent)
+STRUCT_CODES = {(BYTES_LITERAL("b"), 1) : "?", (BYTES_LITERAL("i"), 1) : "b", (BYTES_LITERAL("i"), 2) : "h", 
+    (BYTES_LITERAL("i"), 4) : "i", (BYTES_LITERAL("i"), 8) : "q", (BYTES_LITERAL("u"), 1) : "B", 
+    (BYTES_LITERAL("u"), 2) : "H", (BYTES_LITERAL("u"), 4) : "I", (BYTES_LITERAL("u"), 8) : "Q", 
+    (BYTES_LITERAL("f"), 4) : "f", (BYTES_LITERAL("f"), 8) : "d"}
+NATIVE_LITTLE_ENDIAN = (sys.byteorder == "little")
 
 _dump_registry = {}
 _load_registry = {}
@@ -195,7 +235,56 @@ def _dump_tuple(obj, stream):
     for item in obj:
         _dump(item, stream)
 
+@register(_dump_registry, list)
+def _dump_list(obj, stream):
+    l = len(obj)
+    if l and all(type(item) is float for item in obj):
+        stream.append(TAG_FLIST + I4.pack(l) + Struct("!%dd" % (l,)).pack(*obj))
+        return
+    stream.append(TAG_LIST)
+    _dump_int(l, stream)
+    for item in obj:
+        _dump(item, stream)
+
+@register(_dump_registry, dict)
+def _dump_dict(obj, stream):
+    stream.append(TAG_DICT)
+    _dump_int(len(obj), stream)
+    for key, value in obj.items():
+        _dump(key, stream)
+        _dump(value, stream)
+
+@register(_dump_registry, array.array)
+def _dump_array(obj, stream):
+    kind, size = ARRAY_KINDS[obj.typecode]
+    if not NATIVE_LITTLE_ENDIAN:
+        obj = array.array(obj.typecode, obj)
+        obj.byteswap()
+    data = obj.tobytes() if is_py3k else obj.tostring()
+    stream.append(TAG_ARRAY + KS.pack(kind, size) + I4.pack(len(data)) + data)
+
+def _dump_ndarray(obj, stream):
+    dtype = obj.dtype.newbyteorder("<")
+    data = obj.astype(dtype).tobytes(order = "C")
+    stream.append(TAG_NDARRAY + KS.pack(BYTES_LITERAL(dtype.kind), dtype.itemsize))
+    _dump(tuple(int(n) for n in obj.shape), stream)
+    stream.append(I4.pack(len(data)) + data)
+
+def _numpy_kind(obj):
+    """returns the element kind of the given NumPy array or scalar if it is numeric
+    (and NumPy has been imported), otherwise None"""
+    numpy = sys.modules.get("numpy")
+    if numpy is not None and isinstance(obj, (numpy.ndarray, numpy.generic)) and obj.dtype.kind in "biuf":
+        return obj.dtype.kind
+    return None
+
 def _undumpable(obj, stream):
+    if _numpy_kind(obj) is not None:
+        if isinstance(obj, sys.modules["numpy"].generic):
+            _dump(obj.item(), stream)
+        else:
+            _dump_ndarray(obj, stream)
+        return
     raise TypeError("cannot dump %r" % (obj,))
 
 def _dump(obj, stream):
@@ -313,6 +402,60 @@ def _load_slice(stream):
 def _load_frozenset(stream):
     return frozenset(_load(stream))
 
+@register(_load_registry, TAG_LIST)
+def _load_list(stream):
+    l = _load(stream)
+    return [_load(stream) for i in range(l)]
+@register(_load_registry, TAG_FLIST)
+def _load_flist(stream):
+    l, = I4.unpack(stream.read(4))
+    return list(Struct("!%dd" % (l,)).unpack(stream.read(8 * l)))
+
+@register(_load_registry, TAG_DICT)
+def _load_dict(stream):
+    l = _load(stream)
+    return dict((_load(stream), _load(stream)) for i in range(l))
+
+def _unpack_elements(kind, size, data):
+    """unpacks raw little-endian array data into a list of elements"""
+    return list(Struct("<%d%s" % (len(data) // size, STRUCT_CODES[kind, size])).unpack(data))
+
+@register(_load_registry, TAG_ARRAY)
+def _load_array(stream):
+    kind, size = KS.unpack(stream.read(2))
+    l, = I4.unpack(stream.read(4))
+    data = stream.read(l)
+    if (kind, size) not in ARRAY_TYPECODES:
+        # e.g., an "l" array from a platform where longs are 64 bits wide, while they are 
+        # 32 bits wide here
+        return _unpack_elements(kind, size, data)
+    obj = array.array(ARRAY_TYPECODES[kind, size])
+    if is_py3k:
+        obj.frombytes(data)
+    else:
+        obj.fromstring(data)
+    if not NATIVE_LITTLE_ENDIAN:
+        obj.byteswap()
+    return obj
+
+@register(_load_registry, TAG_NDARRAY)
+def _load_ndarray(stream):
+    kind, size = KS.unpack(stream.read(2))
+    shape = _load(stream)
+    l, = I4.unpack(stream.read(4))
+    data = stream.read(l)
+    try:
+        import numpy
+    except ImportError:
+        elements = _unpack_elements(kind, size, data)
+        if not shape:
+            return elements[0]
+        for n in reversed(shape[1:]):
+            elements = [elements[i:i+n] for i in range(0, len(elements), n)]
+        return elements
+    dtype = numpy.dtype("<%s%d" % (kind.decode("ascii") if is_py3k else kind, size))
+    return numpy.frombuffer(data, dtype = dtype).astype(dtype.newbyteorder("=")).reshape(shape)
+
 @register(_load_registry, TAG_INT_L1)
 def _load_int_l1(stream):
     l, = I1.unpack(stream.read(1))
@@ -359,18 +502,29 @@ else:
     simple_types = frozenset([type(None), int, long, bool, float, str, unicode, complex, 
         type(NotImplemented), type(Ellipsis)])
 
-def dumpable(obj):
+def dumpable(obj, containers = False):
     """Indicates whether the given object is *dumpable* by brine
     
+    :param containers: whether lists, dicts and numeric arrays count as dumpable 
+                       (these are mutable, so the receiving party gets a copy)
+    
     :returns: ``True`` if the object is dumpable (e.g., :func:`dump` would succeed),
               ``False`` otherwise
     """
     if type(obj) in simple_types:
         return True
     if type(obj) in (tuple, frozenset):
-        return all(dumpable(item) for item in obj)
+        return all(dumpable(item, containers) for item in obj)
     if type(obj) is slice:
         return dumpable(obj.start) and dumpable(obj.stop) and dumpable(obj.step)
+    if containers:
+        if type(obj) is list:
+            return all(dumpable(item, True) for item in obj)
+        if type(obj) is dict:
+            return all(dumpable(key) and dumpable(value, True) for key, value in obj.items())
+        if type(obj) is array.array:
+            return obj.typecode in ARRAY_KINDS
+        return _numpy_kind(obj) is not None
     return False
 
 
@@ -1,33 +1,141 @@
 """
 *Channel* is an abstraction layer over streams that works with *packets of data*,
 rather than an endless stream of bytes, and adds support for compression.
+
+Compression is done by pluggable *codecs* (see :func:`register_codec`); ``zlib`` is
+always available and ``lz4`` is used if the ``lz4`` package is installed. The codec
+of each packet is stored in its frame header, so that the receiver can decode it;
+the sender only uses codecs that the other party supports (the protocol exchanges
+the codec names when the connection is set up, see :meth:`Channel.set_peer_codecs`;
+until then, only ``zlib`` is assumed, which every rpyc peer can decode).
+
+The codec for each packet is chosen adaptively: the channel keeps running estimates
+of the compression ratio and speed of each codec, and of the throughput of the link
+(measured on packets that are larger than the socket buffers, see :meth:`Channel.send`;
+until then, a 100 Mbit/s link is assumed), and picks the codec that minimizes the estimated time
+to compress and transmit the packet (which is no compression at all on a fast link,
+or for incompressible data). Every so often, another codec is tried instead, to keep
+its estimates up to date. See :meth:`Channel.statistics` for the counters.
 """
+from timeit import default_timer
 from rpyc.lib import safe_import
 from rpyc.lib.compat import Struct, BYTES_LITERAL
 zlib = safe_import("zlib")
+lz4 = safe_import("lz4.block")
+if not lz4:
+    # (older versions of the lz4 package have the functions at the top level)
+    lz4 = safe_import("lz4")
 
 # * 64 bit length field?
 # * separate \n into a FlushingChannel subclass?
 # * add thread safety as a subclass?
 
+# the codec id of uncompressed packets
+CODEC_NONE = 0
+
+# map from codec id (as stored in the frame header) to (name, compress function, decompress function)
+CODECS = {}
+# map from codec name to codec id
+CODEC_IDS = {}
+
+def register_codec(id, name, compress, decompress):
+    """Registers a compression codec. Both parties of a connection must register
+    a codec under the same id and name in order to use it.
+
+    :param id: the id of the codec in the frame header (1 to 255); 1 is zlib
+    :param name: the name of the codec, by which the parties negotiate it
+    :param compress: a function that compresses a byte string
+    :param decompress: a function that decompresses a byte string
+    """
+    CODECS[id] = (name, compress, decompress)
+    CODEC_IDS[name] = id
+
+if zlib:
+    register_codec(1, "zlib", lambda data: zlib.compress(data, Channel.COMPRESSION_LEVEL), zlib.decompress)
+if lz4:
+    register_codec(2, "lz4", lz4.compress, lz4.decompress)
+
+
+class CodecStats(object):
+    """Running estimates and counters of the compression by one codec"""
+
+    __slots__ = ["ratio", "speed", "packets", "bytes_in", "bytes_out", "time"]
+    # the weight of a new measurement in the running estimates
+    SMOOTHING = 0.25
+
+    def __init__(self, ratio, speed):
+        self.ratio = ratio      # estimated size of the compressed data relative to the original size
+        self.speed = speed      # estimated compression speed, in bytes per second
+        self.packets = 0        # the number of packets that were compressed
+        self.bytes_in = 0       # the total size of these packets
+        self.bytes_out = 0      # the total size of the compressed data
+        self.time = 0.0         # the total time spent compressing, in seconds
+    def update(self, size, compressed_size, duration):
+        """accounts for a packet of the given size that was compressed to the
+        given size in the given time"""
+        self.packets += 1
+        self.bytes_in += size
+        self.bytes_out += compressed_size
+        self.time += duration
+        self.ratio += self.SMOOTHING * (float(compressed_size) / size - self.ratio)
+        if duration > 0:
+            self.speed += self.SMOOTHING * (size / duration - self.speed)
+    def cost(self, link_throughput):
+        """the estimated time to compress and transmit one byte of data"""
+        return 1.0 / self.speed + self.ratio / link_throughput
+    def as_dict(self):
+        return dict((name, getattr(self, name)) for name in self.__slots__)
+
+
 class Channel(object):
     """Channel implementation.
-    
-    Note: In order to avoid problems with all sorts of line-buffered transports, 
+
+    Note: In order to avoid problems with all sorts of line-buffered transports,
     we deliberately add ``\\n`` at the end of each frame.
+
+    :param stream: the underlying :class:`Stream <rpyc.core.stream.Stream>`
+    :param compress: whether to compress packets at all
+    :param codecs: the names of the codecs that may be used for sending (and
+                   that are offered to the other party); defaults to all
+                   registered codecs
     """
-    
-    COMPRESSION_THRESHOLD = 3000
+
+    COMPRESSION_THRESHOLD = 256             # packets smaller than this are never compressed
     COMPRESSION_LEVEL = 1
+    EXPLORATION_INTERVAL = 50               # every this many packets, a codec other than the best one is tried
+    LINK_MEASUREMENT_THRESHOLD = 65536      # packets that exceed the stream's write buffers by at least this much are used to measure the link throughput
+    LINK_THROUGHPUT = 12.5e6                # the assumed throughput of the link before it has been measured, in bytes per second
+    INITIAL_ESTIMATES = {"zlib" : (0.4, 50e6), "lz4" : (0.6, 400e6)}   # per codec: the initial (ratio, speed) estimates
     FRAME_HEADER = Struct("!LB")
     FLUSHER = BYTES_LITERAL("\n") # cause any line-buffered layers below us to flush
-    __slots__ = ["stream", "compress"]
+    __slots__ = ["stream", "compress", "codecs", "peer_codecs", "codec_stats", "link_throughput",
+        "packets_sent", "bytes_sent", "bytes_saved", "packets_received", "bytes_received",
+        "decompression_time", "link_measurements", "_candidates", "_eligible"]
 
-    def __init__(self, stream, compress = True):
+    def __init__(self, stream, compress = True, codecs = None):
         self.stream = stream
         if not zlib:
             compress = False
         self.compress = compress
+        if codecs is None:
+            codecs = [CODECS[id][0] for id in sorted(CODECS)]
+        self.codecs = [name for name in codecs if name in CODEC_IDS] if compress else []  # the codecs that may be used, by name
+        self.peer_codecs = ["zlib"]     # the codecs that the other party can decode, by name
+        self.codec_stats = {}           # map from codec name to its CodecStats
+        for name in self.codecs:
+            ratio, speed = self.INITIAL_ESTIMATES.get(name, (0.5, 50e6))
+            self.codec_stats[name] = CodecStats(ratio, speed)
+        self.link_throughput = self.LINK_THROUGHPUT   # the estimated throughput of the link, in bytes per second
+        self.link_measurements = 0      # the number of packets on which the link throughput was measured
+        self.packets_sent = 0           # the number of packets sent
+        self.bytes_sent = 0             # the total size of these packets before compression
+        self.bytes_saved = 0            # the total number of bytes saved by compression
+        self.packets_received = 0       # the number of packets received
+        self.bytes_received = 0         # the total size of these packets after decompression
+        self.decompression_time = 0.0   # the total time spent decompressing, in seconds
+        self._candidates = []           # the codecs that may be used for sending to the other party
+        self._eligible = 0              # the number of packets that were large enough to be compressed
+        self.set_peer_codecs(self.peer_codecs)
     def close(self):
         """closes the channel and underlying stream"""
         self.stream.close()
@@ -41,30 +149,99 @@ class Channel(object):
     def poll(self, timeout):
         """polls the underlying steam for data, waiting up to *timeout* seconds"""
         return self.stream.poll(timeout)
+    def set_peer_codecs(self, names):
+        """Sets the codecs that the other party can decode (called by the protocol
+        once the other party has told its codecs)
+
+        :param names: a sequence of codec names
+        """
+        self.peer_codecs = list(names)
+        self._candidates = [name for name in self.codecs if name in self.peer_codecs]
+    def statistics(self):
+        """Returns a dict of counters and estimates: the number of packets and
+        bytes sent and received, the bytes saved by compression, the time spent
+        decompressing, the estimated link throughput, and per codec (under
+        ``"codecs"``), the number of packets and bytes compressed, the time
+        spent compressing, and the estimated compression ratio and speed"""
+        return dict(packets_sent = self.packets_sent, bytes_sent = self.bytes_sent,
+            bytes_saved = self.bytes_saved, packets_received = self.packets_received,
+            bytes_received = self.bytes_received, decompression_time = self.decompression_time,
+            compression_time = sum(stats.time for stats in self.codec_stats.values()),
+            link_throughput = self.link_throughput, link_measurements = self.link_measurements, codecs_in_use = list(self._candidates),
+            codecs = dict((name, stats.as_dict()) for name, stats in self.codec_stats.items()))
     def recv(self):
         """Receives the next packet (or *frame*) from the underlying stream.
         This method will block until the packet has been read completely
-        
-        :returns: string of data
+
+        :returns: string of data, or a ``memoryview`` of the stream's buffer
+                  that is only valid until the next ``recv``
         """
-        header = self.stream.read(self.FRAME_HEADER.size)
-        length, compressed = self.FRAME_HEADER.unpack(header)
-        data = self.stream.read(length + len(self.FLUSHER))[:-len(self.FLUSHER)]
-        if compressed:
-            data = zlib.decompress(data)
+        header = self.stream.read_view(self.FRAME_HEADER.size)
+        length, codec = self.FRAME_HEADER.unpack_from(header)
+        data = self.stream.read_view(length + len(self.FLUSHER))[:-len(self.FLUSHER)]
+        if codec != CODEC_NONE:
+            if codec not in CODECS:
+                raise ValueError("received a packet compressed with the unknown codec %r" % (codec,))
+            if isinstance(data, memoryview):
+                # (the compression modules do not accept memoryviews on Python 2)
+                data = data.tobytes()
+            t0 = default_timer()
+            data = CODECS[codec][2](data)
+            self.decompression_time += default_timer() - t0
+        self.packets_received += 1
+        self.bytes_received += len(data)
         return data
+    def _choose_codec(self):
+        """returns the name of the codec to use for the next (large enough) packet,
+        or None to send it uncompressed"""
+        if not self._candidates:
+            return None
+        self._eligible += 1
+        if self._eligible % self.EXPLORATION_INTERVAL == 0:
+            # try the codecs in turn (as well as sending uncompressed, which measures the link)
+            k = (self._eligible // self.EXPLORATION_INTERVAL) % (len(self._candidates) + 1)
+            return self._candidates[k] if k < len(self._candidates) else None
+        best, best_cost = None, 1.0 / self.link_throughput
+        for name in self._candidates:
+            cost = self.codec_stats[name].cost(self.link_throughput)
+            if cost < best_cost:
+                best, best_cost = name, cost
+        return best
     def send(self, data):
-        """Sends the given string of data as a packet over the underlying 
+        """Sends the given string of data as a packet over the underlying
         stream. Blocks until the packet has been sent.
-        
+
         :param data: the byte string to send as a packet
         """
-        if self.compress and len(data) > self.COMPRESSION_THRESHOLD:
-            compressed = 1
-            data = zlib.compress(data, self.COMPRESSION_LEVEL)
-        else:
-            compressed = 0
-        header = self.FRAME_HEADER.pack(len(data), compressed)
-        buf = header + data + self.FLUSHER
-        self.stream.write(buf)
-
+        size = len(data)
+        codec = CODEC_NONE
+        if size >= self.COMPRESSION_THRESHOLD:
+            name = self._choose_codec()
+            if name is not None:
+                t0 = default_timer()
+                compressed = CODECS[CODEC_IDS[name]][1](data)
+                self.codec_stats[name].update(size, len(compressed), default_timer() - t0)
+                if len(compressed) < size:
+                    codec = CODEC_IDS[name]
+                    self.bytes_saved += size - len(compressed)
+                    data = compressed
+        header = self.FRAME_HEADER.pack(len(data), codec)
+        buffered = None
+        if len(data) >= self.LINK_MEASUREMENT_THRESHOLD:
+            buffered = self.stream.write_buffer_size()
+        t0 = default_timer()
+        self.stream.writev((header, data, self.FLUSHER))
+        if buffered is not None and len(data) >= buffered + self.LINK_MEASUREMENT_THRESHOLD:
+            # the write returns as soon as the rest of the packet fits into the socket buffers, so 
+            # only the bytes beyond those have crossed the link in the meantime (smaller packets 
+            # tell nothing about the link)
+            duration = default_timer() - t0
+            if duration > 0:
+                throughput = (len(data) - buffered) / duration
+                if self.link_measurements == 0:
+                    self.link_throughput = throughput
+                else:
+                    self.link_throughput += CodecStats.SMOOTHING * (throughput - self.link_throughput)
+                self.link_measurements += 1
+        self.packets_sent += 1
+        self.bytes_sent += size
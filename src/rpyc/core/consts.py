@@ -6,6 +6,7 @@ Constants used by the protocol
 MSG_REQUEST      = 1
 MSG_REPLY        = 2
 MSG_EXCEPTION    = 3
+MSG_BATCH        = 4
 
 # boxing
 LABEL_VALUE      = 1
@@ -33,6 +34,7 @@ HANDLE_INSPECT     = 16
 HANDLE_BUFFITER    = 17
 HANDLE_OLDSLICING  = 18
 HANDLE_ITER        = 19
+HANDLE_CODECS      = 20
 
 # optimized exceptions
 EXC_STOP_ITERATION = 1
@@ -67,7 +67,6 @@ def syncreq(proxy, handler, *args):
     if not conn:
         raise ReferenceError('weakly-referenced object no longer exists')
     oid = object.__getattribute__(proxy, "____oid__")
-    print "syncreq...",args
     try:
         #framework.tickmodule.engine_lock.release()
         result = conn.sync_request(handler, oid, *args)
@@ -6,6 +6,7 @@ import weakref
 import itertools
 import socket
 import time
+import threading
 
 from threading import Lock
 from rpyc.lib.compat import pickle, next, is_py3k, maxint, select_error
@@ -53,6 +54,7 @@ DEFAULT_CONFIG = dict(
     log_exceptions = True,
     # MISC
     allow_pickle = False,
+    pass_containers_by_value = False,
     connid = None,
     credentials = None,
     endpoints = None,
@@ -82,6 +84,10 @@ Parameter                              Default value     Description
 ``allow_setattr``                      ``False``         Whether to allow setting of attributes (``setattr``)
 ``allow_delattr``                      ``False``         Whether to allow deletion of attributes (``delattr``)
 ``allow_pickle``                       ``False``         Whether to allow the use of ``pickle``
+``pass_containers_by_value``           ``False``         Whether to pass lists, dicts and numeric arrays
+                                                         (``array.array`` and NumPy) by value, i.e., to send
+                                                         a copy instead of a reference, if all of their items
+                                                         are dumpable (see :mod:`rpyc.core.brine`)
 
 ``include_local_traceback``            ``True``          Whether to include the local traceback
                                                          in the remote exception
@@ -137,7 +143,10 @@ class Connection(object):
         self._seqcounter = itertools.count()
         self._recvlock = Lock()
         self._sendlock = Lock()
+        self._batch_state = threading.local()
         self._sync_replies = {}
+        self._reply_cond = threading.Condition(Lock()) # signalled when a reply has been dispatched or a thread stopped receiving
+        self._receiver = None                           # the thread that is receiving and dispatching a message, if any (guarded by _reply_cond)
         self._async_callbacks = {}
         self._local_objects = RefCountingColl()
         self._last_traceback = None
@@ -145,6 +154,9 @@ class Connection(object):
         self._netref_classes_cache = {}
         self._remote_root = None
         self._local_root = service(weakref.proxy(self))
+        # tell the other party which compression codecs we can decode (peers that do not
+        # know this request simply reply with an exception, which is ignored)
+        self._async_request(consts.HANDLE_CODECS, (tuple(self._channel.codecs),))
         if not _lazy:
             self._init_service()
         self._closed = False
@@ -178,6 +190,7 @@ class Connection(object):
         self._last_traceback = None
         self._remote_root = None
         self._local_root = None
+        self._notify_waiters()
         #self._seqcounter = None
         #self._config.clear()
     
@@ -189,6 +202,7 @@ class Connection(object):
         try:
             try:
                 self._async_request(consts.HANDLE_CLOSE)
+                self._flush_batch()
             except EOFError:
                 pass
             except Exception:
@@ -222,7 +236,15 @@ class Connection(object):
             raise PingError("echo mismatches sent data")
 
     def _send(self, msg, seq, args):
-        data = brine.dump((msg, seq, args))
+        pending = getattr(self._batch_state, "pending", None)
+        if pending is not None:
+            if msg == consts.MSG_REQUEST:
+                pending.append((msg, seq, args))
+                return
+            # replies must not overtake the requests issued before them
+            self._flush_batch()
+        self._send_raw(brine.dump((msg, seq, args)))
+    def _send_raw(self, data):
         self._sendlock.acquire()
         try:
             self._channel.send(data)
@@ -239,13 +261,58 @@ class Connection(object):
             include_local_traceback = self._config["include_local_traceback"])
         self._send(consts.MSG_EXCEPTION, seq, exc)
 
+    #
+    # batching
+    #
+    def batch(self):
+        """Returns a context manager within which the requests that the calling thread
+        sends over this connection are coalesced into a single multi-request packet, 
+        which is sent when the (outermost) context exits. The other party dispatches
+        the requests in order. Batches can be nested, and other threads are not affected.
+        
+        This is meant for asynchronous requests (e.g., many small state updates per frame); 
+        whenever the thread waits for a reply (e.g., a synchronous request, or an 
+        ``AsyncResult`` value), the requests batched so far are sent first.
+        
+        Example::
+        
+            with conn.batch():
+                for node, pos in updates:
+                    rpyc.async(node.setPos)(*pos)
+        """
+        return _Batch(self)
+    def _begin_batch(self):
+        state = self._batch_state
+        state.depth = getattr(state, "depth", 0) + 1
+        if state.depth == 1:
+            state.pending = []
+    def _end_batch(self):
+        state = self._batch_state
+        state.depth -= 1
+        if state.depth == 0:
+            try:
+                self._flush_batch()
+            finally:
+                state.pending = None
+    def _flush_batch(self):
+        """sends the requests that the calling thread has batched so far (if any)"""
+        pending = getattr(self._batch_state, "pending", None)
+        if not pending:
+            return
+        messages = tuple(pending)
+        del pending[:]
+        if len(messages) == 1:
+            self._send_raw(brine.dump(messages[0]))
+        else:
+            self._send_raw(brine.dump((consts.MSG_BATCH, 0, messages)))
+
     #
     # boxing
     #
     def _box(self, obj):
         """store a local object in such a way that it could be recreated on
         the remote party either by-value or by-reference"""
-        if brine.dumpable(obj):
+        if brine.dumpable(obj, self._config["pass_containers_by_value"]):
             return consts.LABEL_VALUE, obj
         if type(obj) is tuple:
             return consts.LABEL_TUPLE, tuple(self._box(item) for item in obj)
@@ -324,6 +391,7 @@ class Connection(object):
             self._async_callbacks.pop(seq)(False, obj)
         else:
             self._sync_replies[seq] = (False, obj)
+        self._notify_waiters()
 
     def _dispatch_exception(self, seq, raw):
         obj = vinegar.load(raw,
@@ -334,29 +402,96 @@ class Connection(object):
             self._async_callbacks.pop(seq)(True, obj)
         else:
             self._sync_replies[seq] = (True, obj)
+        self._notify_waiters()
 
     #
     # serving
     #
     def _recv(self, timeout, wait_for_lock):
+        # a reply can only arrive once the batched requests have been sent
+        self._flush_batch()
         if not self._recvlock.acquire(wait_for_lock):
             return None
+        # the calling thread remains the receiver until it has dispatched the reply in the message (if any),
+        # so that threads that wait for that reply do not start receiving in the meantime
+        self._claim_receiver()
+        data = None
         try:
             try:
                 if self._channel.poll(timeout):
-                    data = self._channel.recv()
-                else:
-                    data = None
+                    # (the channel may return a view of its receive buffer, which must be decoded 
+                    # before the next message is received)
+                    data = brine.load(self._channel.recv())
             except EOFError:
                 self.close()
                 raise
         finally:
             self._recvlock.release()
+            if not data:
+                self._release_receiver()
         return data
 
+    def _claim_receiver(self):
+        self._reply_cond.acquire()
+        try:
+            self._receiver = threading.currentThread()
+        finally:
+            self._reply_cond.release()
+
+    def _release_receiver(self):
+        self._reply_cond.acquire()
+        try:
+            # (another thread may have started receiving already)
+            if self._receiver is threading.currentThread():
+                self._receiver = None
+                # a waiting thread may have to take over receiving
+                self._reply_cond.notifyAll()
+        finally:
+            self._reply_cond.release()
+
+    def _notify_waiters(self):
+        self._reply_cond.acquire()
+        try:
+            self._reply_cond.notifyAll()
+        finally:
+            self._reply_cond.release()
+
+    def _wait_for(self, predicate):
+        """Waits until the given predicate (e.g., "the reply to request #seq has 
+        arrived") holds. If no other thread is receiving, the calling thread serves 
+        the connection itself; otherwise it sleeps until the receiving thread has 
+        dispatched a reply or stopped receiving, so that the wait does not add any 
+        latency to the network round trip."""
+        # the awaited reply can only arrive once the batched requests have been sent
+        self._flush_batch()
+        while True:
+            self._reply_cond.acquire()
+            try:
+                while True:
+                    if predicate():
+                        return
+                    if self._channel.closed:
+                        raise EOFError("connection closed while waiting for a reply")
+                    if self._receiver is None or self._receiver is threading.currentThread():
+                        break
+                    self._reply_cond.wait()
+            finally:
+                self._reply_cond.release()
+            # (does not block if another thread has just started receiving)
+            self.poll(0.1)
+
     def _dispatch(self, data):
-        msg, seq, args = brine.load(data)
+        msg, seq, args = data
+        if msg == consts.MSG_BATCH:
+            for msg, seq, args in args:
+                self._dispatch_message(msg, seq, args)
+        else:
+            self._dispatch_message(msg, seq, args)
+
+    def _dispatch_message(self, msg, seq, args):
         if msg == consts.MSG_REQUEST:
+            # request handlers may block for a while, so let other threads receive in the meantime
+            self._release_receiver()
             try:
                 # note: we're acquiring a shared lock here since we want network event handlers to be dispatched
                 #       atomically w.r.t. the local game state and engne state
@@ -382,7 +517,10 @@ class Connection(object):
         data = self._recv(timeout, wait_for_lock = False)
         if not data:
             return False
-        self._dispatch(data)
+        try:
+            self._dispatch(data)
+        finally:
+            self._release_receiver()
         return True
 
     def serve(self, timeout = 1):
@@ -405,7 +543,7 @@ class Connection(object):
             self._dispatch(data)
         finally:
             #framework.tickmodule.shared_lock.release()
-            pass
+            self._release_receiver()
 
         return True
 
@@ -457,8 +595,7 @@ class Connection(object):
         :returns: the result of the request
         """
         seq = self._send_request(handler, args)
-        while seq not in self._sync_replies:
-            self.serve(0.1)
+        self._wait_for(lambda: seq in self._sync_replies)
         isexc, obj = self._sync_replies.pop(seq)
         if isexc:
             raise obj
@@ -596,6 +733,9 @@ class Connection(object):
             return getslice(start, stop, *args)
     def _handle_iter(self, oid):
         return iter(self._local_objects[oid])
+    def _handle_codecs(self, names):
+        self._channel.set_peer_codecs(names)
+        return tuple(self._channel.codecs)
 
     # collect handlers
     _HANDLERS = {}
@@ -608,3 +748,14 @@ class Connection(object):
                 raise NameError("no constant defined for %r", name)
     del name, name2, obj
 
+
+class _Batch(object):
+    """The context manager returned by :func:`Connection.batch`"""
+    __slots__ = ["conn"]
+    def __init__(self, conn):
+        self.conn = conn
+    def __enter__(self):
+        self.conn._begin_batch()
+        return self.conn
+    def __exit__(self, t, v, tb):
+        self.conn._end_batch()
@@ -57,6 +57,28 @@ class Stream(object):
         :param data: a string of binary data
         """
         raise NotImplementedError()
+    def read_view(self, count):
+        """like :meth:`read`, but may return a ``memoryview`` of an internal 
+        buffer instead of a copy of the data; the view is only valid until the 
+        next read from the stream
+        
+        :param count: the number of bytes to read
+        
+        :returns: read data (a string or a ``memoryview``)
+        """
+        return self.read(count)
+    def writev(self, buffers):
+        """writes the given buffers one after the other, as if they were 
+        concatenated, or raise EOFError
+        
+        :param buffers: a sequence of strings of binary data
+        """
+        self.write(BYTES_LITERAL("").join(buffers))
+    def write_buffer_size(self):
+        """returns the (approximate) number of bytes that the transport can 
+        absorb before a write has to wait for the data to cross the link, or 
+        ``None`` if unknown"""
+        return None
 
 
 class ClosedFile(object):
@@ -157,6 +179,13 @@ class SocketStream(Stream):
                 raise EOFError()
             else:
                 raise
+    def write_buffer_size(self):
+        # our send buffer plus the other party's receive buffer (assumed to be as large as ours)
+        try:
+            return (self.sock.getsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF) + 
+                self.sock.getsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF))
+        except Exception:
+            return None
     
     def read(self, count):
         data = []
@@ -188,6 +217,98 @@ class SocketStream(Stream):
             self.close()
             raise EOFError(ex)
 
+class BufferedSocketStream(SocketStream):
+    """A stream over a socket that avoids per-message copies and allocations:
+    data is read ahead into a preallocated ``bytearray`` via ``recv_into`` and 
+    handed out as ``memoryview`` slices (see :meth:`read_view`), and the parts 
+    of large packets are written via ``sendall`` as they are (see :meth:`writev`),
+    instead of being concatenated and re-sliced in chunks. Like all streams, it 
+    must not be read or written by several threads at a time.
+    
+    The socket's Nagle algorithm is disabled, since a large packet is written in 
+    several parts.
+    """
+    
+    __slots__ = ("_rbuf", "_rstart", "_rend")
+    READ_BUFFER_SIZE = 65536    # reads of up to this many bytes are served from the read-ahead buffer
+    GATHER_SIZE = 65536         # writes of up to this many bytes are joined and sent at once
+    def __init__(self, sock):
+        SocketStream.__init__(self, sock)
+        self._rbuf = bytearray(self.READ_BUFFER_SIZE)
+        self._rstart = 0        # the offset of the first unread byte in _rbuf
+        self._rend = 0          # the offset after the last unread byte in _rbuf
+        try:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        except Exception:
+            # not a TCP socket
+            pass
+    
+    def poll(self, timeout):
+        if self._rend > self._rstart:
+            # (data that has been read ahead)
+            return True
+        return SocketStream.poll(self, timeout)
+    
+    def _fill(self, view, pos, count):
+        """receives into the given memoryview from *pos* on until at least *count*
+        bytes are there; returns the new fill position"""
+        while pos < count:
+            try:
+                n = self.sock.recv_into(view[pos:])
+            except socket.timeout:
+                continue
+            except socket.error:
+                ex = sys.exc_info()[1]
+                if get_exc_errno(ex) in retry_errnos:
+                    continue
+                self.close()
+                raise EOFError(ex)
+            if not n:
+                self.close()
+                raise EOFError("connection closed by peer")
+            pos += n
+        return pos
+    
+    def read_view(self, count):
+        available = self._rend - self._rstart
+        if available < count:
+            if count > len(self._rbuf):
+                # a large packet gets a buffer of its own (so that the read-ahead buffer does not grow)
+                buf = bytearray(count)
+                buf[:available] = self._rbuf[self._rstart:self._rend]
+                self._rstart = self._rend = 0
+                return memoryview(buf)[:self._fill(memoryview(buf), available, count)]
+            if len(self._rbuf) - self._rstart < count:
+                # move the unread data to the front of the buffer
+                self._rbuf[:available] = self._rbuf[self._rstart:self._rend]
+                self._rstart, self._rend = 0, available
+            self._rend = self._fill(memoryview(self._rbuf), self._rend, self._rstart + count)
+        view = memoryview(self._rbuf)[self._rstart:self._rstart + count]
+        self._rstart += count
+        if self._rstart == self._rend:
+            self._rstart = self._rend = 0
+        return view
+    def read(self, count):
+        return self.read_view(count).tobytes()
+    
+    def writev(self, buffers):
+        size = 0
+        for buf in buffers:
+            size += len(buf)
+        try:
+            if size <= self.GATHER_SIZE:
+                # (for small packets, a single send is cheaper than avoiding the copy)
+                self.sock.sendall(BYTES_LITERAL("").join(buffers))
+            else:
+                for buf in buffers:
+                    self.sock.sendall(buf)
+        except socket.error:
+            ex = sys.exc_info()[1]
+            self.close()
+            raise EOFError(ex)
+    def write(self, data):
+        self.writev((data,))
+
 class TunneledSocketStream(SocketStream):
     """A socket stream over an :class:`rpyc.utils.ssh.SshTunnel`"""
     
@@ -15,7 +15,7 @@ except ImportError:
         from java.lang import System
         interrupt_main = System.exit
 
-from rpyc import Connection, Channel, SocketStream, TunneledSocketStream, PipeStream, VoidService
+from rpyc import Connection, Channel, SocketStream, BufferedSocketStream, TunneledSocketStream, PipeStream, VoidService
 from rpyc.utils.registry import UDPRegistryClient
 from rpyc.lib import safe_import
 ssl = safe_import("ssl")
@@ -86,7 +86,7 @@ def connect(host, port, service = VoidService, config = {}, ipv6 = False):
 
     :returns: an RPyC connection
     """
-    s = SocketStream.connect(host, port, ipv6 = ipv6)
+    s = BufferedSocketStream.connect(host, port, ipv6 = ipv6)
     return connect_stream(s, service, config)
 
 def ssl_connect(host, port, keyfile = None, certfile = None, ca_certs = None,
@@ -132,7 +132,7 @@ def ssl_connect(host, port, keyfile = None, certfile = None, ca_certs = None,
         ssl_kwargs["ssl_version"] = ssl_version
     if ciphers is not None:
         ssl_kwargs["ciphers"] = ciphers
-    s = SocketStream.ssl_connect(host, port, ssl_kwargs, ipv6 = ipv6)
+    s = BufferedSocketStream.ssl_connect(host, port, ssl_kwargs, ipv6 = ipv6)
     return connect_stream(s, service, config)
 
 def _get_free_port():
@@ -230,7 +230,7 @@ def connect_thread(service = VoidService, config = {}, remote_service = VoidServ
     def server(listener = listener):
         client = listener.accept()[0]
         listener.close()
-        conn = connect_stream(SocketStream(client), service = remote_service,
+        conn = connect_stream(BufferedSocketStream(client), service = remote_service,
             config = remote_config)
         try:
             conn.serve_all()
@@ -266,7 +266,7 @@ def connect_multiprocess(service = VoidService, config = {}, remote_service = Vo
     def server(listener=listener, args=args):
         client = listener.accept()[0]
         listener.close()
-        conn = connect_stream(SocketStream(client), service = remote_service, config = remote_config)        
+        conn = connect_stream(BufferedSocketStream(client), service = remote_service, config = remote_config)        
         try:
             for k in args:
                 conn._local_root.exposed_namespace[k] = args[k]
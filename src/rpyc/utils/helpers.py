@@ -1,6 +1,7 @@
 """
 Helpers and wrappers for common RPyC tasks
 """
+import sys
 import time
 import threading
 from rpyc.lib.colls import WeakValueDict
@@ -191,6 +192,43 @@ def enable_async_methods(proxy,enabled=True):
     return proxy
 
 
+class batch(object):
+    """Coalesces the requests that the calling thread issues over any of the given
+    connections within the ``with`` block into one packet per connection (see 
+    :func:`rpyc.core.protocol.Connection.batch`); connections that are ``None`` are 
+    ignored.
+    
+    Example::
+    
+        with rpyc.batch(conn1, conn2):
+            for agent in agents:
+                agent.update()      # issues async requests over conn1 and conn2
+    """
+    __slots__ = ("conns",)
+    def __init__(self, *conns):
+        self.conns = [c for c in conns if c is not None]
+    def __enter__(self):
+        for i, c in enumerate(self.conns):
+            try:
+                c._begin_batch()
+            except Exception:
+                for c2 in self.conns[:i]:
+                    c2._end_batch()
+                raise
+        return self
+    def __exit__(self, t, v, tb):
+        error = None
+        for c in self.conns:
+            try:
+                c._end_batch()
+            except Exception:
+                # (end the other batches, too)
+                if error is None:
+                    error = sys.exc_info()
+        if error is not None and t is None:
+            raise error[0], error[1], error[2]
+
+
 class timed(object):
     """Creates a timed asynchronous proxy. Invoking the timed proxy will
     run in the background and will raise an :class:`rpyc.core.async.AsyncResultTimeout` 
@@ -12,7 +12,7 @@ try:
     import Queue
 except ImportError:
     import queue as Queue
-from rpyc.core import SocketStream, Channel, Connection
+from rpyc.core import BufferedSocketStream, Channel, Connection
 from rpyc.utils.registry import UDPRegistryClient
 from rpyc.utils.authenticators import AuthenticationError
 from rpyc.lib import safe_import
@@ -188,7 +188,7 @@ class Server(object):
         try:
             config = dict(self.protocol_config, credentials = credentials, 
                 endpoints = (sock.getsockname(), addrinfo))
-            conn = Connection(self.service, Channel(SocketStream(sock)),
+            conn = Connection(self.service, Channel(BufferedSocketStream(sock)),
                 config = config, _lazy = True)
             conn._init_service()
             conn.serve_all()
@@ -434,7 +434,7 @@ class ThreadPoolServer(Server):
         # build a connection
         h, p = sock.getpeername()
         config = dict(self.protocol_config, credentials=credentials, connid="%s:%d"%(h, p))
-        return Connection(self.service, Channel(SocketStream(sock)), config=config)
+        return Connection(self.service, Channel(BufferedSocketStream(sock)), config=config)
 
     def _accept_method(self, sock):
         '''Implementation of the accept method : only pushes the work to the internal queue.